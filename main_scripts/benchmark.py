@@ -0,0 +1,414 @@
+import config
+import face_matcher
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import cv2
+import numpy as np
+
+
+'''
+Замеры производительности без камеры и робота.
+Запуск: python benchmark.py [--save-baseline baseline.json] [--compare baseline.json]
+Графический интерфейс замеряется без экрана (QT_QPA_PLATFORM=offscreen).
+'''
+
+# Разрешения кадров камеры, на которых выполняются замеры
+RESOLUTIONS = ((320, 240), (640, 480), (1280, 720))
+
+
+def measure(function, repeats: int) -> float:
+    """
+    Среднее время выполнения функции.
+    :param function: Функция без аргументов.
+    :param repeats: Количество повторов.
+    :return: Среднее время одного вызова в миллисекундах.
+    """
+    function()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def profile(function, repeats: int, warmup: int = 3, memory_repeats: int = 5) -> dict:
+    """
+    Замер одного сценария: пропускная способность, процентили задержки и пиковая память.
+    Память замеряется отдельными вызовами под tracemalloc, чтобы он не искажал время.
+    :param function: Функция без аргументов, один вызов - одна единица работы (кадр, сохранение).
+    :param repeats: Количество замеряемых вызовов.
+    :param warmup: Количество вызовов до замера.
+    :param memory_repeats: Количество вызовов под tracemalloc.
+    :return: Словарь: throughput - вызовов в секунду, p50/p95/p99 - задержка в миллисекундах,
+        peak_kb - пиковый объем памяти Python и numpy, выделенной за вызов, в килобайтах.
+    """
+    for _ in range(warmup):
+        function()
+
+    samples = np.empty(repeats)
+    start = time.perf_counter()
+    for i in range(repeats):
+        begin = time.perf_counter()
+        function()
+        samples[i] = time.perf_counter() - begin
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        peak = 0
+        for _ in range(memory_repeats):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            function()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(samples, (50, 95, 99)) * 1000
+    return {'throughput': repeats / elapsed, 'p50': float(p50), 'p95': float(p95), 'p99': float(p99),
+            'peak_kb': peak / 1024}
+
+
+def synthetic_laser_frames(width: int, height: int, count: int = 60, seed: int = 0) -> list:
+    """
+    Кадры с шумным серым фоном и красной лазерной точкой, движущейся по кругу.
+    """
+    generator = np.random.default_rng(seed)
+    background = generator.integers(20, 120, (height, width, 1), dtype=np.int16)
+    background = np.clip(background + generator.integers(-6, 7, (height, width, 3)), 0, 255).astype(np.uint8)
+    frames = []
+    for i in range(count):
+        angle = 2 * np.pi * i / count
+        center = (int(width / 2 + width / 3 * np.cos(angle)), int(height / 2 + height / 4 * np.sin(angle)))
+        frame = background.copy()
+        cv2.circle(frame, center, max(3, width // 100), (40, 40, 255), -1)
+        frames.append(frame)
+    return frames
+
+
+def recorded_frames(path: str, size: tuple, count: int = 60) -> list:
+    """
+    Кадры из записанного видео, приведенные к размеру size.
+    :param path: Путь к видеофайлу или к записи recording.py (.rec).
+    :param size: Размер (ширина, высота).
+    :param count: Максимальное количество кадров.
+    """
+    if path.endswith('.rec'):
+        import recording
+        frames = recording.Recording(path).frames[:count]
+        return [frame if (frame.shape[1], frame.shape[0]) == size
+                else cv2.resize(frame, size, interpolation=cv2.INTER_AREA) for frame in frames]
+
+    video_capture = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        success, frame = video_capture.read()
+        if not success:
+            break
+        if (frame.shape[1], frame.shape[0]) != size:
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        frames.append(frame)
+    video_capture.release()
+    return frames
+
+
+def cycle(frames: list):
+    """
+    Функция, которая при каждом вызове возвращает следующий кадр по кругу.
+    """
+    position = [0]
+
+    def next_frame():
+        frame = frames[position[0] % len(frames)]
+        position[0] += 1
+        return frame
+    return next_frame
+
+
+def benchmark_chase_laser(frames: dict, repeats: int) -> dict:
+    """
+    Поиск лазерной точки ChaseLaser: слежение в окне и полный поиск по каждому кадру.
+    :param frames: Словарь {имя входа: список кадров}.
+    :param repeats: Количество кадров в замере.
+    """
+    import chase_laser
+    results = {}
+    for name, inputs in frames.items():
+        for mode, options in (('tracking', {}), ('full', {'tracking': False}),
+                              ('coarse', {'tracking': False, 'processing_size': (320, 240)})):
+            chase = chase_laser.ChaseLaser(None, **options)
+            next_frame = cycle(inputs)
+
+            def step():
+                chase.set_camera(next_frame())
+                chase.chase()
+            results[f'laser.{mode}.{name}'] = profile(step, repeats)
+    return results
+
+
+def benchmark_emotions(repeats: int, folder: str = 'emojis/', sizes: tuple = ((240, 240), (480, 480), None)) -> dict:
+    """
+    Выдача кадров эмоций: декодирование видео в память, получение эмоции из кэша
+    и выдача кадра по позиции с копированием в буфер экрана.
+    :param repeats: Количество замеряемых вызовов.
+    :param folder: Директория с эмоциями, при ее отсутствии используется синтетическая эмоция.
+    :param sizes: Размеры кадров эмоций в памяти, None - исходный размер.
+    """
+    import emotions
+    results = {}
+    paths = [os.path.join(folder, name) for name in sorted(os.listdir(folder))] if os.path.isdir(folder) else []
+    for size in sizes:
+        label = f'{size[0]}x{size[1]}' if size is not None else 'source'
+        if paths:
+            results[f'emotions.decode.{label}'] = profile(lambda: emotions.decode_clip(paths[0], size),
+                                                          max(3, repeats // 50), warmup=1, memory_repeats=1)
+            clip = emotions.decode_clip(paths[0], size)
+        else:
+            height, width = size[::-1] if size is not None else (480, 480)
+            frames = np.random.default_rng(0).integers(0, 255, (30, height, width, 3), dtype=np.uint8)
+            clip = emotions.EmotionClip(frames, np.arange(30, dtype=np.uint16), 30.0)
+
+        cache = emotions.EmotionCache()
+        if paths:
+            cache.get(paths[0])
+            results[f'emotions.cache_hit.{label}'] = profile(lambda: cache.get(paths[0]), repeats)
+
+        screen = np.empty_like(clip.frames[0])
+        position = [0]
+
+        def deliver():
+            position[0] += 1
+            np.copyto(screen, clip.frame(position[0]))
+        results[f'emotions.deliver.{label}'] = profile(deliver, repeats)
+    return results
+
+
+def benchmark_picture(frames: dict, repeats: int, label_size: tuple = (980, 400)) -> dict:
+    """
+    Подготовка кадра камеры к показу в PictureInterface без экрана:
+    прежний путь (cvtColor в RGB, QImage, QPixmap) и CaptureWorker (масштабирование в буфер, BGR888, рисование).
+    :param frames: Словарь {имя входа: список кадров}.
+    :param repeats: Количество кадров в замере.
+    :param label_size: Размер области показа.
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtGui import QImage, QPainter, QPixmap
+    from PyQt5.QtWidgets import QApplication
+    import graphic_interfaces
+    application = QApplication.instance() or QApplication(sys.argv[:1])
+
+    results = {}
+    screen = QImage(label_size[0], label_size[1], QImage.Format_RGB32)
+    for name, inputs in frames.items():
+        next_frame = cycle(inputs)
+
+        def rgb_pixmap():
+            frame = cv2.cvtColor(next_frame(), cv2.COLOR_BGR2RGB)
+            h, w, ch = frame.shape
+            pixmap = QPixmap.fromImage(QImage(frame.data, w, h, ch * w, QImage.Format_RGB888))
+            painter = QPainter(screen)
+            painter.drawPixmap(0, 0, pixmap)
+            painter.end()
+        results[f'picture.rgb_pixmap.{name}'] = profile(rgb_pixmap, repeats)
+
+        worker = graphic_interfaces.CaptureWorker(None)
+        worker.set_target_size(*label_size)
+
+        def worker_path():
+            worker.prepare(next_frame())
+            image = worker.take()
+            painter = QPainter(screen)
+            painter.drawImage(0, 0, image)
+            painter.end()
+        results[f'picture.worker.{name}'] = profile(worker_path, repeats)
+    application.processEvents()
+    return results
+
+
+def benchmark_config(repeats: int, sizes: tuple = (10, 100, 1000)) -> dict:
+    """
+    Сохранение и загрузка имен: одно изменение с записью на диск и загрузка всех имен.
+    Замер выполняется во временной директории, файлы робота не меняются.
+    :param repeats: Количество замеряемых сохранений.
+    :param sizes: Количество имен в хранилище.
+    """
+    import storage
+    results = {}
+    for size in sizes:
+        directory = tempfile.mkdtemp()
+        try:
+            names_storage = storage.AppendLogStorage(directory, 'data')
+            registry = config.NameRegistry(names_storage)
+            registry.load()
+            for i in range(size):
+                registry.add(f'Name{i}')
+            registry.flush()
+
+            def save():
+                registry.remove(registry.add('Benchmark'))
+                registry.add('Benchmark')
+                registry.flush()
+            results[f'config.save.{size}'] = profile(save, repeats, memory_repeats=2)
+
+            def load():
+                loaded = storage.AppendLogStorage(directory, 'data')
+                loaded.load()
+                loaded.close()
+            names_storage.close()
+            results[f'config.load.{size}'] = profile(load, max(5, repeats // 5), memory_repeats=2)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def run_suite(groups: tuple = ('laser', 'emotions', 'picture', 'config'), repeats: int = 200,
+              video: str = None, resolutions: tuple = RESOLUTIONS) -> dict:
+    """
+    Запуск набора замеров.
+    :param groups: Группы замеров.
+    :param repeats: Количество замеряемых вызовов в каждом сценарии.
+    :param video: Путь к записанному видео с камеры, его кадры замеряются вместе с синтетическими.
+    :param resolutions: Разрешения кадров камеры.
+    :return: Словарь {имя сценария: результаты profile()}.
+    """
+    frames = {}
+    for width, height in resolutions:
+        frames[f'synthetic.{width}x{height}'] = synthetic_laser_frames(width, height)
+        if video is not None:
+            recorded = recorded_frames(video, (width, height))
+            if recorded:
+                frames[f'recorded.{width}x{height}'] = recorded
+
+    results = {}
+    if 'laser' in groups:
+        results.update(benchmark_chase_laser(frames, repeats))
+    if 'emotions' in groups:
+        results.update(benchmark_emotions(repeats))
+    if 'picture' in groups:
+        results.update(benchmark_picture(frames, repeats))
+    if 'config' in groups:
+        results.update(benchmark_config(max(10, repeats // 4)))
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25) -> list:
+    """
+    Сравнение результатов с базовыми.
+    Регрессией считается рост p50, p95 или peak_kb больше чем на tolerance от базового значения.
+    Сценарии, которых нет в базовых результатах, не сравниваются.
+    :return: Список описаний регрессий, пустой, если регрессий нет.
+    """
+    regressions = []
+    for name, values in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for metric, slack in (('p50', 0.0), ('p95', 0.0), ('peak_kb', 16.0)):
+            limit = reference[metric] * (1 + tolerance) + slack
+            if values[metric] > limit:
+                regressions.append(f'{name}: {metric} {values[metric]:.3f} > {limit:.3f} '
+                                   f'(baseline {reference[metric]:.3f})')
+    return regressions
+
+
+def print_results(results: dict) -> None:
+    """
+    Вывод таблицы результатов.
+    """
+    print(f"{'benchmark':<40} {'per s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak KB':>9}")
+    for name, values in results.items():
+        print(f"{name:<40} {values['throughput']:>9.1f} {values['p50']:>9.3f} {values['p95']:>9.3f} "
+              f"{values['p99']:>9.3f} {values['peak_kb']:>9.1f}")
+
+
+def benchmark_gallery(sizes: tuple = (10, 100, 1000, 10000), faces: int = 4, repeats: int = 20,
+                      dimension: int = 128, seed: int = 0) -> list:
+    """
+    Сравнение способов сопоставления лиц с галереей разного размера:
+    цикл по лицам с расчетом расстояний до каждого вектора галереи (как face_recognition.face_distance),
+    GalleryMatcher с полным перебором и GalleryMatcher с приближенным индексом.
+    :param sizes: Размеры галереи.
+    :param faces: Количество лиц на кадре.
+    :param repeats: Количество повторов каждого замера.
+    :param dimension: Размерность вектора лица.
+    :param seed: Зерно генератора случайных чисел.
+    :return: Список словарей с результатами для каждого размера галереи.
+    """
+    generator = np.random.default_rng(seed)
+    results = []
+    for size in sizes:
+        gallery = generator.normal(0, 0.1, (size, dimension))
+        ids = np.arange(size)
+        queries = gallery[generator.integers(0, size, faces)] + generator.normal(0, 0.01, (faces, dimension))
+
+        def loop():
+            return [int(np.argmin(np.linalg.norm(gallery - query, axis=1))) for query in queries]
+
+        exact = face_matcher.GalleryMatcher()
+        exact.set_gallery(ids, gallery)
+        indexed = face_matcher.GalleryMatcher(index_threshold=0)
+        start = time.perf_counter()
+        indexed.set_gallery(ids, gallery)
+        build = (time.perf_counter() - start) * 1000
+
+        expected = loop()
+        recall = np.mean([m.id == e for m, e in zip(indexed.match(queries), expected)])
+        results.append({'size': size,
+                        'loop_ms': measure(loop, repeats),
+                        'batched_ms': measure(lambda: exact.match(queries), repeats),
+                        'indexed_ms': measure(lambda: indexed.match(queries), repeats),
+                        'index_build_ms': build,
+                        'index_recall': float(recall)})
+    return results
+
+
+def main(argv=None) -> int:
+    """
+    Запуск замеров из командной строки.
+    :return: Код возврата: 1, если при сравнении с базовыми результатами найдены регрессии.
+    """
+    parser = argparse.ArgumentParser(description='Замеры производительности без камеры и робота')
+    parser.add_argument('--only', default='laser,emotions,picture,config', help='группы замеров через запятую')
+    parser.add_argument('--repeats', type=int, default=200, help='количество вызовов в каждом сценарии')
+    parser.add_argument('--video', default=None, help='записанное видео с камеры или запись .rec')
+    parser.add_argument('--save-baseline', default=None, help='сохранить результаты как базовые')
+    parser.add_argument('--compare', default=None, help='сравнить с базовыми результатами')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='допустимое ухудшение, доля от базового')
+    parser.add_argument('--gallery', action='store_true', help='сравнение способов сопоставления лиц')
+    arguments = parser.parse_args(argv)
+
+    if arguments.gallery:
+        print(f"{'gallery':>8} {'loop ms':>9} {'batched ms':>11} {'indexed ms':>11} {'build ms':>9} {'recall':>7}")
+        for row in benchmark_gallery():
+            print(f"{row['size']:>8} {row['loop_ms']:>9.3f} {row['batched_ms']:>11.3f} {row['indexed_ms']:>11.3f} "
+                  f"{row['index_build_ms']:>9.1f} {row['index_recall']:>7.2f}")
+        return 0
+
+    results = run_suite(tuple(arguments.only.split(',')), arguments.repeats, arguments.video)
+    print_results(results)
+
+    if arguments.save_baseline is not None:
+        with open(arguments.save_baseline, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=4)
+        print(f'Baseline saved to {arguments.save_baseline}')
+
+    if arguments.compare is not None:
+        with open(arguments.compare, 'r', encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), arguments.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            return 1
+        print('No regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    # Пути к эмоциям заданы относительно main_scripts
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sys.exit(main())
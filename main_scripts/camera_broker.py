@@ -0,0 +1,185 @@
+import interfaces
+import get_capture
+import cv2
+import threading
+from typing import Optional
+
+
+class CameraBroker:
+    """
+    Класс CameraBroker:
+    Владеет каждой физической камерой в единственном экземпляре.
+    Камера открывается при первом запросе и закрывается, когда ее освобождает последний подписчик.
+    Все подписчики получают один и тот же объект кадра, без копирования изображения.
+    Медленное открытие камеры выполняется без блокировки broker, поэтому подписка на уже открытые камеры
+    и отписка от них не ждут его окончания. Одну камеру открывает только один поток,
+    остальные подписчики этой камеры ждут результата и затем проверяют его под блокировкой.
+    """
+    def __init__(self):
+        """
+        Инициализация объекта класса.
+        """
+        self.__lock = threading.Lock()
+        self.__captures = {}
+        self.__references = {}
+        # События камер, которые открываются прямо сейчас
+        self.__opening = {}
+
+    def acquire(self, index_of_camera: int, width: Optional[int] = None, height: Optional[int] = None) -> 'SharedCapture':
+        """
+        Подписка на камеру.
+        :param index_of_camera: Индекс камеры, который используется в методе cv2.VideoCapture().
+        :param width: Желаемая ширина кадра, применяется только при открытии камеры.
+        :param height: Желаемая высота кадра, применяется только при открытии камеры.
+        :return: Объект класса SharedCapture, который необходимо освободить методом release().
+        """
+        return SharedCapture(index_of_camera, self, width, height)
+
+    def _open(self, index_of_camera: int, width: Optional[int], height: Optional[int]) -> get_capture.GetCapture:
+        """
+        Увеличение счетчика ссылок на камеру, открытие камеры при первом обращении.
+        """
+        while True:
+            with self.__lock:
+                capture = self.__captures.get(index_of_camera)
+                if capture is not None:
+                    self.__references[index_of_camera] += 1
+                    return capture
+                opening = self.__opening.get(index_of_camera)
+                if opening is None:
+                    opening = self.__opening[index_of_camera] = threading.Event()
+                    break
+            # Камеру открывает другой поток, после этого камера проверяется снова
+            opening.wait()
+
+        capture = None
+        try:
+            capture = get_capture.GetCapture(index_of_camera)
+            if width is not None:
+                capture.set_property(cv2.CAP_PROP_FRAME_WIDTH, width)
+            if height is not None:
+                capture.set_property(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            capture.start()
+        except BaseException:
+            if capture is not None:
+                capture.release()
+            capture = None
+            raise
+        finally:
+            # Публикация открытой камеры, ожидающие подписчики найдут ее при повторной проверке
+            with self.__lock:
+                del self.__opening[index_of_camera]
+                if capture is not None:
+                    self.__captures[index_of_camera] = capture
+                    self.__references[index_of_camera] = 1
+            opening.set()
+        return capture
+
+    def _close(self, index_of_camera: int) -> None:
+        """
+        Уменьшение счетчика ссылок на камеру, закрытие камеры после последнего подписчика.
+        """
+        with self.__lock:
+            if index_of_camera not in self.__references:
+                return
+            self.__references[index_of_camera] -= 1
+            if self.__references[index_of_camera] > 0:
+                return
+            capture = self.__captures.pop(index_of_camera)
+            del self.__references[index_of_camera]
+
+        # Остановка потока вне блокировки, чтобы не задерживать других подписчиков
+        capture.release()
+
+    def active_cameras(self) -> dict:
+        """
+        Получение открытых камер.
+        :return: Словарь вида {индекс камеры: количество подписчиков}.
+        """
+        with self.__lock:
+            return dict(self.__references)
+
+
+class SharedCapture(interfaces.GetCapture):
+    """
+    Класс SharedCapture:
+    Подписка на камеру, которой владеет CameraBroker.
+    Реализует interfaces.GetCapture, поэтому может использоваться вместо GetCapture.
+    Возвращаемые кадры доступны только для чтения.
+    """
+    def __init__(self, index_of_camera: int, camera_broker: Optional[CameraBroker] = None,
+                 width: Optional[int] = None, height: Optional[int] = None):
+        """
+        Инициализация объекта класса.
+        :param index_of_camera: Индекс камеры.
+        :param camera_broker: Объект класса CameraBroker, по умолчанию используется общий broker модуля.
+        :param width: Желаемая ширина кадра.
+        :param height: Желаемая высота кадра.
+        """
+        self.__index = index_of_camera
+        self.__broker = camera_broker if camera_broker is not None else broker
+        self.__capture = self.__broker._open(index_of_camera, width, height)
+        self.__last_sequence = 0
+
+    @property
+    def index(self) -> int:
+        return self.__index
+
+    @property
+    def is_open(self) -> bool:
+        return self.__capture is not None
+
+    def read_latest(self) -> Optional[get_capture.CapturedFrame]:
+        """
+        Получение самого свежего кадра без ожидания.
+        :return: Объект CapturedFrame или None.
+        """
+        if self.__capture is None:
+            return None
+        captured = self.__capture.read_latest()
+        if captured is not None:
+            self.__last_sequence = captured.sequence
+        return captured
+
+    def read_next(self, timeout: Optional[float] = None) -> Optional[get_capture.CapturedFrame]:
+        """
+        Ожидание кадра, который новее последнего полученного этим подписчиком.
+        :param timeout: Максимальное время ожидания в секундах.
+        :return: Объект CapturedFrame или None по истечении времени ожидания.
+        """
+        if self.__capture is None:
+            return None
+        captured = self.__capture.wait_for_frame(self.__last_sequence, timeout)
+        if captured is not None:
+            self.__last_sequence = captured.sequence
+        return captured
+
+    def read_frame(self) -> Optional[get_capture.CapturedFrame]:
+        """
+        Ожидание кадра, который новее последнего полученного этим подписчиком, вместе со временем захвата
+        и порядковым номером. Как и у GetCapture, каждый вызов возвращает новый кадр.
+        :return: Объект CapturedFrame или None, если кадр не получен в течение секунды.
+        """
+        return self.read_next(timeout=1.0)
+
+    def read_capture(self) -> cv2.typing.MatLike:
+        """
+        Основной метод класса.
+        Возвращение самого свежего кадра, новее полученного ранее этим подписчиком.
+        :return frame: Объект класса cv2.typing.MatLike, текущий кадр.
+        """
+        captured = self.read_frame()
+        if captured is not None:
+            return captured.frame
+
+    def release(self) -> None:
+        """
+        Отписка от камеры. Повторный вызов ничего не делает.
+        """
+        if self.__capture is not None:
+            self.__capture = None
+            self.__broker._close(self.__index)
+
+
+# Общий broker для всех подсистем робота
+broker = CameraBroker()
@@ -1,84 +1,436 @@
-import interfaces
-import cv2
-
-
-class ChaseLaser(interfaces.ChaseLaser):
-    """
-    Класс ChaseLaser:
-    Класс, который отвечает за функцию распознавания лазера и перемещения за ним.
-    Использует компьютерное зрение, пороговую обработку.
-    """
-    def __init__(self, camera: cv2.typing.MatLike) -> None:
-        """
-        Инициализация класса
-        :param camera: Объект класса cv2.typing.MatLike, который можно получить, использовав метод cv2.VideoCapture().read()
-        """
-
-        # Инициализация переменных
-        self.__camera = camera
-        self.__action = ''
-        self.__iSee = False
-        self.__controlX = 0.0
-
-    def __preparation(self) -> None:
-        """
-        Обработка кадра.
-        """
-        # Получаем разрешение кадра
-        height, width = self.__camera.shape[0:2]
-
-        # Преобразование кадра
-        hsv = cv2.cvtColor(self.__camera, cv2.COLOR_BGR2HSV)
-
-        # Пороговая обработка
-        bin1 = cv2.inRange(hsv, (0, 60, 70), (10, 255, 255))
-        bin2 = cv2.inRange(hsv, (160, 60, 70), (179, 255, 255))
-        binary = bin1 + bin2
-
-        # Контуры выделенных областей
-        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-        if len(contours) != 0:
-            # Находим наибольший контур
-            maxc = max(contours, key=cv2.contourArea)
-
-            # Получаем моменты этого контура и находим координаты центра
-            moments = cv2.moments(maxc)
-            if moments["m00"] > 10:
-                cx = int(moments["m10"] / moments["m00"])
-                cy = int(moments["m01"] / moments["m00"])
-
-                iSee = True
-                # Находим отклонение найденного объекта от центра кадра и нормализуем его
-                controlX = 2 * (cx - width / 2) / width
-
-
-    def __get_action(self) -> None:
-        """
-        Метод получение действия, в зависимости от координат объекта.
-        """
-        if self.__iSee:
-            self.__action = 'F'
-        else:
-            self.__action = 'S'
-
-        # если мы видим какие-то отклонения, то мы разворачиваемся в центральную часть
-        if self.__controlX < -0.3:
-            self.__action = 'R'
-        if self.__controlX > 0.3:
-            self.__action = 'L'
-
-
-    def __move(self, serial: interfaces.Serial) -> None:
-        """
-        Отправление сигнала по serial порту для передвижения.
-        :param serial: Объект класса interfaces.Serial, отвечает за Serial COM порт.
-        """
-        serial.write(self.__action)
-
-    def chase(self):
-        """
-        Основной метод класса, при вызове которого выполнятся все операции в нужном порядке.
-        """
-        self.__preparation()
-        self.__get_action()
-        self.__move()
+import interfaces
+import latency
+import protocol
+import serial_writer
+import tracing
+import cv2
+import time
+import numpy as np
+from typing import Optional
+
+
+# Диапазоны HSV красного цвета лазера по умолчанию: ((H, S, V) нижняя граница, (H, S, V) верхняя граница)
+LASER_HSV_RANGES = (((0, 60, 70), (10, 255, 255)),
+                    ((160, 60, 70), (179, 255, 255)))
+
+
+class ColorLookupTable:
+    """
+    Класс ColorLookupTable:
+    Таблица соответствия цвет BGR -> попадание в диапазоны HSV.
+    Для каждого из 2^24 цветов заранее вычисляется один бит (таблица занимает 2 МБ),
+    поэтому маска строится без перевода кадра в HSV.
+    Таблица пересчитывается только при изменении диапазонов.
+    Поиск в таблице требует нескольких проходов numpy по кадру и случайного доступа к 2 МБ памяти,
+    поэтому на обычных процессорах он медленнее cvtColor + inRange (на кадре 1280x720 примерно вдвое).
+    Таблица полезна только там, где cvtColor не ускорен, поэтому в ChaseLaser она включается явно.
+    """
+    def __init__(self, hsv_ranges=LASER_HSV_RANGES) -> None:
+        """
+        Инициализация объекта класса.
+        :param hsv_ranges: Последовательность пар (нижняя граница, верхняя граница) в HSV, как в cv2.inRange.
+        """
+        self.__ranges = None
+        self.__table = None
+        self.set_ranges(hsv_ranges)
+
+    @property
+    def ranges(self) -> tuple:
+        return self.__ranges
+
+    def set_ranges(self, hsv_ranges) -> None:
+        """
+        Изменение диапазонов. Если диапазоны не изменились, таблица не пересчитывается.
+        :param hsv_ranges: Последовательность пар (нижняя граница, верхняя граница) в HSV.
+        """
+        ranges = tuple((tuple(int(v) for v in low), tuple(int(v) for v in high)) for low, high in hsv_ranges)
+        if ranges == self.__ranges:
+            return
+        self.__ranges = ranges
+        self.__table = self.__build(ranges)
+
+    @staticmethod
+    def __build(ranges: tuple) -> np.ndarray:
+        """
+        Построение битовой таблицы.
+        Индекс цвета равен (R << 16) | (G << 8) | B, что совпадает с представлением пикселя BGRA как uint32.
+        """
+        table = np.empty(1 << 21, np.uint8)
+        green, blue = np.meshgrid(np.arange(256, dtype=np.uint8), np.arange(256, dtype=np.uint8), indexing='ij')
+        plane = np.empty((256, 256, 3), np.uint8)
+        plane[..., 0] = blue
+        plane[..., 1] = green
+
+        # Переводим в HSV по одной плоскости с фиксированным красным каналом
+        for red in range(256):
+            plane[..., 2] = red
+            hsv = cv2.cvtColor(plane, cv2.COLOR_BGR2HSV)
+            mask = np.zeros((256, 256), np.uint8)
+            for low, high in ranges:
+                mask |= cv2.inRange(hsv, low, high)
+            table[red << 13:(red + 1) << 13] = np.packbits(mask.ravel() != 0, bitorder='little')
+        return table
+
+    def apply(self, image: cv2.typing.MatLike) -> np.ndarray:
+        """
+        Построение бинарной маски.
+        :param image: Изображение в формате BGR.
+        :return: Маска uint8 того же размера, 1 - цвет попал в диапазоны, 0 - нет.
+        """
+        bgra = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+        index = bgra.view(np.uint32).reshape(image.shape[:2])
+        index &= 0xFFFFFF
+
+        # Номер бита внутри байта таблицы, затем номер самого байта
+        bit = index.astype(np.uint8)
+        bit &= 7
+        index >>= 3
+
+        mask = np.take(self.__table, index)
+        mask >>= bit
+        mask &= 1
+        return mask
+
+
+class ChaseLaser(interfaces.ChaseLaser):
+    """
+    Класс ChaseLaser:
+    Класс, который отвечает за функцию распознавания лазера и перемещения за ним.
+    Использует компьютерное зрение, пороговую обработку.
+    В режиме слежения поиск ведется в окне вокруг последнего известного положения точки,
+    а весь кадр просматривается только если точка потеряна.
+    """
+    def __init__(self, camera: cv2.typing.MatLike, serial: Optional[interfaces.Serial] = None,
+                 tracking: bool = True, window: int = 48, max_window: int = 240, velocity_gain: float = 2.0,
+                 hsv_ranges=LASER_HSV_RANGES, use_lut: bool = False,
+                 processing_size: Optional[tuple] = None, coarse_to_fine: bool = True,
+                 proportional: bool = False) -> None:
+        """
+        Инициализация класса
+        :param camera: Объект класса cv2.typing.MatLike, который можно получить, использовав метод cv2.VideoCapture().read()
+        :param serial: Объект класса interfaces.Serial, по которому отправляются команды движения.
+        :param tracking: Если True, включается режим слежения за точкой в окне поиска.
+        :param window: Минимальный размер окна поиска в пикселях.
+        :param max_window: Максимальный размер окна поиска в пикселях.
+        :param velocity_gain: Во сколько раз скорость точки (пикселей за кадр) увеличивает окно поиска.
+        :param hsv_ranges: Диапазоны HSV цвета лазера, пары (нижняя граница, верхняя граница).
+        :param use_lut: Если True, маска строится по таблице ColorLookupTable, иначе через cv2.cvtColor и cv2.inRange.
+        :param processing_size: Максимальный размер (ширина, высота) кадра для полного поиска, None - исходный размер.
+        :param coarse_to_fine: Если True, центр, найденный на уменьшенном кадре, уточняется на фрагменте исходного кадра.
+        :param proportional: Если True, вместо буквенной команды отправляется protocol.Command
+            с поворотом, пропорциональным отклонению точки (для protocol.FramedSerial).
+        """
+
+        # Инициализация переменных
+        self.__camera = camera
+        self.__serial = serial
+        self.__proportional = proportional
+        self.__action = ''
+        self.__iSee = False
+        self.__controlX = 0.0
+
+        # Переменные режима слежения
+        self.__tracking = tracking
+        self.__window = window
+        self.__max_window = max_window
+        self.__velocity_gain = velocity_gain
+        self.__center = None
+        self.__velocity = (0.0, 0.0)
+        self.__roi = None
+
+        # Переменные пороговой обработки
+        self.__hsv_ranges = tuple(hsv_ranges)
+        self.__lut = ColorLookupTable(hsv_ranges) if use_lut else None
+
+        # Переменные многомасштабного поиска и замеров времени
+        self.__processing_size = processing_size
+        self.__coarse_to_fine = coarse_to_fine
+        self.__effective_size = None
+        self.__timings = {}
+
+        # Время захвата и порядковый номер текущего кадра для измерения задержки
+        self.__frame_timestamp = None
+        self.__frame_sequence = None
+        self.__latency = None
+
+    @property
+    def action(self) -> str:
+        return self.__action
+
+    @property
+    def control_x(self) -> float:
+        return self.__controlX
+
+    @property
+    def roi(self) -> Optional[tuple]:
+        """
+        Окно поиска (x, y, ширина, высота) на последнем кадре или None, если просматривался весь кадр.
+        """
+        return self.__roi
+
+    @property
+    def processing_size(self) -> Optional[tuple]:
+        """
+        Размер (ширина, высота), в котором на последнем кадре выполнялся полный поиск.
+        """
+        return self.__effective_size
+
+    @property
+    def timings(self) -> dict:
+        """
+        Время этапов обработки последнего кадра в миллисекундах.
+        Ключи: 'track' - поиск в окне слежения, 'coarse' - поиск на уменьшенном кадре,
+        'refine' - уточнение на исходном кадре, 'full' - поиск на исходном кадре,
+        'action' - выбор действия, 'move' - отправка команды. Этапы, которые не выполнялись, отсутствуют.
+        """
+        return dict(self.__timings)
+
+    @property
+    def frame_sequence(self) -> Optional[int]:
+        """
+        Порядковый номер кадра, по которому принято последнее действие.
+        """
+        return self.__frame_sequence
+
+    @property
+    def latency(self) -> Optional[float]:
+        """
+        Задержка в миллисекундах от захвата последнего кадра до передачи команды по нему в serial,
+        None - время захвата кадра неизвестно.
+        """
+        return self.__latency
+
+    def set_processing_size(self, processing_size: Optional[tuple]) -> None:
+        """
+        Изменение размера кадра для полного поиска.
+        :param processing_size: Максимальный размер (ширина, высота), None - исходный размер.
+        """
+        self.__processing_size = processing_size
+
+    def set_thresholds(self, hsv_ranges) -> None:
+        """
+        Изменение диапазонов HSV цвета лазера.
+        :param hsv_ranges: Диапазоны HSV, пары (нижняя граница, верхняя граница).
+        """
+        self.__hsv_ranges = tuple(hsv_ranges)
+        if self.__lut is not None:
+            self.__lut.set_ranges(hsv_ranges)
+
+    def set_camera(self, camera: cv2.typing.MatLike, timestamp: Optional[float] = None,
+                   sequence: Optional[int] = None) -> None:
+        """
+        Передача нового кадра для обработки.
+        :param camera: Объект класса cv2.typing.MatLike, новый кадр.
+        :param timestamp: Время захвата кадра по time.monotonic(), например CapturedFrame.timestamp.
+        :param sequence: Порядковый номер кадра, например CapturedFrame.sequence.
+        """
+        self.__camera = camera
+        self.__frame_timestamp = timestamp
+        self.__frame_sequence = sequence
+
+    def __find_laser(self, image: cv2.typing.MatLike, min_area: float = 10) -> Optional[tuple]:
+        """
+        Поиск лазерной точки на изображении.
+        :param image: Изображение или его фрагмент в формате BGR.
+        :param min_area: Минимальная площадь контура точки в пикселях image.
+        :return: Координаты центра (cx, cy) относительно image или None, если точка не найдена.
+        """
+        # Пороговая обработка
+        if self.__lut is not None:
+            binary = self.__lut.apply(image)
+        else:
+            hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+            binary = None
+            for low, high in self.__hsv_ranges:
+                part = cv2.inRange(hsv, low, high)
+                binary = part if binary is None else cv2.bitwise_or(binary, part)
+
+        # Контуры выделенных областей
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        if len(contours) != 0:
+            # Находим наибольший контур
+            maxc = max(contours, key=cv2.contourArea)
+
+            # Получаем моменты этого контура и находим координаты центра
+            moments = cv2.moments(maxc)
+            if moments["m00"] > min_area:
+                return moments["m10"] / moments["m00"], moments["m01"] / moments["m00"]
+        return None
+
+    def __search_window(self, width: int, height: int) -> tuple:
+        """
+        Вычисление окна поиска вокруг предсказанного положения точки.
+        Размер окна растет вместе со скоростью точки.
+        :return: Окно (x, y, ширина, высота), ограниченное размерами кадра.
+        """
+        vx, vy = self.__velocity
+        px = self.__center[0] + vx
+        py = self.__center[1] + vy
+        half_w = min(self.__max_window, self.__window + self.__velocity_gain * abs(vx)) / 2
+        half_h = min(self.__max_window, self.__window + self.__velocity_gain * abs(vy)) / 2
+
+        x0 = max(0, int(px - half_w))
+        y0 = max(0, int(py - half_h))
+        x1 = min(width, int(px + half_w) + 1)
+        y1 = min(height, int(py + half_h) + 1)
+        return x0, y0, max(0, x1 - x0), max(0, y1 - y0)
+
+    def __find_full(self, width: int, height: int) -> Optional[tuple]:
+        """
+        Поиск точки на всем кадре.
+        Если задан processing_size, точка ищется на уменьшенном кадре,
+        а затем ее центр уточняется на небольшом фрагменте исходного кадра.
+        :return: Координаты центра (cx, cy) в пикселях исходного кадра или None.
+        """
+        scale = 1.0
+        if self.__processing_size is not None:
+            scale = min(1.0, self.__processing_size[0] / width, self.__processing_size[1] / height)
+
+        if scale >= 1.0:
+            self.__effective_size = (width, height)
+            start = time.perf_counter()
+            center = self.__find_laser(self.__camera)
+            self.__timings['full'] = (time.perf_counter() - start) * 1000
+            return center
+
+        # Грубый поиск на уменьшенном кадре, порог площади пересчитывается под масштаб
+        start = time.perf_counter()
+        small_w, small_h = max(1, round(width * scale)), max(1, round(height * scale))
+        self.__effective_size = (small_w, small_h)
+        small = cv2.resize(self.__camera, (small_w, small_h), interpolation=cv2.INTER_AREA)
+        found = self.__find_laser(small, 10 * scale * scale)
+        self.__timings['coarse'] = (time.perf_counter() - start) * 1000
+        if found is None:
+            return None
+
+        center = (found[0] / scale, found[1] / scale)
+        if not self.__coarse_to_fine:
+            return center
+
+        # Уточнение на фрагменте исходного кадра вокруг грубой оценки
+        start = time.perf_counter()
+        radius = int(self.__window / 2 + 2 / scale)
+        x0 = max(0, int(center[0]) - radius)
+        y0 = max(0, int(center[1]) - radius)
+        x1 = min(width, int(center[0]) + radius + 1)
+        y1 = min(height, int(center[1]) + radius + 1)
+        refined = self.__find_laser(self.__camera[y0:y1, x0:x1])
+        self.__timings['refine'] = (time.perf_counter() - start) * 1000
+        if refined is not None:
+            center = (refined[0] + x0, refined[1] + y0)
+        return center
+
+    def __preparation(self) -> None:
+        """
+        Обработка кадра.
+        """
+        # Получаем разрешение кадра
+        height, width = self.__camera.shape[0:2]
+
+        center = None
+        self.__roi = None
+        self.__timings = {}
+
+        # Сначала ищем точку рядом с последним известным положением
+        if self.__tracking and self.__center is not None:
+            start = time.perf_counter()
+            x, y, w, h = self.__search_window(width, height)
+            if w > 0 and h > 0:
+                self.__roi = (x, y, w, h)
+                found = self.__find_laser(self.__camera[y:y + h, x:x + w])
+                if found is not None:
+                    center = (found[0] + x, found[1] + y)
+            self.__timings['track'] = (time.perf_counter() - start) * 1000
+
+        # Если точка потеряна, просматриваем весь кадр
+        if center is None:
+            self.__roi = None
+            center = self.__find_full(width, height)
+
+        # Обновляем скорость точки для подбора окна на следующем кадре
+        if center is not None and self.__center is not None:
+            self.__velocity = (center[0] - self.__center[0], center[1] - self.__center[1])
+        else:
+            self.__velocity = (0.0, 0.0)
+        self.__center = center
+
+        self.__iSee = center is not None
+        if self.__iSee:
+            # Находим отклонение найденного объекта от центра кадра и нормализуем его
+            self.__controlX = 2 * (int(center[0]) - width / 2) / width
+        else:
+            self.__controlX = 0.0
+
+    def __get_action(self) -> None:
+        """
+        Метод получение действия, в зависимости от координат объекта.
+        """
+        if self.__iSee:
+            self.__action = 'F'
+        else:
+            self.__action = 'S'
+
+        # если мы видим какие-то отклонения, то мы разворачиваемся в центральную часть
+        if self.__controlX < -0.3:
+            self.__action = 'R'
+        if self.__controlX > 0.3:
+            self.__action = 'L'
+
+
+    def __move(self, serial: interfaces.Serial) -> None:
+        """
+        Отправление сигнала по serial порту для передвижения.
+        :param serial: Объект класса interfaces.Serial, отвечает за Serial COM порт.
+        """
+        if serial is None:
+            return
+        if self.__proportional:
+            # Чем сильнее отклонение, тем сильнее поворот и тем медленнее движение вперед
+            speed = 1 - abs(self.__controlX) if self.__iSee else 0.0
+            command = protocol.drive(speed, self.__controlX)
+        else:
+            command = self.__action
+
+        # SerialWriter сам измеряет задержку от захвата кадра до записи команды в порт
+        if isinstance(serial, serial_writer.SerialWriter):
+            serial.write(command, captured_at=self.__frame_timestamp)
+        else:
+            serial.write(command)
+
+    def chase(self):
+        """
+        Основной метод класса, при вызове которого выполнятся все операции в нужном порядке.
+        Время этапов записывается в гистограммы latency.recorder: laser.preparation, laser.action, laser.move,
+        а если известно время захвата кадра, то и laser.frame_age (ожидание кадра до обработки)
+        и laser.command (от захвата кадра до передачи команды в serial).
+        Полная задержка до записи команды в порт (serial.end_to_end) измеряется в SerialWriter,
+        поэтому команду в него нужно передавать вместе со временем захвата кадра.
+        """
+        begin = time.monotonic()
+        with tracing.span('laser.preparation', 'laser'):
+            self.__preparation()
+        preparation = time.monotonic() - begin
+        if not self.__iSee:
+            tracing.tracer.instant('laser.lost', 'laser')
+
+        start = time.perf_counter()
+        with tracing.span('laser.action', 'laser'):
+            self.__get_action()
+        self.__timings['action'] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        with tracing.span('laser.move', 'laser'):
+            self.__move(self.__serial)
+        self.__timings['move'] = (time.perf_counter() - start) * 1000
+        end = time.monotonic()
+
+        recorder = latency.recorder
+        recorder.record('laser.preparation', preparation)
+        recorder.record('laser.action', self.__timings['action'] / 1000)
+        recorder.record('laser.move', self.__timings['move'] / 1000)
+        if self.__frame_timestamp is not None:
+            recorder.record('laser.frame_age', begin - self.__frame_timestamp)
+            recorder.record('laser.command', end - self.__frame_timestamp)
+            self.__latency = (end - self.__frame_timestamp) * 1000
+        else:
+            self.__latency = None
@@ -1,30 +1,210 @@
-import json
-
-global names
-names = {}
-global count_names
-count_names = 0
-
-
-def save() -> None:
-    """
-    Функция сохранения настроек конфигурации.
-    Данные сохраняются в формат файла .json.
-    """
-    with open('data.json', 'w', encoding='utf-8') as json_file:
-        data = {'names': names, 'count_names': count_names}
-        json.dump(data, json_file, ensure_ascii=False, indent=4)
-
-
-def load() -> None:
-    """
-    Функция загрузки настроек конфигурации из .json.
-    """
-    global names
-    global count_names
-    with open('data.json', "r", encoding='utf-8') as file:
-        data = json.load(file)
-
-    _names = data['names']
-    names = {int(key): value for key, value in _names.items()}
-    count_names = data['count_names']
\ No newline at end of file
+import os
+import storage
+import threading
+from types import MappingProxyType
+from typing import Optional
+
+
+class NameRegistry:
+    """
+    Класс NameRegistry:
+    Потокобезопасный список имен людей, которых знает робот.
+    Порядковый номер имени совпадает с именем фотографии в dataset, например dataset/0.jpg.
+    Изменения выполняются под блокировкой, а читатели получают неизменяемый снимок без блокировки,
+    поэтому потоки распознавания могут искать имена на каждом кадре, не мешая графическому интерфейсу.
+    Индекс имен обновляется при каждом изменении только для измененного имени.
+    save() не задерживает вызывающий поток: изменения, сделанные за flush_delay секунд, записываются вместе
+    в фоновом потоке, в журнал хранилища дописываются только они. Поток сохранения не фоновый (daemon) для Python,
+    поэтому при обычном завершении программы он успевает записать изменения.
+    flush() - явная точка сохранности: после его возврата изменения на диске и переживут аварийное завершение.
+    Его вызывают после подтверждения нового человека и при остановке робота, не из потока интерфейса.
+    """
+    def __init__(self, names_storage: storage.AppendLogStorage, flush_delay: float = 0.5):
+        """
+        Инициализация объекта класса.
+        :param names_storage: Объект класса storage.AppendLogStorage, в котором хранятся имена.
+        :param flush_delay: Задержка перед сохранением в секундах, за это время изменения накапливаются.
+        """
+        self.__storage = names_storage
+        self.__flush_delay = flush_delay
+        self.__lock = threading.Lock()
+        self.__flush_lock = threading.Lock()
+        self.__names = MappingProxyType({})
+        self.__ids_by_name = MappingProxyType({})
+        # Все номера каждого имени по возрастанию, последний из них публикуется в __ids_by_name
+        self.__all_ids = {}
+        self.__count = 0
+        self.__changes = {}
+        self.__flush_timer = None
+
+    @property
+    def count(self) -> int:
+        """
+        Следующий свободный порядковый номер.
+        """
+        return self.__count
+
+    def snapshot(self) -> MappingProxyType:
+        """
+        Получение всех имен без блокировки.
+        :return: Неизменяемый словарь {порядковый номер: имя}, который не меняется при последующих изменениях.
+        """
+        return self.__names
+
+    def get(self, person_id: int, default: str = '') -> str:
+        """
+        Получение имени по порядковому номеру.
+        """
+        return self.__names.get(person_id, default)
+
+    def find(self, name: str) -> Optional[int]:
+        """
+        Получение порядкового номера по имени. Если имен несколько, возвращается последний номер.
+        :return: Порядковый номер или None.
+        """
+        return self.__ids_by_name.get(name)
+
+    def add(self, name: str) -> int:
+        """
+        Добавление имени.
+        :param name: Имя человека.
+        :return: Выданный порядковый номер.
+        """
+        with self.__lock:
+            # Выданный номер больше всех существующих, поэтому он становится последним номером этого имени
+            person_id = self.__count
+            self.__all_ids.setdefault(name, []).append(person_id)
+            names = dict(self.__names)
+            names[person_id] = name
+            ids_by_name = dict(self.__ids_by_name)
+            ids_by_name[name] = person_id
+            self.__names = MappingProxyType(names)
+            self.__ids_by_name = MappingProxyType(ids_by_name)
+            self.__count += 1
+            self.__changes[person_id] = name
+        return person_id
+
+    def remove(self, person_id: int) -> None:
+        """
+        Удаление имени. Если удаляется последнее выданное имя, его номер будет выдан снова,
+        чтобы следующая фотография заняла тот же файл dataset.
+        :param person_id: Порядковый номер имени.
+        """
+        with self.__lock:
+            if person_id not in self.__names:
+                return
+            names = dict(self.__names)
+            name = names.pop(person_id)
+            ids = self.__all_ids[name]
+            ids.remove(person_id)
+            ids_by_name = dict(self.__ids_by_name)
+            if ids:
+                ids_by_name[name] = ids[-1]
+            else:
+                del self.__all_ids[name]
+                del ids_by_name[name]
+            self.__names = MappingProxyType(names)
+            self.__ids_by_name = MappingProxyType(ids_by_name)
+            if person_id == self.__count - 1:
+                self.__count -= 1
+            self.__changes[person_id] = None
+
+    def __publish(self, names: dict, count: int) -> None:
+        """
+        Подмена снимка всеми именами с построением индекса заново. Вызывается под блокировкой.
+        """
+        all_ids = {}
+        for person_id in sorted(names):
+            all_ids.setdefault(names[person_id], []).append(person_id)
+        self.__all_ids = all_ids
+        self.__names = MappingProxyType(names)
+        self.__ids_by_name = MappingProxyType({name: ids[-1] for name, ids in all_ids.items()})
+        self.__count = count
+
+    def load(self) -> None:
+        """
+        Загрузка имен из хранилища.
+        """
+        names, count = self.__storage.load()
+        with self.__lock:
+            self.__publish(names, count)
+            self.__changes = {}
+
+    def replace(self, names: dict, count: int) -> None:
+        """
+        Замена всех имен данными, которые уже записаны в хранилище, например после импорта из .json.
+        """
+        with self.__lock:
+            self.__publish(dict(names), count)
+            self.__changes = {}
+
+    def save(self) -> None:
+        """
+        Отложенное сохранение в фоновом потоке. Изменения, сделанные за flush_delay секунд, сохраняются вместе.
+        """
+        with self.__lock:
+            if self.__flush_timer is not None:
+                return
+            self.__flush_timer = threading.Timer(self.__flush_delay, self.flush)
+            self.__flush_timer.name = 'NameRegistry.save'
+            self.__flush_timer.start()
+
+    def flush(self) -> None:
+        """
+        Немедленное сохранение. В журнал хранилища одной записью с fsync дописываются только имена,
+        измененные после прошлого сохранения, а сжатие журнала выполняется в фоновом потоке хранилища.
+        """
+        # Отдельная блокировка сохранения, чтобы старые изменения не были записаны после новых
+        with self.__flush_lock:
+            with self.__lock:
+                if self.__flush_timer is not None:
+                    self.__flush_timer.cancel()
+                    self.__flush_timer = None
+                changes, self.__changes = self.__changes, {}
+                count = self.__count
+            self.__storage.update(changes, count)
+
+
+# Хранилище настроек: снимок и журнал изменений рядом с data.json
+_storage = storage.AppendLogStorage('.', 'data')
+
+# Общий список имен для всех подсистем робота
+registry = NameRegistry(_storage)
+
+
+def save() -> None:
+    """
+    Функция сохранения настроек конфигурации.
+    Сохранение выполняется в фоновом потоке, в журнал хранилища дописываются только изменения,
+    поэтому время сохранения не зависит от количества имен и не задерживает вызывающий поток.
+    """
+    registry.save()
+
+
+def load() -> None:
+    """
+    Функция загрузки настроек конфигурации.
+    При первом запуске данные переносятся в хранилище из data.json.
+    """
+    if not _storage.exists and os.path.exists('data.json'):
+        _storage.load()
+        registry.replace(*_storage.import_json('data.json'))
+    else:
+        registry.load()
+
+
+def export_json(path: str = 'data.json') -> None:
+    """
+    Функция выгрузки настроек конфигурации в формат файла .json.
+    :param path: Путь к файлу .json.
+    """
+    registry.flush()
+    _storage.export_json(path)
+
+
+def import_json(path: str = 'data.json') -> None:
+    """
+    Функция загрузки настроек конфигурации из .json с заменой текущих.
+    :param path: Путь к файлу .json.
+    """
+    registry.replace(*_storage.import_json(path))
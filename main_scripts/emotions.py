@@ -1,70 +1,313 @@
-import interfaces
-import cv2
-import threading
-import time
-
-
-class ShowEmotions(interfaces.ShowEmotions):
-    """
-    Класс ShowEmotions:
-    Класс, который отвечает за показ эмоций на экране.
-    Использует opencv для отображения заранее заготовленных эмоций.
-    """
-    def __init__(self, emotion_folder: str):
-        """
-        Инициализация объекта класса.
-        :param emotion_folder: Путь к директории с эмоциями
-        """
-        self.__folder = emotion_folder
-        self.__current_emotion = ''
-        self.__speed = 0
-        self.change_emotion('blink.mp4')
-        self.__video_capture = cv2.VideoCapture(self.__current_emotion)
-
-    def show(self) -> None:
-        """
-        Основной метод.
-        Отображение эмоции.
-        """
-        # Чтение видео с выбранной эмоцией
-        success, frame = self.__video_capture.read()
-
-        # Если успешно, выводит изображение
-        if success:
-            cv2.imshow("Image", frame)
-        if cv2.waitKey(self.__speed) & 0xFF == ord('q'):
-            print('end')
-
-    def change_emotion(self, emotion: str, speed=60) -> None:
-        """
-        Метод для смены эмоции.
-        :param emotion: Строка, название эмоции, на которую необходимо сменить нынешнюю.
-        :param speed: Скорость смены кадров в миллисекундах.
-        """
-        self.__current_emotion = self.__folder + emotion
-        self.__speed = speed
-        self.__video_capture = cv2.VideoCapture(self.__current_emotion)
-
-
-show = ShowEmotions('emojis/')
-
-
-'''def show_():
-    while True:
-        show.show()
-
-
-def main():
-    thread = threading.Thread(target=show_)
-    thread.start()
-    time.sleep(5)
-    show.change_emotion('sadblink.mp4')
-    show.show()
-
-
-if __name__ == '__main__':
-    main()
-
-Example of usage
-    
+import interfaces
+import cv2
+import os
+import threading
+import time
+import tracing
+import numpy as np
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+
+class EmotionClip(NamedTuple):
+    """
+    Заранее декодированная эмоция.
+    frames - уникальные кадры одним массивом (количество, высота, ширина, 3),
+    order - номер кадра из frames для каждой позиции воспроизведения,
+    fps - частота кадров исходного видео.
+    """
+    frames: np.ndarray
+    order: np.ndarray
+    fps: float
+
+    @property
+    def nbytes(self) -> int:
+        return self.frames.nbytes + self.order.nbytes
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def frame(self, position: int) -> np.ndarray:
+        """
+        Получение кадра по позиции воспроизведения, с повтором по кругу.
+        """
+        return self.frames[self.order[position % len(self.order)]]
+
+
+def decode_clip(path: str, frame_size: Optional[tuple] = None) -> EmotionClip:
+    """
+    Декодирование видео эмоции в память.
+    Подряд идущие одинаковые кадры хранятся один раз.
+    :param path: Путь к видео.
+    :param frame_size: Размер (ширина, высота), к которому приводятся кадры, None - исходный размер.
+    :return: Объект EmotionClip.
+    :raises ValueError: Если видео не удалось прочитать.
+    """
+    video_capture = cv2.VideoCapture(path)
+    fps = video_capture.get(cv2.CAP_PROP_FPS) or 30.0
+
+    frames = []
+    order = []
+    previous = None
+    while True:
+        success, frame = video_capture.read()
+        if not success:
+            break
+        if frame_size is not None and (frame.shape[1], frame.shape[0]) != tuple(frame_size):
+            frame = cv2.resize(frame, tuple(frame_size), interpolation=cv2.INTER_AREA)
+        if previous is None or not np.array_equal(frame, previous):
+            frames.append(frame)
+            previous = frame
+        order.append(len(frames) - 1)
+    video_capture.release()
+
+    if not frames:
+        raise ValueError(f'Не удалось прочитать видео {path}')
+    return EmotionClip(np.stack(frames), np.array(order, dtype=np.uint16), fps)
+
+
+class EmotionCache:
+    """
+    Класс EmotionCache:
+    Кэш декодированных эмоций с вытеснением давно не использованных (LRU).
+    Суммарный размер кадров в памяти не превышает memory_budget байт.
+    """
+    def __init__(self, memory_budget: int = 128 * 1024 * 1024, frame_size: Optional[tuple] = None):
+        """
+        Инициализация объекта класса.
+        :param memory_budget: Максимальный объем памяти под кадры в байтах.
+        :param frame_size: Размер (ширина, высота), к которому приводятся кадры, None - исходный размер.
+        """
+        self.__memory_budget = memory_budget
+        self.__frame_size = frame_size
+        self.__clips = OrderedDict()
+        self.__used = 0
+        self.__lock = threading.Lock()
+
+    @property
+    def used(self) -> int:
+        """
+        Объем памяти, занятый кадрами, в байтах.
+        """
+        return self.__used
+
+    def __contains__(self, path: str) -> bool:
+        return os.path.normpath(path) in self.__clips
+
+    def get(self, path: str) -> EmotionClip:
+        """
+        Получение эмоции. При отсутствии в кэше эмоция декодируется и добавляется в кэш.
+        :param path: Путь к видео.
+        :return: Объект EmotionClip.
+        """
+        path = os.path.normpath(path)
+        with self.__lock:
+            clip = self.__clips.get(path)
+            if clip is not None:
+                self.__clips.move_to_end(path)
+                return clip
+
+        # Декодирование вне блокировки, чтобы не задерживать получение других эмоций
+        clip = decode_clip(path, self.__frame_size)
+        with self.__lock:
+            if path not in self.__clips:
+                self.__store(path, clip)
+        return clip
+
+    def __store(self, path: str, clip: EmotionClip) -> None:
+        """
+        Добавление эмоции с вытеснением самых старых.
+        Эмоция больше всего бюджета не сохраняется.
+        """
+        if clip.nbytes > self.__memory_budget:
+            return
+        while self.__clips and self.__used + clip.nbytes > self.__memory_budget:
+            _, old = self.__clips.popitem(last=False)
+            self.__used -= old.nbytes
+        self.__clips[path] = clip
+        self.__used += clip.nbytes
+
+    def preload(self, folder: str, extensions: tuple = ('.mp4', '.avi')) -> list:
+        """
+        Декодирование всех эмоций из директории.
+        :param folder: Путь к директории с эмоциями.
+        :param extensions: Расширения видеофайлов.
+        :return: Список путей загруженных эмоций.
+        """
+        paths = []
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(extensions):
+                path = os.path.join(folder, name)
+                self.get(path)
+                paths.append(path)
+        return paths
+
+
+class ShowEmotions(interfaces.ShowEmotions):
+    """
+    Класс ShowEmotions:
+    Класс, который отвечает за показ эмоций на экране.
+    Использует opencv для отображения заранее заготовленных эмоций.
+    Эмоции декодируются один раз и хранятся в памяти (EmotionCache), поэтому смена эмоции не требует открытия видео.
+    Номер показываемого кадра вычисляется по монотонным часам от начала эмоции,
+    поэтому воспроизведение не отстает: если показ не успевает, лишние кадры пропускаются.
+    Первая эмоция декодируется при первом показе, поэтому создание объекта не читает видео с диска.
+    """
+    def __init__(self, emotion_folder: str, memory_budget: int = 128 * 1024 * 1024,
+                 frame_size: Optional[tuple] = None, preload: bool = False):
+        """
+        Инициализация объекта класса.
+        :param emotion_folder: Путь к директории с эмоциями
+        :param memory_budget: Максимальный объем памяти под декодированные эмоции в байтах.
+        :param frame_size: Размер (ширина, высота) кадров эмоций в памяти, None - исходный размер.
+        :param preload: Если True, все эмоции из директории декодируются сразу.
+        """
+        self.__folder = emotion_folder
+        self.__cache = EmotionCache(memory_budget, frame_size)
+        self.__current_emotion = self.__folder + 'blink.mp4'
+        self.__clip = None
+        self.__speed = 0
+
+        # Переменные планировщика показа
+        self.__lock = threading.Lock()
+        self.__wakeup = threading.Event()
+        self.__started_at = 0.0
+        self.__last_position = -1
+        self.__running = False
+        self.__thread = None
+        self.__shown = 0
+        self.__dropped = 0
+        self.__fps_window = []
+
+        if preload:
+            self.__cache.preload(self.__folder)
+
+    @property
+    def cache(self) -> EmotionCache:
+        return self.__cache
+
+    @property
+    def statistics(self) -> dict:
+        """
+        Статистика показа: fps - достигнутая частота кадров за последнюю секунду,
+        shown - показано кадров, dropped - пропущено кадров из-за отставания.
+        """
+        with self.__lock:
+            now = time.monotonic()
+            recent = [t for t in self.__fps_window if now - t <= 1.0]
+            fps = (len(recent) - 1) / (recent[-1] - recent[0]) if len(recent) > 1 and recent[-1] > recent[0] else 0.0
+            return {'fps': fps, 'shown': self.__shown, 'dropped': self.__dropped}
+
+    def __render(self) -> float:
+        """
+        Показ кадра, который должен быть на экране в текущий момент.
+        :return: Время в секундах до момента показа следующего кадра.
+        """
+        if self.__clip is None:
+            self.change_emotion(self.__current_emotion[len(self.__folder):])
+
+        with self.__lock:
+            clip, interval = self.__clip, self.__speed / 1000
+            now = time.monotonic()
+            position = int((now - self.__started_at) / interval)
+            if position == self.__last_position:
+                return self.__started_at + (position + 1) * interval - now
+
+            # Кадры между последним показанным и текущим не успели показать
+            if self.__last_position >= 0 and position > self.__last_position + 1:
+                self.__dropped += position - self.__last_position - 1
+            self.__last_position = position
+            self.__shown += 1
+            self.__fps_window.append(now)
+            if len(self.__fps_window) > 2 * clip.fps + 2:
+                del self.__fps_window[0]
+
+        with tracing.span('emotions.render', 'emotions'):
+            cv2.imshow("Image", clip.frame(position))
+        return max(0.0, self.__started_at + (position + 1) * interval - time.monotonic())
+
+    def show(self) -> None:
+        """
+        Основной метод.
+        Отображение эмоции.
+        Показывает текущий кадр и ожидает момента показа следующего.
+        """
+        delay = self.__render()
+        if cv2.waitKey(max(1, int(delay * 1000))) & 0xFF == ord('q'):
+            print('end')
+
+    def start(self) -> None:
+        """
+        Запуск показа эмоций в отдельном потоке.
+        После запуска метод show() вызывать не нужно.
+        """
+        if self.__running:
+            return
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__render_loop, name='ShowEmotions', daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        """
+        Остановка потока показа.
+        """
+        self.__running = False
+        self.__wakeup.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __render_loop(self) -> None:
+        """
+        Цикл потока показа.
+        waitKey(1) нужен для обработки событий окна opencv, остальное время поток спит до следующего кадра.
+        """
+        while self.__running:
+            delay = self.__render()
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                print('end')
+            self.__wakeup.wait(max(0.0, delay - 0.001))
+            self.__wakeup.clear()
+
+    def change_emotion(self, emotion: str, speed=None) -> None:
+        """
+        Метод для смены эмоции. Может вызываться из любого потока.
+        :param emotion: Строка, название эмоции, на которую необходимо сменить нынешнюю.
+        :param speed: Скорость смены кадров в миллисекундах, None - частота кадров исходного видео.
+        :raises ValueError: Если speed не больше нуля.
+        """
+        if speed is not None and speed <= 0:
+            raise ValueError(f'Скорость смены кадров должна быть больше нуля, получено {speed}')
+        clip = self.__cache.get(self.__folder + emotion)
+        with self.__lock:
+            self.__current_emotion = self.__folder + emotion
+            self.__clip = clip
+            self.__speed = speed if speed is not None else 1000 / clip.fps
+            self.__started_at = time.monotonic()
+            self.__last_position = -1
+        self.__wakeup.set()
+
+
+# Общий показ эмоций, видео декодируется только при первом показе
+show = ShowEmotions('emojis/')
+
+
+'''def show_():
+    while True:
+        show.show()
+
+
+def main():
+    thread = threading.Thread(target=show_)
+    thread.start()
+    time.sleep(5)
+    show.change_emotion('sadblink.mp4')
+    show.show()
+
+
+if __name__ == '__main__':
+    main()
+
+Example of usage
+    
 '''
\ No newline at end of file
@@ -0,0 +1,238 @@
+import concurrent.futures
+import hashlib
+import os
+import tempfile
+import threading
+import numpy as np
+from typing import Callable, Optional
+
+
+# Файл кэша по умолчанию, хранится рядом с фотографиями
+CACHE_PATH = 'dataset/encodings.npz'
+
+
+def file_hash(path: str) -> str:
+    """
+    Вычисление SHA-1 содержимого файла.
+    :param path: Путь к файлу.
+    :return: Шестнадцатеричная строка хэша.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EncodingCache:
+    """
+    Класс EncodingCache:
+    Хранение на диске векторов лиц (encodings) для фотографий из dataset.
+    Запись кэша привязана к пути фотографии, ее размеру, времени изменения и хэшу содержимого,
+    поэтому при запуске заново вычисляются только новые и измененные фотографии,
+    а остальные загружаются из одного файла .npz за одно чтение.
+    """
+    def __init__(self, encoder: Callable[[str], Optional[np.ndarray]], cache_path: str = CACHE_PATH):
+        """
+        Инициализация объекта класса.
+        :param encoder: Функция, которая по пути фотографии возвращает вектор лица или None, если лица нет.
+            Для вычисления в нескольких процессах функция должна быть объявлена на уровне модуля.
+        :param cache_path: Путь к файлу кэша.
+        """
+        self.__encoder = encoder
+        self.__cache_path = cache_path
+        self.__entries = {}
+        self.__lock = threading.Lock()
+        self.__save_lock = threading.Lock()
+        # Пути, удаленные invalidate() во время вычисления векторов в encodings(), и количество таких вычислений
+        self.__tombstones = []
+        self.__active = 0
+        self.__load()
+
+    def __load(self) -> None:
+        """
+        Загрузка кэша с диска. Поврежденный или отсутствующий кэш считается пустым и будет пересоздан.
+        """
+        try:
+            with np.load(self.__cache_path, allow_pickle=False) as data:
+                paths = data['paths']
+                sizes = data['sizes']
+                mtimes = data['mtimes']
+                hashes = data['hashes']
+                has_face = data['has_face']
+                encodings = data['encodings']
+        except Exception as error:
+            # Пустой или обрезанный файл дает EOFError и zipfile.BadZipFile, а не только OSError и ValueError
+            if os.path.exists(self.__cache_path):
+                print(f'Encoding cache {self.__cache_path} is damaged and will be rebuilt: {error!r}')
+            return
+
+        for i, path in enumerate(paths):
+            encoding = encodings[i] if has_face[i] else None
+            self.__entries[str(path)] = (int(sizes[i]), float(mtimes[i]), str(hashes[i]), encoding)
+
+    def save(self) -> None:
+        """
+        Сохранение кэша на диск.
+        Запись идет во временный файл с уникальным именем, который затем атомарно заменяет старый кэш,
+        поэтому одновременные сохранения (в том числе из другого процесса) не портят файлы друг друга.
+        Сохранения этого объекта выполняются по очереди, чтобы более старое состояние не заменило более новое.
+        """
+        with self.__save_lock:
+            with self.__lock:
+                entries = dict(self.__entries)
+            self.__save(entries)
+
+    def __save(self, entries: dict) -> None:
+        """
+        Запись записей кэша в файл.
+        """
+        paths = sorted(entries)
+        dimension = next((len(e[3]) for e in entries.values() if e[3] is not None), 0)
+        encodings = np.zeros((len(paths), dimension), dtype=np.float64)
+        has_face = np.zeros(len(paths), dtype=bool)
+        for i, path in enumerate(paths):
+            if entries[path][3] is not None:
+                encodings[i] = entries[path][3]
+                has_face[i] = True
+
+        directory = os.path.dirname(self.__cache_path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(prefix=os.path.basename(self.__cache_path) + '.', suffix='.tmp',
+                                                 dir=directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                np.savez(file,
+                         paths=np.array(paths, dtype=str),
+                         sizes=np.array([entries[p][0] for p in paths], dtype=np.int64),
+                         mtimes=np.array([entries[p][1] for p in paths], dtype=np.float64),
+                         hashes=np.array([entries[p][2] for p in paths], dtype=str),
+                         has_face=has_face,
+                         encodings=encodings)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, self.__cache_path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def __lookup(self, path: str, stat: os.stat_result) -> tuple:
+        """
+        Поиск актуальной записи для фотографии.
+        :return: Пара (запись или None, хэш содержимого или None, если он не вычислялся).
+        """
+        entry = self.__entries.get(path)
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime:
+            return entry, None
+
+        # Время изменения другое, но содержимое могло остаться прежним
+        digest = file_hash(path)
+        if entry is not None and entry[2] == digest:
+            return (stat.st_size, stat.st_mtime, digest, entry[3]), digest
+        return None, digest
+
+    def encodings(self, paths: list, workers: int = 1, chunksize: int = 4,
+                  progress: Optional[Callable[[int, int], None]] = None) -> list:
+        """
+        Получение векторов лиц для фотографий.
+        Записи фотографий, которых нет в paths или на диске, удаляются из кэша.
+        Если кэш изменился, он сохраняется на диск.
+        Блокировка не удерживается во время вычисления векторов, поэтому store() и invalidate() из других потоков
+        не ждут его окончания. Записи, измененные ими за это время, сохраняются, а удаленные invalidate()
+        не возвращаются в кэш: вектор такой фотографии возвращается, но при следующем вызове вычисляется заново.
+        :param paths: Список путей к фотографиям.
+        :param workers: Количество процессов для вычисления новых векторов, 1 - в текущем процессе.
+        :param chunksize: Количество фотографий, которое процесс получает за один раз.
+        :param progress: Функция progress(готово, всего), вызывается после каждой вычисленной фотографии.
+        :return: Список векторов лиц в том же порядке, None для фотографий без лица.
+        """
+        changed = False
+        with self.__lock:
+            fresh = {}
+            missing = []
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                entry, digest = self.__lookup(path, stat)
+                if entry is None:
+                    missing.append((path, stat, digest))
+                    continue
+                if entry is not self.__entries.get(path):
+                    changed = True
+                fresh[path] = entry
+            before = dict(self.__entries)
+            start = len(self.__tombstones)
+            self.__active += 1
+
+        # Вычисление векторов только для новых и измененных фотографий
+        missing_paths = [path for path, _, _ in missing]
+        try:
+            for i, encoding in enumerate(self.__encode(missing_paths, workers, chunksize)):
+                path, stat, digest = missing[i]
+                fresh[path] = (stat.st_size, stat.st_mtime, digest, encoding)
+                changed = True
+                if progress is not None:
+                    progress(i + 1, len(missing))
+        finally:
+            with self.__lock:
+                removed = set(self.__tombstones[start:])
+                self.__active -= 1
+                if not self.__active:
+                    self.__tombstones = []
+
+        with self.__lock:
+            result = dict(fresh)
+            # Записи, удаленные invalidate() во время вычисления, устарели
+            for path in removed:
+                fresh.pop(path, None)
+            # Записи, которые store() добавил или изменил во время вычисления, новее вычисленных здесь
+            for path, entry in self.__entries.items():
+                if before.get(path) is not entry:
+                    fresh[path] = result[path] = entry
+            if set(fresh) != set(self.__entries):
+                changed = True
+            self.__entries = fresh
+
+        if changed:
+            self.save()
+        return [result[path][3] if path in result else None for path in paths]
+
+    def __encode(self, paths: list, workers: int, chunksize: int):
+        """
+        Вычисление векторов лиц, последовательно или в пуле процессов.
+        Порядок результатов совпадает с порядком paths в обоих случаях.
+        """
+        if workers <= 1 or len(paths) <= 1:
+            for path in paths:
+                yield self.__encoder(path)
+            return
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+            yield from executor.map(self.__encoder, paths, chunksize=max(1, chunksize))
+
+    def store(self, path: str, encoding: Optional[np.ndarray]) -> None:
+        """
+        Запись уже вычисленного вектора лица для фотографии, чтобы при следующем запуске не вычислять его снова.
+        :param path: Путь к фотографии.
+        :param encoding: Вектор лица или None, если лица нет.
+        """
+        stat = os.stat(path)
+        digest = file_hash(path)
+        with self.__lock:
+            self.__entries[path] = (stat.st_size, stat.st_mtime, digest, encoding)
+        self.save()
+
+    def invalidate(self, path: str) -> None:
+        """
+        Удаление записи фотографии, например после того, как фото переснято.
+        :param path: Путь к фотографии.
+        """
+        with self.__lock:
+            removed = self.__entries.pop(path, None) is not None
+            if self.__active:
+                self.__tombstones.append(path)
+        if removed:
+            self.save()
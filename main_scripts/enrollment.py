@@ -0,0 +1,203 @@
+import encoding_cache
+import face_matcher
+import queue
+import threading
+import numpy as np
+from typing import Callable, Optional
+
+
+class Enrollment:
+    """
+    Класс Enrollment:
+    Добавление новых людей в работающее распознавание без перезапуска.
+    Кадр, снятый в PictureInterface, сразу отправляется на вычисление вектора лица в фоновом потоке (prepare).
+    Когда пользователь подтверждает фото (commit), вектор атомарно добавляется в GalleryMatcher,
+    заменяя прежние векторы этого человека. Если фото переснимается или имя меняется, подготовленный вектор отбрасывается (discard).
+    Добавление в галерею и запись в кэш тоже выполняются в фоновом потоке, о завершении сообщает функция,
+    переданная в commit(), поэтому вызывающий поток (например, поток графического интерфейса) ничего не ждет.
+    """
+    def __init__(self, matcher: face_matcher.GalleryMatcher, encoder: Callable[[np.ndarray], Optional[np.ndarray]],
+                 cache: Optional[encoding_cache.EncodingCache] = None):
+        """
+        Инициализация объекта класса.
+        :param matcher: Объект класса GalleryMatcher, в который добавляются люди.
+        :param encoder: Функция, которая по кадру BGR возвращает вектор лица или None, если лица нет.
+        :param cache: Объект класса EncodingCache, в который записывается вектор фотографии, None - не записывать.
+        """
+        self.__matcher = matcher
+        self.__encoder = encoder
+        self.__cache = cache
+
+        self.__lock = threading.Lock()
+        self.__pending = {}
+        self.__commits = {}
+        self.__versions = {}
+        self.__queue = queue.Queue()
+        self.__thread = threading.Thread(target=self.__worker, name='Enrollment', daemon=True)
+        self.__thread.start()
+
+    def prepare(self, person_id: int, frame: np.ndarray, path: Optional[str] = None) -> None:
+        """
+        Запуск фонового вычисления вектора лица для нового кадра человека.
+        Более ранний кадр этого человека, если он еще не подтвержден, отбрасывается.
+        :param person_id: Порядковый номер имени.
+        :param frame: Кадр BGR.
+        :param path: Путь, по которому кадр сохранен в dataset, для записи в кэш.
+        """
+        with self.__lock:
+            version = self.__versions.get(person_id, 0) + 1
+            self.__versions[person_id] = version
+            dropped = self.__drop(person_id)
+        self.__finish(dropped)
+        self.__queue.put(('encode', person_id, version, frame, path))
+
+    def commit(self, person_id: int, callback: Optional[Callable[[bool], None]] = None) -> None:
+        """
+        Подтверждение последнего кадра человека. Метод сразу возвращает управление,
+        вектор добавляется в галерею в фоновом потоке, как только он вычислен.
+        :param person_id: Порядковый номер имени.
+        :param callback: Функция callback(добавлен), вызывается в фоновом потоке один раз:
+            True - вектор добавлен в галерею и кэш, False - лица на кадре нет, вычисление не удалось
+            или кадр отменен до добавления.
+        """
+        with self.__lock:
+            version = self.__versions.get(person_id)
+            if version is not None:
+                previous = self.__commits.get(person_id)
+                self.__commits[person_id] = (version, callback)
+                ready = self.__pending.get(person_id)
+        if version is None:
+            self.__finish([callback], False)
+            return
+        # Повторное подтверждение того же кадра заменяет функцию, прежняя получает False
+        if previous is not None:
+            self.__finish([previous[1]], False)
+        if ready is not None and ready[0] == version:
+            self.__queue.put(('apply', person_id, version))
+
+    def discard(self, person_id: int) -> None:
+        """
+        Отмена неподтвержденного кадра человека, галерея не меняется.
+        :param person_id: Порядковый номер имени.
+        """
+        with self.__lock:
+            self.__versions[person_id] = self.__versions.get(person_id, 0) + 1
+            dropped = self.__drop(person_id)
+        self.__finish(dropped)
+
+    def remove(self, person_id: int) -> None:
+        """
+        Удаление человека из галереи вместе с неподтвержденным кадром.
+        :param person_id: Порядковый номер имени.
+        """
+        self.discard(person_id)
+        self.__matcher.remove(person_id)
+
+    def invalidate(self, path: str) -> None:
+        """
+        Удаление записи фотографии из кэша, например после того, как фото переснято.
+        Запись идет через тот же объект кэша, что и при добавлении людей, поэтому записи кэша не перезаписывают друг друга.
+        :param path: Путь к фотографии.
+        """
+        if self.__cache is not None:
+            self.__cache.invalidate(path)
+
+    def wait(self) -> None:
+        """
+        Ожидание окончания вычисления всех переданных кадров и добавления подтвержденных.
+        """
+        self.__queue.join()
+
+    def __drop(self, person_id: int) -> list:
+        """
+        Удаление подготовленного вектора и подтверждения человека. Вызывается под блокировкой.
+        :return: Список функций подтверждения, которым нужно сообщить False.
+        """
+        self.__pending.pop(person_id, None)
+        commit = self.__commits.pop(person_id, None)
+        return [commit[1]] if commit is not None else []
+
+    @staticmethod
+    def __finish(callbacks: list, added: bool = False) -> None:
+        """
+        Вызов функций подтверждения вне блокировки. Ошибка функции выводится и не останавливает поток.
+        """
+        for callback in callbacks:
+            if callback is None:
+                continue
+            try:
+                callback(added)
+            except Exception as error:
+                print(f'Enrollment callback failed: {error!r}')
+
+    def __worker(self) -> None:
+        """
+        Цикл фонового потока вычисления векторов лиц.
+        Ошибка вычисления одного кадра выводится и отбрасывает только этот кадр, поток продолжает работу.
+        """
+        while True:
+            kind, person_id, version, *arguments = self.__queue.get()
+            try:
+                if kind == 'apply':
+                    self.__apply(person_id, version)
+                else:
+                    self.__encode(person_id, version, *arguments)
+            finally:
+                self.__queue.task_done()
+
+    def __encode(self, person_id: int, version: int, frame: np.ndarray, path: Optional[str]) -> None:
+        """
+        Вычисление вектора лица кадра. Если кадр уже подтвержден, вектор сразу добавляется в галерею.
+        """
+        with self.__lock:
+            if self.__versions.get(person_id) != version:
+                return
+
+        try:
+            encoding = self.__encoder(frame)
+        except Exception as error:
+            print(f'Encoding failed for id {person_id}: {error!r}')
+            with self.__lock:
+                commit = self.__commits.get(person_id)
+                if commit is None or commit[0] != version:
+                    return
+                del self.__commits[person_id]
+            self.__finish([commit[1]], False)
+            return
+
+        with self.__lock:
+            if self.__versions.get(person_id) != version:
+                return
+            self.__pending[person_id] = (version, encoding, path)
+            commit = self.__commits.get(person_id)
+        if commit is not None and commit[0] == version:
+            self.__apply(person_id, version)
+
+    def __apply(self, person_id: int, version: int) -> None:
+        """
+        Добавление подтвержденного вектора в галерею и кэш. Выполняется в фоновом потоке.
+        """
+        with self.__lock:
+            ready = self.__pending.get(person_id)
+            commit = self.__commits.get(person_id)
+            if ready is None or ready[0] != version or commit is None or commit[0] != version:
+                return
+            del self.__pending[person_id]
+            del self.__commits[person_id]
+        _, encoding, path = ready
+
+        # На подтвержденном фото нет лица, прежнее фото этого человека тоже больше не действует
+        if encoding is None:
+            print(f'No face found for id {person_id}')
+            self.__matcher.remove(person_id)
+            self.__finish([commit[1]], False)
+            return
+        try:
+            self.__matcher.upsert(person_id, encoding)
+            if self.__cache is not None and path is not None:
+                self.__cache.store(path, encoding)
+        except Exception as error:
+            print(f'Enrollment of id {person_id} failed: {error!r}')
+            self.__finish([commit[1]], False)
+            return
+        self.__finish([commit[1]], True)
@@ -0,0 +1,255 @@
+import config
+import copy
+import threading
+import numpy as np
+from typing import NamedTuple, Optional
+
+
+class Match(NamedTuple):
+    """
+    Результат сопоставления одного лица.
+    id - порядковый номер имени из config.registry или -1 для неизвестного лица,
+    name - имя или пустая строка, distance - евклидово расстояние до ближайшего вектора галереи.
+    """
+    id: int
+    name: str
+    distance: float
+
+
+def squared_distances(queries: np.ndarray, gallery: np.ndarray, gallery_norms: np.ndarray) -> np.ndarray:
+    """
+    Квадраты расстояний между всеми векторами queries и gallery одним матричным умножением:
+    |q - g|^2 = |q|^2 + |g|^2 - 2 * q.g
+    :return: Матрица (количество запросов, размер галереи) float32.
+    """
+    distances = queries @ gallery.T
+    distances *= -2
+    distances += (queries * queries).sum(axis=1)[:, None]
+    distances += gallery_norms[None, :]
+    np.maximum(distances, 0, out=distances)
+    return distances
+
+
+class ClusterIndex:
+    """
+    Класс ClusterIndex:
+    Приближенный индекс для больших галерей.
+    Векторы галереи разбиваются на кластеры методом k-средних,
+    при поиске расстояния считаются только до векторов из nprobe ближайших кластеров.
+    Пустые кластеры (при повторяющихся векторах или малой галерее) в индекс не входят.
+    Индекс не изменяется после построения: updated() возвращает новый индекс, в котором удаленные строки
+    убраны, а новые векторы отнесены к ближайшим центрам без пересчета k-средних.
+    """
+    def __init__(self, gallery: np.ndarray, clusters: Optional[int] = None, nprobe: int = 4,
+                 iterations: int = 10, seed: int = 0):
+        """
+        Инициализация объекта класса и построение индекса.
+        :param gallery: Матрица векторов галереи float32.
+        :param clusters: Количество кластеров, по умолчанию корень из размера галереи.
+        :param nprobe: Количество просматриваемых кластеров на запрос.
+        :param iterations: Количество итераций k-средних.
+        :param seed: Зерно генератора случайных чисел, для воспроизводимости индекса.
+        """
+        count = len(gallery)
+        clusters = clusters or max(1, int(np.sqrt(count)))
+        clusters = min(clusters, count)
+
+        # k-средних, начальные центры выбираются из векторов галереи
+        generator = np.random.default_rng(seed)
+        centroids = gallery[generator.choice(count, clusters, replace=False)].copy()
+        assignment = np.zeros(count, dtype=np.int64)
+        for _ in range(iterations):
+            centroid_norms = (centroids * centroids).sum(axis=1)
+            assignment = squared_distances(gallery, centroids, centroid_norms).argmin(axis=1)
+            for cluster in range(clusters):
+                members = gallery[assignment == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+
+        # Центры, к которым не отнесен ни один вектор, отбрасываются
+        members = [np.flatnonzero(assignment == cluster) for cluster in range(clusters)]
+        used = [cluster for cluster in range(clusters) if len(members[cluster])]
+        self.__centroids = np.ascontiguousarray(centroids[used])
+        self.__centroid_norms = (self.__centroids * self.__centroids).sum(axis=1)
+        self.__members = [members[cluster] for cluster in used]
+        self.nprobe = min(nprobe, len(used))
+        self.size = count
+        self.changes = 0
+
+    def updated(self, keep: np.ndarray, added: np.ndarray) -> 'ClusterIndex':
+        """
+        Новый индекс для измененной галереи без пересчета k-средних.
+        :param keep: Маска строк прежней галереи, которые остались, в прежнем порядке.
+        :param added: Матрица векторов float32, добавленных в конец новой галереи.
+        :return: Объект ClusterIndex, в changes накоплено количество удаленных и добавленных векторов.
+        """
+        # Номера оставшихся строк сдвигаются на количество удаленных строк перед ними
+        rows = np.cumsum(keep) - 1
+        members = [rows[cluster[keep[cluster]]] for cluster in self.__members]
+        if len(added):
+            first = int(keep.sum())
+            nearest = squared_distances(added, self.__centroids, self.__centroid_norms).argmin(axis=1)
+            for offset, cluster in enumerate(nearest):
+                members[cluster] = np.append(members[cluster], first + offset)
+
+        index = copy.copy(self)
+        index.__members = members
+        index.changes = self.changes + int(len(keep) - keep.sum()) + len(added)
+        return index
+
+    def candidates(self, queries: np.ndarray) -> list:
+        """
+        Поиск кандидатов для каждого запроса.
+        :param queries: Матрица векторов лиц float32.
+        :return: Список массивов номеров строк галереи, по одному на запрос. Массив может быть пустым,
+            если из ближайших кластеров удалены все векторы.
+        """
+        distances = squared_distances(queries, self.__centroids, self.__centroid_norms)
+        nearest = np.argpartition(distances, self.nprobe - 1, axis=1)[:, :self.nprobe]
+        return [np.concatenate([self.__members[c] for c in row]) for row in nearest]
+
+
+class GalleryMatcher:
+    """
+    Класс GalleryMatcher:
+    Сопоставление лиц с галереей известных лиц.
+    Все векторы галереи хранятся одной непрерывной матрицей float32, строки которой соответствуют номерам из config.registry.
+    Все лица кадра сравниваются с галереей одним матричным вычислением.
+    Для больших галерей можно включить приближенный индекс ClusterIndex.
+    При добавлении и удалении людей индекс обновляется без пересчета k-средних,
+    а заново строится только после того, как изменилась заметная доля галереи.
+    """
+    def __init__(self, tolerance: float = 0.6, index_threshold: Optional[int] = None, nprobe: int = 4,
+                 rebuild_after: float = 0.25):
+        """
+        Инициализация объекта класса.
+        :param tolerance: Максимальное расстояние между векторами лиц одного человека.
+        :param index_threshold: Размер галереи, начиная с которого используется ClusterIndex, None - никогда.
+        :param nprobe: Количество просматриваемых кластеров ClusterIndex на запрос.
+        :param rebuild_after: Доля измененных векторов от размера галереи при построении индекса,
+            после которой индекс строится заново.
+        """
+        self.__tolerance = tolerance
+        self.__index_threshold = index_threshold
+        self.__nprobe = nprobe
+        self.__rebuild_after = rebuild_after
+        self.__lock = threading.Lock()
+        self.__write_lock = threading.Lock()
+        self.__ids = np.zeros(0, dtype=np.int64)
+        self.__gallery = np.zeros((0, 0), dtype=np.float32)
+        self.__norms = np.zeros(0, dtype=np.float32)
+        self.__index = None
+
+    def __len__(self) -> int:
+        return len(self.__ids)
+
+    def set_gallery(self, ids, encodings) -> None:
+        """
+        Замена всей галереи.
+        :param ids: Порядковые номера имен для каждого вектора, у одного человека может быть несколько векторов.
+        :param encodings: Векторы лиц.
+        """
+        with self.__write_lock:
+            ids = np.asarray(ids, dtype=np.int64)
+            gallery = np.asarray(encodings, dtype=np.float32).reshape(len(ids), -1)
+            self.__replace(ids, gallery, self.__build_index(gallery))
+
+    def upsert(self, person_id: int, encoding) -> None:
+        """
+        Добавление человека в галерею. Прежние векторы этого человека заменяются новым.
+        Сопоставление в других потоках продолжает работать со старой галереей, пока новая не будет готова.
+        :param person_id: Порядковый номер имени.
+        :param encoding: Вектор лица.
+        """
+        with self.__write_lock:
+            keep = self.__ids != person_id
+            ids = np.append(self.__ids[keep], person_id)
+            encoding = np.asarray(encoding, dtype=np.float32).reshape(1, -1)
+            gallery = np.concatenate([self.__gallery[keep].reshape(-1, encoding.shape[1]), encoding])
+            self.__replace(ids, gallery, self.__update_index(gallery, keep, encoding))
+
+    def remove(self, person_id: int) -> None:
+        """
+        Удаление всех векторов человека из галереи.
+        :param person_id: Порядковый номер имени.
+        """
+        with self.__write_lock:
+            keep = self.__ids != person_id
+            if not keep.all():
+                gallery = self.__gallery[keep]
+                added = np.zeros((0, gallery.shape[1]), dtype=np.float32)
+                self.__replace(self.__ids[keep], gallery, self.__update_index(gallery, keep, added))
+
+    def __build_index(self, gallery: np.ndarray) -> Optional[ClusterIndex]:
+        """
+        Построение индекса, если галерея достаточно большая.
+        """
+        if self.__index_threshold is None or len(gallery) < max(1, self.__index_threshold):
+            return None
+        return ClusterIndex(gallery, nprobe=self.__nprobe)
+
+    def __update_index(self, gallery: np.ndarray, keep: np.ndarray, added: np.ndarray) -> Optional[ClusterIndex]:
+        """
+        Обновление индекса после изменения галереи. Вызывается под __write_lock.
+        Индекс строится заново, только если его не было или изменилось больше rebuild_after векторов.
+        :param gallery: Новая галерея.
+        :param keep: Маска оставшихся строк прежней галереи.
+        :param added: Векторы, добавленные в конец новой галереи.
+        """
+        index = self.__index
+        if self.__index_threshold is None or len(gallery) < max(1, self.__index_threshold):
+            return None
+        if index is None or index.changes + len(added) + len(keep) - keep.sum() > self.__rebuild_after * index.size:
+            return ClusterIndex(gallery, nprobe=self.__nprobe)
+        return index.updated(keep, added)
+
+    def __replace(self, ids: np.ndarray, gallery: np.ndarray, index: Optional[ClusterIndex]) -> None:
+        """
+        Подмена галереи. Вызывается под __write_lock.
+        """
+        gallery = np.ascontiguousarray(gallery)
+        norms = (gallery * gallery).sum(axis=1)
+
+        # Замена одной операцией, чтобы поток распознавания не увидел галерею наполовину
+        with self.__lock:
+            self.__ids, self.__gallery, self.__norms, self.__index = ids, gallery, norms, index
+
+    def match(self, encodings) -> list:
+        """
+        Сопоставление лиц с галереей.
+        :param encodings: Векторы лиц, найденных на кадре.
+        :return: Список объектов Match в том же порядке.
+        """
+        with self.__lock:
+            ids, gallery, norms, index = self.__ids, self.__gallery, self.__norms, self.__index
+
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, gallery.shape[1] if len(ids) else 128)
+        if len(queries) == 0:
+            return []
+        if len(ids) == 0:
+            return [Match(-1, '', float('inf'))] * len(queries)
+
+        if index is None:
+            distances = squared_distances(queries, gallery, norms)
+            best = distances.argmin(axis=1)
+            best_distances = np.sqrt(distances[np.arange(len(queries)), best])
+        else:
+            best = np.zeros(len(queries), dtype=np.int64)
+            best_distances = np.zeros(len(queries), dtype=np.float32)
+            for i, rows in enumerate(index.candidates(queries)):
+                # Все векторы ближайших кластеров удалены, запрос сравнивается со всей галереей
+                if len(rows) == 0:
+                    rows = np.arange(len(ids))
+                distances = squared_distances(queries[i:i + 1], gallery[rows], norms[rows])[0]
+                position = int(distances.argmin())
+                best[i] = rows[position]
+                best_distances[i] = np.sqrt(distances[position])
+
+        matches = []
+        for row, distance in zip(best, best_distances):
+            if distance <= self.__tolerance:
+                person_id = int(ids[row])
+                matches.append(Match(person_id, config.registry.get(person_id), float(distance)))
+            else:
+                matches.append(Match(-1, '', float(distance)))
+        return matches
@@ -0,0 +1,202 @@
+import cv2
+import tracing
+import numpy as np
+from typing import Callable, Optional
+
+
+def iou(first: tuple, second: tuple) -> float:
+    """
+    Отношение площади пересечения к площади объединения двух рамок.
+    :param first: Рамка (top, right, bottom, left), как в face_recognition.
+    :param second: Рамка (top, right, bottom, left).
+    :return: Число от 0 до 1.
+    """
+    top, right = max(first[0], second[0]), min(first[1], second[1])
+    bottom, left = min(first[2], second[2]), max(first[3], second[3])
+    intersection = max(0, right - left) * max(0, bottom - top)
+    area_first = (first[1] - first[3]) * (first[2] - first[0])
+    area_second = (second[1] - second[3]) * (second[2] - second[0])
+    union = area_first + area_second - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+class FaceTrack:
+    """
+    Класс FaceTrack:
+    Одно отслеживаемое лицо: рамка, личность, найденная при последнем распознавании, и шаблон для слежения.
+    """
+    def __init__(self, track_id: int, person_id: int, name: str, distance: float, box: tuple):
+        """
+        Инициализация объекта класса.
+        :param track_id: Номер трека, уникальный в пределах RecognitionPipeline.
+        :param person_id: Порядковый номер имени, -1 для неизвестного лица.
+        :param name: Имя.
+        :param distance: Расстояние до ближайшего вектора галереи.
+        :param box: Рамка (top, right, bottom, left).
+        """
+        self.track_id = track_id
+        self.person_id = person_id
+        self.name = name
+        self.distance = distance
+        self.box = box
+        self.template = None
+        self.lost = False
+
+    def as_face(self) -> tuple:
+        """
+        Представление в формате FaceRecognition.faces: (порядковый номер, имя, расстояние, рамка).
+        """
+        return self.person_id, self.name, self.distance, self.box
+
+
+class RecognitionPipeline:
+    """
+    Класс RecognitionPipeline:
+    Распознавание лиц с отслеживанием между распознаваниями.
+    Дорогое распознавание (поиск и вычисление векторов лиц) выполняется раз в cadence кадров
+    или когда какое-то лицо потеряно. На остальных кадрах рамки лиц сдвигаются
+    сопоставлением шаблонов (cv2.matchTemplate) в окрестности прежней рамки,
+    а личности переносятся с прошлого распознавания. После распознавания новые рамки
+    связываются с существующими треками по IoU.
+    """
+    def __init__(self, identify: Callable[[np.ndarray], list], cadence: int = 5, iou_threshold: float = 0.3,
+                 match_threshold: float = 0.6, search_margin: float = 0.5):
+        """
+        Инициализация объекта класса.
+        :param identify: Функция распознавания, по кадру BGR возвращает список (порядковый номер, имя, расстояние, рамка).
+        :param cadence: Распознавание выполняется на каждом cadence-м кадре.
+        :param iou_threshold: Минимальный IoU, при котором рамка распознавания относится к существующему треку.
+        :param match_threshold: Минимальная оценка cv2.TM_CCOEFF_NORMED, ниже которой лицо считается потерянным.
+        :param search_margin: Размер области поиска вокруг рамки в долях размера рамки.
+        """
+        self.__identify = identify
+        self.__cadence = max(1, cadence)
+        self.__iou_threshold = iou_threshold
+        self.__match_threshold = match_threshold
+        self.__search_margin = search_margin
+
+        self.__tracks = []
+        self.__next_track_id = 0
+        self.__since_identify = self.__cadence
+        self.__statistics = {'frames': 0, 'identified': 0, 'tracked': 0}
+
+    @property
+    def tracks(self) -> list:
+        return list(self.__tracks)
+
+    @property
+    def statistics(self) -> dict:
+        """
+        Счетчики: frames - обработано кадров, identified - кадров с распознаванием, tracked - кадров только со слежением,
+        identify_ratio - доля кадров с распознаванием.
+        """
+        statistics = dict(self.__statistics)
+        statistics['identify_ratio'] = statistics['identified'] / statistics['frames'] if statistics['frames'] else 0.0
+        return statistics
+
+    def set_cadence(self, cadence: int) -> None:
+        """
+        Изменение частоты распознавания.
+        :param cadence: Распознавание выполняется на каждом cadence-м кадре.
+        """
+        self.__cadence = max(1, cadence)
+
+    def process(self, frame: np.ndarray) -> list:
+        """
+        Обработка кадра.
+        :param frame: Кадр BGR.
+        :return: Список объектов FaceTrack, видимых на кадре.
+        """
+        self.__statistics['frames'] += 1
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        need_identify = self.__since_identify + 1 >= self.__cadence or any(track.lost for track in self.__tracks)
+        if need_identify:
+            self.__statistics['identified'] += 1
+            self.__since_identify = 0
+            with tracing.span('faces.identify', 'faces'):
+                self.__associate(self.__identify(frame), gray)
+        else:
+            self.__statistics['tracked'] += 1
+            self.__since_identify += 1
+            with tracing.span('faces.track', 'faces'):
+                for track in self.__tracks:
+                    self.__follow(track, gray)
+        return [track for track in self.__tracks if not track.lost]
+
+    def __associate(self, faces: list, gray: np.ndarray) -> None:
+        """
+        Связывание результатов распознавания с треками по IoU.
+        Треки без пары удаляются, лица без пары становятся новыми треками.
+        """
+        pairs = []
+        for i, track in enumerate(self.__tracks):
+            for j, face in enumerate(faces):
+                overlap = iou(track.box, face[3])
+                if overlap >= self.__iou_threshold:
+                    pairs.append((overlap, i, j))
+
+        # Жадное сопоставление, начиная с наибольшего пересечения
+        used_tracks, used_faces = set(), set()
+        tracks = []
+        for _, i, j in sorted(pairs, reverse=True):
+            if i in used_tracks or j in used_faces:
+                continue
+            used_tracks.add(i)
+            used_faces.add(j)
+            track = self.__tracks[i]
+            track.person_id, track.name, track.distance, track.box = faces[j]
+            tracks.append(track)
+
+        for j, face in enumerate(faces):
+            if j not in used_faces:
+                tracks.append(FaceTrack(self.__next_track_id, *face))
+                self.__next_track_id += 1
+
+        for track in tracks:
+            track.lost = False
+            track.template = self.__crop(gray, track.box)
+        self.__tracks = tracks
+
+    @staticmethod
+    def __crop(gray: np.ndarray, box: tuple) -> Optional[np.ndarray]:
+        """
+        Вырезание фрагмента кадра по рамке, ограниченной размерами кадра.
+        """
+        top, right, bottom, left = box
+        height, width = gray.shape[:2]
+        top, bottom = max(0, top), min(height, bottom)
+        left, right = max(0, left), min(width, right)
+        if bottom - top < 2 or right - left < 2:
+            return None
+        return gray[top:bottom, left:right].copy()
+
+    def __follow(self, track: FaceTrack, gray: np.ndarray) -> None:
+        """
+        Сдвиг рамки трека на новом кадре сопоставлением шаблона в окрестности прежней рамки.
+        """
+        if track.template is None:
+            track.lost = True
+            return
+
+        # Шаблон вырезан из рамки, ограниченной кадром, поэтому отсчет ведется от ее угла
+        top, left = max(0, track.box[0]), max(0, track.box[3])
+        box_height, box_width = track.template.shape[:2]
+        margin_y = int(box_height * self.__search_margin) + 1
+        margin_x = int(box_width * self.__search_margin) + 1
+        height, width = gray.shape[:2]
+        y0, y1 = max(0, top - margin_y), min(height, top + box_height + margin_y)
+        x0, x1 = max(0, left - margin_x), min(width, left + box_width + margin_x)
+        area = gray[y0:y1, x0:x1]
+        if area.shape[0] < box_height or area.shape[1] < box_width:
+            track.lost = True
+            return
+
+        scores = cv2.matchTemplate(area, track.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (x, y) = cv2.minMaxLoc(scores)
+        if score < self.__match_threshold:
+            track.lost = True
+            return
+
+        new_top, new_left = y0 + y, x0 + x
+        track.box = (new_top, new_left + box_width, new_top + box_height, new_left)
@@ -0,0 +1,219 @@
+import interfaces
+import cv2
+import math
+import threading
+import time
+import face_tracker
+import get_capture
+import numpy as np
+from typing import Optional
+from collections import deque
+
+'''
+Заменители подсистем робота для запуска без камеры, микрофона, экрана и платы управления
+'''
+
+
+class FakeCapture(interfaces.GetCapture):
+    """
+    Класс FakeCapture:
+    Камера, которая рисует кадры с красной лазерной точкой, движущейся по кругу, и светлым овалом лица.
+    Кадры выдаются с частотой fps, как у настоящей камеры.
+    """
+    def __init__(self, index_of_camera: int = 0, width: int = 640, height: int = 480, fps: float = 30.0):
+        """
+        Инициализация объекта класса.
+        :param index_of_camera: Не используется, нужен для совместимости с GetCapture.
+        :param width: Ширина кадра.
+        :param height: Высота кадра.
+        :param fps: Частота кадров.
+        """
+        self.__size = (width, height)
+        self.__interval = 1 / fps
+        self.__next_frame = time.monotonic()
+        self.__background = np.full((height, width, 3), 40, dtype=np.uint8)
+        cv2.ellipse(self.__background, (width // 4, height // 2), (50, 65), 0, 0, 360, (170, 190, 210), -1)
+        self.frames = 0
+
+    def read_frame(self) -> Optional[get_capture.CapturedFrame]:
+        """
+        Ожидание следующего кадра и его создание вместе со временем захвата и порядковым номером.
+        :return: Объект CapturedFrame.
+        """
+        frame = self.read_capture()
+        return get_capture.CapturedFrame(frame, time.monotonic(), self.frames)
+
+    def read_capture(self) -> cv2.typing.MatLike:
+        """
+        Ожидание следующего кадра и его создание.
+        :return frame: Кадр BGR.
+        """
+        delay = self.__next_frame - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.__next_frame = max(self.__next_frame + self.__interval, time.monotonic())
+
+        width, height = self.__size
+        angle = self.frames * 0.05
+        center = (int(width / 2 + width / 3 * math.cos(angle)), int(height / 2 + height / 4 * math.sin(angle)))
+        frame = self.__background.copy()
+        cv2.circle(frame, center, 6, (0, 0, 255), -1)
+        self.frames += 1
+        return frame
+
+    def release(self) -> None:
+        pass
+
+
+class FakeSerial(interfaces.Serial):
+    """
+    Класс FakeSerial:
+    Порт, который запоминает последние отправленные команды.
+    """
+    def __init__(self, port: str = 'fake', history: int = 100):
+        """
+        Инициализация объекта класса.
+        :param port: Не используется, нужен для совместимости с Serial.
+        :param history: Количество запоминаемых команд.
+        """
+        self.written = deque(maxlen=history)
+        self.count = 0
+
+    def write(self, data) -> None:
+        self.written.append(data)
+        self.count += 1
+
+    def read(self) -> str:
+        return ''
+
+    def close(self) -> None:
+        pass
+
+
+class FakeFaceRecognition(interfaces.FaceRecognition):
+    """
+    Класс FakeFaceRecognition:
+    Распознавание, которое находит светлый овал FakeCapture и называет его первым именем из names.
+    Время полного распознавания задается параметром delay, слежение между распознаваниями выполняет настоящий
+    face_tracker.RecognitionPipeline.
+    """
+    def __init__(self, index_camera: int = 0, dataset: str = 'dataset', names: tuple = ('Гость',),
+                 delay: float = 0.08, cadence: int = 5):
+        """
+        Инициализация объекта класса.
+        :param index_camera: Не используется, нужен для совместимости с FaceRecognition.
+        :param dataset: Не используется, нужен для совместимости с FaceRecognition.
+        :param names: Имена, которые выдает распознавание.
+        :param delay: Время одного полного распознавания в секундах.
+        :param cadence: Распознавание выполняется на каждом cadence-м кадре.
+        """
+        self.__names = names
+        self.__delay = delay
+        self.pipeline = face_tracker.RecognitionPipeline(self.identify, cadence)
+        self.faces = []
+
+    def identify(self, frame: np.ndarray) -> list:
+        """
+        Поиск светлой области на кадре.
+        :return: Список кортежей (порядковый номер, имя, расстояние, (top, right, bottom, left)).
+        """
+        time.sleep(self.__delay)
+        mask = cv2.inRange(frame, (150, 150, 150), (255, 255, 255))
+        points = cv2.findNonZero(mask)
+        if points is None:
+            return []
+        left, top, width, height = cv2.boundingRect(points)
+        return [(0, self.__names[0], 0.3, (top, left + width, top + height, left))]
+
+    def recognize(self) -> None:
+        pass
+
+    def findEncodings(self):
+        pass
+
+    def release(self) -> None:
+        pass
+
+
+class FakeRecognizeSpeech(interfaces.RecognizeSpeech):
+    """
+    Класс FakeRecognizeSpeech:
+    Распознавание речи, которое раз в interval секунд по очереди «слышит» фразы из phrases.
+    """
+    def __init__(self, model_name: str = 'fake', phrases: tuple = ('Привет', 'Играть', 'Стоп'), interval: float = 3.0):
+        """
+        Инициализация объекта класса.
+        :param model_name: Не используется, нужен для совместимости с RecognizeSpeech.
+        :param phrases: Фразы, которые выдаются по кругу.
+        :param interval: Время прослушивания одной фразы в секундах.
+        """
+        self.__phrases = phrases
+        self.__interval = interval
+        self.__position = 0
+        self.__stop = threading.Event()
+        self.text = ''
+
+    def listen(self):
+        """
+        Ожидание фразы. Прерывается методом close().
+        """
+        self.__stop.wait(self.__interval)
+
+    def recognize(self) -> None:
+        """
+        Запись следующей фразы в переменную text.
+        """
+        self.text = self.__phrases[self.__position % len(self.__phrases)]
+        self.__position += 1
+
+    def close(self) -> None:
+        self.__stop.set()
+
+
+class FakeSynthesisSpeech(interfaces.SynthesisSpeech):
+    """
+    Класс FakeSynthesisSpeech:
+    Синтез речи, который печатает фразу и ждет время, сравнимое с ее произнесением.
+    """
+    def __init__(self, seconds_per_char: float = 0.02):
+        """
+        Инициализация объекта класса.
+        :param seconds_per_char: Время произнесения одного символа в секундах.
+        """
+        self.__seconds_per_char = seconds_per_char
+        self.spoken = []
+
+    def synthesis(self, phrase: str) -> None:
+        print(f'Say: {phrase}')
+        self.spoken.append(phrase)
+        time.sleep(len(phrase) * self.__seconds_per_char)
+
+
+class FakeShowEmotions(interfaces.ShowEmotions):
+    """
+    Класс FakeShowEmotions:
+    Показ эмоций без окна: считает показанные кадры и выдерживает частоту кадров.
+    """
+    def __init__(self, emotion_folder: str = 'emojis/', fps: float = 30.0):
+        """
+        Инициализация объекта класса.
+        :param emotion_folder: Не используется, нужен для совместимости с ShowEmotions.
+        :param fps: Частота кадров эмоций.
+        """
+        self.__interval = 1 / fps
+        self.__next_frame = time.monotonic()
+        self.emotion = 'blink.mp4'
+        self.shown = 0
+
+    def show(self) -> None:
+        """
+        Показ кадра и ожидание момента показа следующего.
+        """
+        self.shown += 1
+        delay = self.__next_frame - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.__next_frame = max(self.__next_frame + self.__interval, time.monotonic())
+
+    def change_emotion(self, emotion: str, speed=None) -> None:
+        self.emotion = emotion
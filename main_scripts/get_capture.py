@@ -1,27 +1,167 @@
-import interfaces
-import cv2
-
-
-class GetCapture(interfaces.GetCapture):
-    """
-    Класс GetCapture:
-    Класс, который отвечает за получение кадра с камеры.
-    Использует для упрощения получения изображения с камеры.
-    """
-    def __init__(self, index_of_camera: int):
-        """
-        Инициализация объекта класса.
-        :param index_of_camera: Индекс камеры, который используется в методе cv2.VideoCapture().
-        """
-        self.__index = index_of_camera
-        self.__camera = cv2.VideoCapture(self.__index)
-
-    def read_capture(self) -> cv2.typing.MatLike:
-        """
-        Основной метод класса.
-        Чтение камеры и возвращение текущего кадра.
-        :return frame: Объект класса cv2.typing.MatLike, текущий кадр.
-        """
-        success, frame = self.__camera.read()
-        if success:
-            return frame
+import interfaces
+import cv2
+import threading
+import time
+import tracing
+from collections import deque
+from typing import NamedTuple, Optional
+
+
+class CapturedFrame(NamedTuple):
+    """
+    Кадр, полученный фоновым потоком камеры.
+    frame - само изображение, timestamp - время захвата по time.monotonic(),
+    sequence - порядковый номер кадра с момента запуска потока.
+    """
+    frame: cv2.typing.MatLike
+    timestamp: float
+    sequence: int
+
+
+class GetCapture(interfaces.GetCapture):
+    """
+    Класс GetCapture:
+    Класс, который отвечает за получение кадра с камеры.
+    Использует для упрощения получения изображения с камеры.
+    В потоковом режиме камера постоянно читается в отдельном потоке,
+    а потребители получают только самый свежий кадр, не дожидаясь ввода-вывода.
+    Кадры потокового режима доступны только для чтения, так как разделяются между потребителями.
+    """
+    def __init__(self, index_of_camera: int, threaded: bool = False, buffer_size: int = 2):
+        """
+        Инициализация объекта класса.
+        :param index_of_camera: Индекс камеры, который используется в методе cv2.VideoCapture().
+        :param threaded: Если True, кадры читаются фоновым потоком (см. метод start()).
+        :param buffer_size: Размер кольцевого буфера последних кадров в потоковом режиме.
+        """
+        self.__index = index_of_camera
+        self.__camera = cv2.VideoCapture(self.__index)
+
+        # Переменные потокового режима
+        self.__threaded = threaded
+        self.__buffer = deque(maxlen=max(1, buffer_size))
+        self.__condition = threading.Condition()
+        self.__sequence = 0
+        self.__returned = 0
+        self.__running = False
+        self.__thread = None
+
+        if self.__threaded:
+            self.start()
+
+    def start(self) -> None:
+        """
+        Запуск фонового потока, который непрерывно вычитывает кадры из камеры.
+        Повторный вызов ничего не делает.
+        """
+        if self.__running:
+            return
+        self.__threaded = True
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__grab_loop, name=f'GetCapture-{self.__index}', daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        """
+        Остановка фонового потока. Ожидающие кадра потребители будут разбужены.
+        """
+        self.__running = False
+        with self.__condition:
+            self.__condition.notify_all()
+        if self.__thread is not None and self.__thread is not threading.current_thread():
+            self.__thread.join()
+        self.__thread = None
+
+    def release(self) -> None:
+        """
+        Остановка потока и освобождение камеры.
+        """
+        self.stop()
+        self.__camera.release()
+
+    def __grab_loop(self) -> None:
+        """
+        Цикл фонового потока.
+        Кадры читаются так быстро, как их отдает камера, поэтому в очереди драйвера не копятся старые кадры.
+        """
+        while self.__running:
+            with tracing.span('camera.read', 'camera'):
+                success, frame = self.__camera.read()
+            timestamp = time.monotonic()
+            if not success:
+                # Камера временно не отдает кадры, не нагружаем процессор впустую
+                time.sleep(0.005)
+                continue
+
+            # Кадр из буфера может одновременно читаться несколькими потребителями,
+            # поэтому запрещаем его изменение вместо копирования для каждого из них
+            frame.flags.writeable = False
+
+            with self.__condition:
+                self.__sequence += 1
+                self.__buffer.append(CapturedFrame(frame, timestamp, self.__sequence))
+                self.__condition.notify_all()
+
+    def set_property(self, property_id: int, value: float) -> bool:
+        """
+        Установка свойства камеры, например cv2.CAP_PROP_FRAME_WIDTH.
+        :param property_id: Идентификатор свойства cv2.CAP_PROP_*.
+        :param value: Новое значение свойства.
+        :return: True, если камера приняла значение.
+        """
+        return self.__camera.set(property_id, value)
+
+    def read_latest(self) -> Optional[CapturedFrame]:
+        """
+        Получение самого свежего кадра из буфера без ожидания.
+        :return: Объект CapturedFrame или None, если кадров еще не было.
+        """
+        with self.__condition:
+            return self.__buffer[-1] if self.__buffer else None
+
+    def wait_for_frame(self, after_sequence: int = 0, timeout: Optional[float] = None) -> Optional[CapturedFrame]:
+        """
+        Ожидание кадра, который новее кадра с номером after_sequence.
+        :param after_sequence: Номер последнего обработанного кадра.
+        :param timeout: Максимальное время ожидания в секундах, None - ждать без ограничения.
+        :return: Самый свежий кадр с номером больше after_sequence или None по истечении времени ожидания.
+        """
+        with self.__condition:
+            ready = self.__condition.wait_for(
+                lambda: not self.__running or (self.__buffer and self.__buffer[-1].sequence > after_sequence),
+                timeout)
+            if ready and self.__buffer and self.__buffer[-1].sequence > after_sequence:
+                return self.__buffer[-1]
+            return None
+
+    def read_frame(self) -> Optional[CapturedFrame]:
+        """
+        Чтение текущего кадра вместе со временем захвата и порядковым номером,
+        чтобы по ним можно было измерить задержку обработки кадра.
+        В потоковом режиме, как и без него, каждый вызов возвращает новый кадр: ожидается кадр новее
+        возвращенного предыдущим вызовом, а из накопившихся берется самый свежий.
+        :return: Объект CapturedFrame или None, если кадр не получен в течение секунды.
+        """
+        if self.__threaded:
+            captured = self.wait_for_frame(self.__returned, timeout=1.0)
+            if captured is not None:
+                self.__returned = captured.sequence
+            return captured
+
+        with tracing.span('camera.read', 'camera'):
+            success, frame = self.__camera.read()
+        if not success:
+            return None
+        self.__sequence += 1
+        return CapturedFrame(frame, time.monotonic(), self.__sequence)
+
+    def read_capture(self) -> cv2.typing.MatLike:
+        """
+        Основной метод класса.
+        Чтение камеры и возвращение текущего кадра.
+        В потоковом режиме возвращается самый свежий кадр из буфера, новее возвращенного ранее.
+        :return frame: Объект класса cv2.typing.MatLike, текущий кадр.
+        """
+        captured = self.read_frame()
+        if captured is not None:
+            return captured.frame
@@ -1,481 +1,859 @@
-import interfaces
-import sys
-import cv2
-import config
-from PyQt5.QtGui import QFont, QImage, QPixmap
-from PyQt5.QtCore import Qt, QTime, QTimer
-from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QLabel, QLineEdit, QVBoxLayout, QWidget, \
-    QStackedWidget, QGridLayout
-
-
-class GraphicInterfaces(interfaces.GraphicInterfaces):
-    """
-    Класс GraphicInterfaces:
-    Главный управляющий класс.
-    Регулирует работу всех графических интерфейсов, переключение между ними и другие операции.
-    Также является главным окном приложения, содержит переменные для взаимодействия с основным кодом.
-    """
-
-    def __init__(self):
-        """
-        Инициализация объекта класса.
-        """
-
-        # Инициализация графики и самого виджета
-        super().__init__()
-        self.__init_ui()
-
-        # Инициализация переменных
-        self.isStart = False
-
-    def __init_ui(self):
-        """
-        Инициализация интерфейсов, настройка окна приложения.
-        В коде создается словарь интерфейсов, для поиска их по имени.
-        Также создается объект класса QStackedWidget, для управления видимым интерфейсом.
-        """
-
-        # Настройка основных параметров окна
-        self.setGeometry(100, 100, 1000, 550)
-        self.setWindowTitle("Main Window")
-        self.setFixedSize(1000, 550)
-
-        # Создание переменных для каждого интерфейса
-        self.__name_interface = NameInterface(self)
-        self.__picture_interface = PictureInterface(self, 0)
-        self.__like_interface = LikeInterface(self)
-
-        # Создание словаря всех интерфейсов, для удобного взаимодействия
-        self.__interfaces = {'name': self.__name_interface,
-                             'picture': self.__picture_interface,
-                             'like': self.__like_interface}
-
-        # Создание виджета для переключения между окнами
-        self.stacked_widget = QStackedWidget(self)
-        self.setCentralWidget(self.stacked_widget)
-
-        # Добавление в основной виджет всех интерфейсов
-        self.stacked_widget.addWidget(self.__interfaces['name'])
-        self.stacked_widget.addWidget(self.__interfaces['like'])
-        self.stacked_widget.addWidget(self.__interfaces['picture'])
-
-        # Установка видимого интерфейса в основной виджет
-        self.stacked_widget.setCurrentWidget(self.__interfaces['name'])
-
-    def change_interface(self, widget: QWidget) -> None:
-        """
-        Изменение основного видимого интерфейса.
-        Метод не возвращает значений.
-        :param widget: Объект класса QWidget, интерфейс, на который поменяется нынешний.
-        """
-        self.stacked_widget.setCurrentWidget(widget)
-
-    def get_interface_by_name(self, name: str):
-        """
-        Получение интерфейса по его имени.
-        :param name: Имя интерфейса, по которому осуществляется поиск.
-        :return interface: Объект одного из классов, описывающих интерфейсы, если нет объекта с таким именем, вернется None.
-        """
-        return self.__interfaces[name] if self.__interfaces[name] else None
-
-
-class NameInterface(QWidget):
-    """
-    Класс NameInterface:
-    Шаблон окна для ввода имени с виртуальной клавиатуры.
-    """
-
-    def __init__(self, graphic_interfaces: GraphicInterfaces):
-        """
-        Инициализация объекта класса.
-        :param graphic_interfaces: Объект класса GraphicInterfaces, для взаимодействия с другими интерфейсами и управления основным окном.
-        """
-
-        # Инициализация шрифта
-        self.bold_font = QFont()
-        self.bold_font.setPointSize(20)
-        self.bold_font.setBold(True)
-
-        # Инициализация переменных
-        self.graphic_interfaces = graphic_interfaces
-
-        # Инициализация графики и самого виджета
-        super().__init__()
-        self.init_ui()
-
-    def init_ui(self):
-        """
-        Инициализация графики, виджетов и их расстановка на экране.
-        Создание виртуальной клавиатуры и ее размещение на экране.
-        """
-
-        # Инициализация надписи заголовка
-        self.label = QLabel('Name', parent=self)
-        self.label.setFont(self.bold_font)
-        self.label.setAlignment(Qt.AlignCenter)
-        self.label.setGeometry(350, 0, 300, 50)
-
-        # Создание layout для удобного размещения компонентов
-        self.layout = QVBoxLayout()
-
-        # Создание сетки для размещения кнопок клавиатуры
-        grid_layout = QGridLayout()
-
-        # Создание кнопок для клавиш
-        buttons = [
-            'й', 'ц', 'у', 'к', 'е', 'н', 'г', 'ш', 'щ', 'з', 'х',
-            'ф', 'ы', 'в', 'а', 'п', 'р', 'о', 'л', 'д', 'ж', 'э',
-            'я', 'ч', 'с', 'м', 'и', 'т', 'ь',
-            'Backspace',
-            'Enter'
-        ]
-
-        # Настройка клавиш
-        row, col = 0, 0
-        for button_text in buttons:
-            if button_text == 'Backspace':
-                button = QPushButton(button_text)
-                button.setFixedHeight(40)
-                button.clicked.connect(self.onBackspaceClick)
-                grid_layout.addWidget(button, row, col, 1, 2)  # Занимаем две ячейки для кнопки Backspace
-                col += 2
-            elif button_text == 'Enter':
-                button = QPushButton(button_text)
-                button.setFixedHeight(40)
-                button.clicked.connect(self.onEnterClick)
-                grid_layout.addWidget(button, row, col, 1, 2)  # Занимаем две ячейки для кнопки Enter
-                col += 2
-            else:
-                button = QPushButton(button_text)
-                button.setFixedHeight(40)
-                button.clicked.connect(self.onButtonClick)
-                grid_layout.addWidget(button, row, col)
-                col += 1
-
-            if col > 10:
-                col = 0
-                row += 1
-
-        # Поле для отображения текста
-        self.text_edit = QLineEdit()
-        self.layout.addWidget(self.text_edit)
-        self.layout.addLayout(grid_layout)  # Добавляем сетку кнопок после поля ввода
-
-        self.setLayout(self.layout)
-
-    def onButtonClick(self):
-        """
-        Обработка нажатия на кнопку.
-        При нажатии на кнопку в поле ввода добавится буква, на кнопку которой вы нажали.
-        """
-
-        button = self.sender()
-        text = button.text()
-        current_text = self.text_edit.text()
-        self.text_edit.setText(current_text + text)
-
-    def onBackspaceClick(self):
-        """
-        Обработка нажатия на кнопку Backspace.
-        При нажатии на кнопку в поле ввода удалится последний символ, если оно не пусто, иначе ничего не произойдет.
-        """
-
-        current_text = self.text_edit.text()
-        if current_text:
-            self.text_edit.setText(current_text[:-1])
-
-    def onEnterClick(self):
-        """
-        Обработка нажатия на кнопку Enter.
-        При нажатии на кнопку в словарь из файла конфигурации names запишется новое значение типа: {порядковый номер: Имя}, где "Имя" это текст из поля ввода.
-        Также значение переменной count_names из файла конфигурации увеличивается на 1.
-        """
-
-        current_text = self.text_edit.text()
-        config.names.update({config.count_names: current_text.capitalize()})
-        config.count_names += 1
-        self.next()
-
-    def next(self):
-        """
-        Запуск интерфейса создания фотографии
-        Для реализации данной функции используется graphic_interfaces и методы взаимодействия с другими интерфейсами.
-        Сначала находится интерфейс с именем "picture".
-        Далее текущий видимый интерфейс изменяется на найденный.
-        """
-        interface = self.graphic_interfaces.get_interface_by_name('picture')
-        self.graphic_interfaces.change_interface(interface)
-
-
-class PictureInterface(QWidget):
-    """
-    Класс PictureInterface:
-    Шаблон окна для создания фотографии, которая будет использоваться для распознавания лица
-    """
-
-    def __init__(self, graphic_interfaces: GraphicInterfaces, camera_index: int):
-        """
-        Инициализация объекта класса.
-
-        :param graphic_interfaces: Объект класса GraphicInterfaces, для взаимодействия с другими интерфейсами и управления основным окном.
-        :param camera_index: camera_index: int - Целое число, индекс камеры для метода cv2.VideoCapture()
-        """
-
-        # Инициализация переменных
-        self.graphic_interfaces = graphic_interfaces
-        self.__camera_index = camera_index
-        self.video_capture = cv2.VideoCapture(self.__camera_index)
-
-        # Инициализация виджета
-        super().__init__()
-
-        # Инициализация графики
-        self.init_ui()
-
-    def init_ui(self):
-        """
-        Инициализация графики, виджетов и их расстановка на экране.
-        """
-        # Настройка изображения с камеры
-        self.video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-
-        # Инициализация виджетов надписей и кнопок
-        self.image_label = QLabel(self)
-        self.image_label.setAlignment(Qt.AlignCenter)
-
-        self.time_label = QLabel(self)
-        self.time_label.setAlignment(Qt.AlignCenter)
-
-        self.label = QLabel('Picture', parent=self)
-        self.label.setAlignment(Qt.AlignCenter)
-        self.label.setGeometry(0, 0, 300, 50)
-
-        self.button_photo = QPushButton('Take photo', parent=self)
-        self.button_photo.setGeometry(100, 500, 300, 50)
-        self.button_photo.clicked.connect(self.start)
-
-        self.button_name = QPushButton('Change name', parent=self)
-        self.button_name.setGeometry(600, 500, 300, 50)
-        self.button_name.clicked.connect(self.prev)
-
-        # Инициализация layout, для удобного размещения виджетов и добавление всех объектов в него
-        layout = QVBoxLayout()
-        layout.addWidget(self.image_label)
-        layout.addWidget(self.time_label)
-        layout.addWidget(self.label)
-        layout.addWidget(self.button_photo)
-        layout.addWidget(self.button_name)
-        self.setLayout(layout)
-
-        # Инициализация таймера, для отображения видео с камеры
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_frame)
-
-        # Присваивание времени фотографии и камеры
-        self.start_programm()
-
-    def start_programm(self):
-        """
-        Присваивание времени фотографии и камеры.
-        Функция вызывается при вызове данного интерфейса.
-        """
-        # Инициализация переменных
-        self.timer_duration = 5
-        self.remaining_time = 5
-        self.video_capture = cv2.VideoCapture(self.__camera_index)
-
-        self.update_time_label()
-
-    def update_frame(self):
-        """
-        Обновление кадра.
-        Метод, который вызывается при каждом такте таймера QTimer,
-        что позволяет постоянно получать изображение и вести обратный отсчет.
-        """
-
-        # Получение кадра с камеры
-        ret, frame = self.video_capture.read()
-        if ret:
-            # Преобразования изображения
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            h, w, ch = frame.shape
-            bytes_per_line = ch * w
-
-            # Загрузка изображения на экран
-            qt_image = QImage(frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            pixmap = QPixmap.fromImage(qt_image)
-            self.image_label.setPixmap(pixmap)
-
-            # Обратный отсчет
-            self.remaining_time -= 0.03
-            self.update_time_label()
-
-            # Проверка осталось ли еще время, если нет - закрыть окно
-            if self.remaining_time <= 0:
-                self.close()
-
-    def update_time_label(self):
-        """
-        Обновления надписи остатка времени.
-        """
-
-        time_str = QTime(0, 0).addSecs(int(self.remaining_time)).toString("mm:ss")
-        self.time_label.setText(f"Time Left: {time_str}")
-
-    def close(self):
-        """
-        Метод, который вызывается при закрытии окна.
-        Для реализации функции переключения интерфейса используется graphic_interfaces и методы взаимодействия с другими интерфейсами.
-        В первую очередь находится интерфейс с именем "like".
-        После того, как интерфейс найден, текущий видимый интерфейс изменяется на найденный.
-        """
-
-        # Чтение кадра с камеры
-        success, frame = self.video_capture.read()
-
-        if success:
-            # Запись кадра в файл с индивидуальным порядковым номером
-            cv2.imwrite(f"dataset/{config.count_names-1}.jpg", frame)
-            print("Successfully saved")
-
-        # Закрытие всех окон opencv
-        self.video_capture.release()
-        cv2.destroyAllWindows()
-
-        # Остановка таймера
-        self.timer.stop()
-
-        # Переключение на следующий интерфейс
-        interface = self.graphic_interfaces.get_interface_by_name('like')
-        interface.display_image()
-        self.graphic_interfaces.change_interface(interface)
-
-    def start(self):
-        """
-        Метод для старта таймера, чтобы начиналось отображения камеры и обратный отсчет.
-        """
-
-        self.timer.start(30)
-
-    def prev(self):
-        """
-        Метод для изменения имени.
-        Удаляется последний добавленный объект в словарь.
-        Находится интерфейс с именем "name".
-        Задается значение пустой строки для поля ввода в полученном интерфейсе, чтобы не было видно предыдущего имени.
-        Далее следует замена текущего интерфейса на новый.
-        """
-        config.names.pop(config.count_names-1)
-        config.count_names -= 1
-        interface = self.graphic_interfaces.get_interface_by_name('name')
-        interface.text_edit.setText('')
-        self.graphic_interfaces.change_interface(interface)
-
-
-class LikeInterface(QWidget):
-    """
-    Класс LikeInterface:
-    Шаблон окна для показа получившегося фото.
-    Если фото не понравилось, пользователь сможет сделать его еще раз.
-    Если пользователя все устраивает, основной код начнет работу
-    """
-
-    def __init__(self, graphic_interfaces: GraphicInterfaces):
-        """
-        Инициализация объекта класса.
-
-        :param graphic_interfaces: Объект класса GraphicInterfaces, для взаимодействия с другими интерфейсами и управления основным окном.
-        """
-        # Инициализация шрифта
-        self.bold_font = QFont()
-        self.bold_font.setPointSize(20)
-        self.bold_font.setBold(True)
-
-        # Инициализация переменных
-        self.graphic_interfaces = graphic_interfaces
-        self.__image_path = ''
-        self.__image = None
-
-        # Инициализация графики и самого виджета
-        super().__init__()
-        self.init_ui()
-
-    def init_ui(self):
-        """
-        Инициализация графики, виджетов и их расстановка на экране.
-        """
-
-        # Инициализация элемента надписи заголовка
-        self.label = QLabel('Like', parent=self)
-        self.label.setFont(self.bold_font)
-        self.label.setAlignment(Qt.AlignCenter)
-        self.label.setGeometry(0, 0, 300, 50)
-
-        # Инициализация элемента показа фото
-        self.image_label = QLabel(self)
-        self.image_label.setAlignment(Qt.AlignCenter)
-
-        layout = QVBoxLayout()
-        layout.addWidget(self.image_label)
-        self.setLayout(layout)
-
-        # Инициализация кнопки Да
-        self.button_yes = QPushButton('Yes', parent=self)
-        self.button_yes.setGeometry(100, 500, 300, 50)
-        self.button_yes.clicked.connect(self.next)
-
-        # Инициализация кнопки Нет
-        self.button_no = QPushButton('No', parent=self)
-        self.button_no.setGeometry(600, 500, 300, 50)
-        self.button_no.clicked.connect(self.prev)
-
-    def next(self):
-        """
-        Запуск основного кода.
-        Изменение флага на значение True.
-        """
-        self.graphic_interfaces.isStart = True
-        config.save()
-        print('Saved!')
-
-    def prev(self):
-        """
-        Переход на предыдущий интерфейс, для повторного создания фотографии.
-        Для реализации функции переключения интерфейса используется graphic_interfaces и методы взаимодействия с другими интерфейсами.
-        В первую очередь находится интерфейс с именем "picture".
-        После того, как интерфейс найден, текущий видимый интерфейс изменяется на найденный.
-        """
-        interface = self.graphic_interfaces.get_interface_by_name('picture')
-        interface.start_programm()
-        self.graphic_interfaces.change_interface(interface)
-
-    def display_image(self):
-        """
-        Отображения фото на экране.
-        """
-
-        # Загрузка фото
-        print(config.count_names)
-        self.__image_path = f'dataset/{config.count_names-1}.jpg'
-        self.__image = cv2.imread(self.__image_path)
-
-        # Если изображение существует
-        if self.__image is not None:
-            # Преобразования изображения
-            rgb_image = cv2.cvtColor(self.__image, cv2.COLOR_BGR2RGB)
-            h, w, ch = rgb_image.shape
-            bytes_per_line = ch * w
-
-            # Загрузка изображения на экран
-            qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            pixmap = QPixmap.fromImage(qt_image)
-            self.image_label.setPixmap(pixmap)
-
-
-if __name__ == '__main__':
-    config.load()
-    app = QApplication(sys.argv)
-    window = GraphicInterfaces()
-    window.show()
-    sys.exit(app.exec_())
+import interfaces
+import sys
+import cv2
+import config
+import camera_broker
+import threading
+import time
+import functools
+import tracing
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from PyQt5.QtGui import QFont, QImage, QPainter, QPixmap
+from PyQt5.QtCore import Qt, QThread, QTime, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QLabel, QLineEdit, QVBoxLayout, QWidget, \
+    QStackedWidget, QGridLayout
+
+
+class GraphicInterfaces(interfaces.GraphicInterfaces):
+    """
+    Класс GraphicInterfaces:
+    Главный управляющий класс.
+    Регулирует работу всех графических интерфейсов, переключение между ними и другие операции.
+    Также является главным окном приложения, содержит переменные для взаимодействия с основным кодом.
+    """
+
+    def __init__(self, enrollment=None):
+        """
+        Инициализация объекта класса.
+        :param enrollment: Объект класса enrollment.Enrollment, через который новые люди сразу добавляются в распознавание,
+            None - новые люди станут известны только после перезапуска.
+        """
+
+        # Инициализация переменных
+        self.__started = time.perf_counter()
+        self.__startup = {}
+        self.isStart = False
+        self.enrollment = enrollment
+        self.person_id = None
+
+        # Инициализация графики и самого виджета
+        super().__init__()
+        self.__init_ui()
+        self.__startup['init'] = time.perf_counter() - self.__started
+
+    def __init_ui(self):
+        """
+        Инициализация интерфейсов, настройка окна приложения.
+        В коде создается словарь способов создания интерфейсов, сами интерфейсы создаются при первом обращении по имени.
+        Также создается объект класса QStackedWidget, для управления видимым интерфейсом.
+        """
+
+        # Настройка основных параметров окна
+        self.setGeometry(100, 100, 1000, 550)
+        self.setWindowTitle("Main Window")
+        self.setFixedSize(1000, 550)
+
+        # Создание словаря способов создания интерфейсов и словаря уже созданных интерфейсов
+        self.__factories = {'name': lambda: NameInterface(self),
+                            'picture': lambda: PictureInterface(self, 0),
+                            'like': lambda: LikeInterface(self)}
+        self.__interfaces = {}
+
+        # Создание виджета для переключения между окнами
+        self.stacked_widget = QStackedWidget(self)
+        self.setCentralWidget(self.stacked_widget)
+
+        # Установка видимого интерфейса в основной виджет, остальные интерфейсы создаются при переходе к ним
+        self.stacked_widget.setCurrentWidget(self.get_interface_by_name('name'))
+
+    def change_interface(self, widget: QWidget) -> None:
+        """
+        Изменение основного видимого интерфейса.
+        Метод не возвращает значений.
+        :param widget: Объект класса QWidget, интерфейс, на который поменяется нынешний.
+        """
+        self.stacked_widget.setCurrentWidget(widget)
+
+    def get_interface_by_name(self, name: str):
+        """
+        Получение интерфейса по его имени.
+        При первом обращении интерфейс создается и добавляется в основной виджет.
+        :param name: Имя интерфейса, по которому осуществляется поиск.
+        :return interface: Объект одного из классов, описывающих интерфейсы, если нет объекта с таким именем, вернется None.
+        """
+        if name not in self.__interfaces:
+            if name not in self.__factories:
+                return None
+            started = time.perf_counter()
+            interface = self.__factories[name]()
+            self.stacked_widget.addWidget(interface)
+            self.__interfaces[name] = interface
+            self.__startup[f'build_{name}'] = time.perf_counter() - started
+        return self.__interfaces[name]
+
+    @property
+    def startup_report(self) -> dict:
+        """
+        Время запуска в миллисекундах: init - создание окна, interactive - от создания окна
+        до первой обработки событий после показа, build_<имя> - создание каждого интерфейса.
+        """
+        return {key: value * 1000 for key, value in self.__startup.items()}
+
+    def showEvent(self, event):
+        """
+        При первом показе окна запоминается момент, когда интерфейс начинает отвечать на нажатия.
+        """
+        super().showEvent(event)
+        if 'interactive' not in self.__startup:
+            QTimer.singleShot(0, self.__mark_interactive)
+
+    def __mark_interactive(self):
+        """
+        Запись времени до первой обработки событий и вывод отчета о запуске.
+        """
+        self.__startup['interactive'] = time.perf_counter() - self.__started
+        print('Startup: ' + ', '.join(f'{key} {value:.1f} ms' for key, value in self.startup_report.items()))
+
+
+class CaptureWorker(QThread):
+    """
+    Класс CaptureWorker:
+    Поток получения кадров с камеры и их подготовки к показу.
+    Ожидание кадра и уменьшение до размера области показа выполняются вне потока графического интерфейса,
+    поэтому медленная камера не задерживает клавиатуру и кнопки.
+    Кадр BGR показывается без преобразования в RGB (QImage.Format_BGR888) и масштабируется один раз,
+    сразу в один из трех заранее выделенных буферов: первый показывается, во втором лежит готовый кадр,
+    в третий записывается новый. Поэтому на каждом кадре память не выделяется, а показываемый буфер не перезаписывается.
+    Хранится только самый свежий кадр: сигнал frame_ready не отправляется повторно, пока интерфейс не заберет кадр методом take().
+    """
+    frame_ready = pyqtSignal()
+
+    def __init__(self, camera: camera_broker.SharedCapture, timeout: float = 0.1):
+        """
+        Инициализация объекта класса.
+        :param camera: Объект класса SharedCapture, подписка на камеру.
+        :param timeout: Время ожидания кадра в секундах, после которого проверяется запрос остановки.
+        """
+        super().__init__()
+        self.__camera = camera
+        self.__timeout = timeout
+        self.__lock = threading.Lock()
+        self.__target_size = None
+        self.__buffers = [None, None, None]
+        self.__images = [None, None, None]
+        self.__ready = None
+        self.__shown = None
+        self.__frame = None
+        self.__notified = False
+
+    def set_target_size(self, width: int, height: int) -> None:
+        """
+        Изменение размера области показа. Кадр уменьшается с сохранением пропорций, но не увеличивается.
+        :param width: Ширина в пикселях.
+        :param height: Высота в пикселях.
+        """
+        with self.__lock:
+            self.__target_size = (max(1, width), max(1, height))
+
+    def run(self) -> None:
+        """
+        Цикл потока: ожидание кадра, подготовка и уведомление интерфейса.
+        """
+        while not self.isInterruptionRequested():
+            captured = self.__camera.read_next(self.__timeout)
+            if captured is None:
+                continue
+            if self.prepare(captured.frame):
+                self.frame_ready.emit()
+
+    def prepare(self, frame: np.ndarray) -> bool:
+        """
+        Масштабирование кадра в свободный буфер. Вызывается из потока камеры, в замерах - напрямую.
+        :param frame: Кадр BGR.
+        :return: True, если интерфейс нужно уведомить о новом кадре.
+        """
+        with self.__lock:
+            target_size = self.__target_size
+            slot = next(i for i in range(3) if i != self.__ready and i != self.__shown)
+        size = self.__fit(frame.shape[1], frame.shape[0], target_size)
+
+        # Буфер выделяется заново только при изменении размера
+        with tracing.span('gui.prepare_frame', 'gui'):
+            buffer = self.__buffers[slot]
+            if buffer is None or buffer.shape[:2] != (size[1], size[0]):
+                buffer = np.empty((size[1], size[0], 3), dtype=np.uint8)
+                self.__buffers[slot] = buffer
+                self.__images[slot] = QImage(buffer.data, size[0], size[1], buffer.strides[0], QImage.Format_BGR888)
+            if size == (frame.shape[1], frame.shape[0]):
+                np.copyto(buffer, frame)
+            else:
+                cv2.resize(frame, size, dst=buffer, interpolation=cv2.INTER_LINEAR)
+
+        with self.__lock:
+            self.__ready = slot
+            self.__frame = frame
+            notify = not self.__notified
+            self.__notified = True
+        return notify
+
+    def take(self) -> Optional[QImage]:
+        """
+        Получение самого свежего подготовленного кадра.
+        Буфер кадра не перезаписывается, пока не будет получен следующий кадр.
+        :return: Объект QImage или None, если новых кадров не было.
+        """
+        with self.__lock:
+            self.__notified = False
+            if self.__ready is None:
+                return None
+            self.__shown, self.__ready = self.__ready, None
+            return self.__images[self.__shown]
+
+    @property
+    def frame(self) -> Optional[np.ndarray]:
+        """
+        Исходный кадр BGR последнего подготовленного изображения.
+        """
+        with self.__lock:
+            return self.__frame
+
+    def stop(self) -> None:
+        """
+        Остановка потока с ожиданием его завершения.
+        """
+        self.requestInterruption()
+        self.wait()
+
+    @staticmethod
+    def __fit(width: int, height: int, target_size: Optional[tuple]) -> tuple:
+        """
+        Размер кадра, вписанного в область показа.
+        """
+        if target_size is None:
+            return width, height
+        scale = min(1.0, target_size[0] / width, target_size[1] / height)
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+class PreviewLabel(QLabel):
+    """
+    Класс PreviewLabel:
+    Область показа видео с камеры.
+    Кадр рисуется прямо из буфера CaptureWorker, без создания QPixmap на каждом кадре.
+    """
+    def __init__(self, parent: QWidget = None):
+        """
+        Инициализация объекта класса.
+        :param parent: Родительский виджет.
+        """
+        super().__init__(parent)
+        self.__image = None
+
+    def set_image(self, image: Optional[QImage]) -> None:
+        """
+        Замена показываемого кадра.
+        :param image: Объект QImage, который должен оставаться действительным до следующего вызова.
+        """
+        self.__image = image
+        self.update()
+
+    def paintEvent(self, event) -> None:
+        """
+        Рисование кадра по центру области.
+        """
+        if self.__image is None:
+            super().paintEvent(event)
+            return
+        with tracing.span('gui.paint', 'gui'):
+            painter = QPainter(self)
+            x = (self.width() - self.__image.width()) // 2
+            y = (self.height() - self.__image.height()) // 2
+            painter.drawImage(x, y, self.__image)
+            painter.end()
+
+
+def write_snapshot(path: str, frame: np.ndarray, enrollment=None) -> None:
+    """
+    Запись фотографии в dataset. Выполняется в фоновом потоке PictureInterface.
+    :param path: Путь к фотографии.
+    :param frame: Кадр BGR.
+    :param enrollment: Объект класса enrollment.Enrollment, через кэш которого удаляется вектор прежней фотографии.
+        Без него кэш не меняется: при следующем запуске прежний вектор не совпадет с фото по размеру и хэшу.
+    """
+    cv2.imwrite(path, frame)
+    print("Successfully saved")
+
+    # Вектор лица прежней фотографии с этим номером больше не актуален
+    if enrollment is not None:
+        enrollment.invalidate(path)
+
+
+class NameInterface(QWidget):
+    """
+    Класс NameInterface:
+    Шаблон окна для ввода имени с виртуальной клавиатуры.
+    """
+
+    def __init__(self, graphic_interfaces: GraphicInterfaces):
+        """
+        Инициализация объекта класса.
+        :param graphic_interfaces: Объект класса GraphicInterfaces, для взаимодействия с другими интерфейсами и управления основным окном.
+        """
+
+        # Инициализация шрифта
+        self.bold_font = QFont()
+        self.bold_font.setPointSize(20)
+        self.bold_font.setBold(True)
+
+        # Инициализация переменных
+        self.graphic_interfaces = graphic_interfaces
+
+        # Инициализация графики и самого виджета
+        super().__init__()
+        self.init_ui()
+
+    def init_ui(self):
+        """
+        Инициализация графики, виджетов и их расстановка на экране.
+        Создание виртуальной клавиатуры и ее размещение на экране.
+        """
+
+        # Инициализация надписи заголовка
+        self.label = QLabel('Name', parent=self)
+        self.label.setFont(self.bold_font)
+        self.label.setAlignment(Qt.AlignCenter)
+        self.label.setGeometry(350, 0, 300, 50)
+
+        # Создание layout для удобного размещения компонентов
+        self.layout = QVBoxLayout()
+
+        # Создание сетки для размещения кнопок клавиатуры
+        grid_layout = QGridLayout()
+
+        # Создание кнопок для клавиш
+        buttons = [
+            'й', 'ц', 'у', 'к', 'е', 'н', 'г', 'ш', 'щ', 'з', 'х',
+            'ф', 'ы', 'в', 'а', 'п', 'р', 'о', 'л', 'д', 'ж', 'э',
+            'я', 'ч', 'с', 'м', 'и', 'т', 'ь',
+            'Backspace',
+            'Enter'
+        ]
+
+        # Настройка клавиш
+        row, col = 0, 0
+        for button_text in buttons:
+            if button_text == 'Backspace':
+                button = QPushButton(button_text)
+                button.setFixedHeight(40)
+                button.clicked.connect(self.onBackspaceClick)
+                grid_layout.addWidget(button, row, col, 1, 2)  # Занимаем две ячейки для кнопки Backspace
+                col += 2
+            elif button_text == 'Enter':
+                button = QPushButton(button_text)
+                button.setFixedHeight(40)
+                button.clicked.connect(self.onEnterClick)
+                grid_layout.addWidget(button, row, col, 1, 2)  # Занимаем две ячейки для кнопки Enter
+                col += 2
+            else:
+                button = QPushButton(button_text)
+                button.setFixedHeight(40)
+                button.clicked.connect(self.onButtonClick)
+                grid_layout.addWidget(button, row, col)
+                col += 1
+
+            if col > 10:
+                col = 0
+                row += 1
+
+        # Поле для отображения текста
+        self.text_edit = QLineEdit()
+        self.layout.addWidget(self.text_edit)
+        self.layout.addLayout(grid_layout)  # Добавляем сетку кнопок после поля ввода
+
+        self.setLayout(self.layout)
+
+    def onButtonClick(self):
+        """
+        Обработка нажатия на кнопку.
+        При нажатии на кнопку в поле ввода добавится буква, на кнопку которой вы нажали.
+        """
+
+        button = self.sender()
+        text = button.text()
+        current_text = self.text_edit.text()
+        self.text_edit.setText(current_text + text)
+
+    def onBackspaceClick(self):
+        """
+        Обработка нажатия на кнопку Backspace.
+        При нажатии на кнопку в поле ввода удалится последний символ, если оно не пусто, иначе ничего не произойдет.
+        """
+
+        current_text = self.text_edit.text()
+        if current_text:
+            self.text_edit.setText(current_text[:-1])
+
+    def onEnterClick(self):
+        """
+        Обработка нажатия на кнопку Enter.
+        При нажатии на кнопку в config.registry добавится имя из поля ввода,
+        а выданный порядковый номер запишется в graphic_interfaces.person_id, под этим номером будет сохранено фото.
+        """
+
+        current_text = self.text_edit.text()
+        self.graphic_interfaces.person_id = config.registry.add(current_text.capitalize())
+        self.next()
+
+    def next(self):
+        """
+        Запуск интерфейса создания фотографии
+        Для реализации данной функции используется graphic_interfaces и методы взаимодействия с другими интерфейсами.
+        Сначала находится интерфейс с именем "picture".
+        Далее текущий видимый интерфейс изменяется на найденный.
+        """
+        interface = self.graphic_interfaces.get_interface_by_name('picture')
+        self.graphic_interfaces.change_interface(interface)
+
+
+class PictureInterface(QWidget):
+    """
+    Класс PictureInterface:
+    Шаблон окна для создания фотографии, которая будет использоваться для распознавания лица
+    """
+
+    # Сигнал из потока записи фотографии, обрабатывается в потоке интерфейса
+    snapshot_written = pyqtSignal()
+
+    def __init__(self, graphic_interfaces: GraphicInterfaces, camera_index: int):
+        """
+        Инициализация объекта класса.
+
+        :param graphic_interfaces: Объект класса GraphicInterfaces, для взаимодействия с другими интерфейсами и управления основным окном.
+        :param camera_index: camera_index: int - Целое число, индекс камеры для метода cv2.VideoCapture()
+        """
+
+        # Инициализация переменных
+        self.graphic_interfaces = graphic_interfaces
+        self.__camera_index = camera_index
+        self.video_capture = None
+        self.capture_worker = None
+        self.__deadline = 0.0
+        self.__last_shown = 0.0
+
+        # Фотографии записываются на диск по очереди в фоновом потоке
+        self.__snapshot_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='Snapshot')
+        self.__snapshot = None
+        self.__after_snapshot = []
+
+        # Инициализация виджета
+        super().__init__()
+        self.snapshot_written.connect(self.__run_after_snapshot)
+
+        # Инициализация графики
+        self.init_ui()
+
+    def init_ui(self):
+        """
+        Инициализация графики, виджетов и их расстановка на экране.
+        """
+        # Инициализация виджетов надписей и кнопок
+        self.image_label = PreviewLabel(self)
+        self.image_label.setAlignment(Qt.AlignCenter)
+
+        self.time_label = QLabel(self)
+        self.time_label.setAlignment(Qt.AlignCenter)
+
+        self.label = QLabel('Picture', parent=self)
+        self.label.setAlignment(Qt.AlignCenter)
+        self.label.setGeometry(0, 0, 300, 50)
+
+        self.button_photo = QPushButton('Take photo', parent=self)
+        self.button_photo.setGeometry(100, 500, 300, 50)
+        self.button_photo.clicked.connect(self.start)
+
+        self.button_name = QPushButton('Change name', parent=self)
+        self.button_name.setGeometry(600, 500, 300, 50)
+        self.button_name.clicked.connect(self.prev)
+
+        # Инициализация layout, для удобного размещения виджетов и добавление всех объектов в него
+        layout = QVBoxLayout()
+        layout.addWidget(self.image_label)
+        layout.addWidget(self.time_label)
+        layout.addWidget(self.label)
+        layout.addWidget(self.button_photo)
+        layout.addWidget(self.button_name)
+        self.setLayout(layout)
+
+        # Инициализация таймера обратного отсчета, кадры с камеры приходят от CaptureWorker
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_frame)
+
+        # Присваивание времени фотографии
+        self.start_programm()
+
+    def start_programm(self):
+        """
+        Присваивание времени фотографии.
+        Функция вызывается при вызове данного интерфейса, камера подключается при его показе.
+        """
+        # Инициализация переменных
+        self.timer_duration = 5
+        self.remaining_time = 5
+
+        self.update_time_label()
+
+    def showEvent(self, event):
+        """
+        Подписка на камеру через общий broker при показе интерфейса, повторно камера не открывается.
+        """
+        super().showEvent(event)
+        if self.video_capture is None:
+            self.video_capture = camera_broker.broker.acquire(self.__camera_index, 640, 480)
+
+    def hideEvent(self, event):
+        """
+        Остановка показа и отсчета и освобождение камеры, когда интерфейс скрыт,
+        чтобы камера была доступна другим подсистемам.
+        """
+        super().hideEvent(event)
+        self.timer.stop()
+        self.__stop_worker()
+        self.__release_camera()
+
+    def __stop_worker(self):
+        """
+        Остановка потока камеры.
+        :return: Последний полученный кадр BGR или None.
+        """
+        if self.capture_worker is None:
+            return None
+        self.capture_worker.stop()
+        frame = self.capture_worker.frame
+
+        # Показываемый кадр лежит в буфере потока, ссылка на него убирается вместе с потоком
+        self.image_label.set_image(None)
+        self.capture_worker = None
+        return frame
+
+    def __release_camera(self):
+        """
+        Отписка от камеры, если подписка есть.
+        """
+        if self.video_capture is not None:
+            self.video_capture.release()
+            self.video_capture = None
+
+    def show_frame(self):
+        """
+        Показ кадра, подготовленного CaptureWorker.
+        Метод вызывается по сигналу frame_ready в потоке графического интерфейса.
+        Кадры показываются не чаще частоты обновления экрана, лишние кадры заменяются более свежими.
+        """
+        if self.capture_worker is None:
+            return
+
+        # Слишком рано для нового кадра, показ откладывается до следующего обновления экрана
+        delay = self.__last_shown + self.__frame_interval() - time.monotonic()
+        if delay > 0:
+            QTimer.singleShot(int(delay * 1000) + 1, self.show_frame)
+            return
+
+        with tracing.span('gui.show_frame', 'gui'):
+            image = self.capture_worker.take()
+            if image is not None:
+                self.__last_shown = time.monotonic()
+                self.image_label.set_image(image)
+
+    def __frame_interval(self) -> float:
+        """
+        Минимальный интервал между показами кадров в секундах, по частоте обновления экрана.
+        """
+        screen = self.screen()
+        refresh_rate = screen.refreshRate() if screen is not None else 0
+        return 1 / refresh_rate if refresh_rate > 0 else 1 / 60
+
+    def resizeEvent(self, event):
+        """
+        Передача нового размера области показа в CaptureWorker, чтобы кадры масштабировались сразу до нее.
+        """
+        super().resizeEvent(event)
+        if self.capture_worker is not None:
+            self.capture_worker.set_target_size(self.image_label.width(), self.image_label.height())
+
+    def update_frame(self):
+        """
+        Обратный отсчет.
+        Метод, который вызывается при каждом такте таймера QTimer, и не зависит от скорости камеры.
+        Остаток времени считается по часам, поэтому задержки таймера не замедляют отсчет.
+        """
+        with tracing.span('gui.update_frame', 'gui'):
+            self.remaining_time = max(0.0, self.__deadline - time.monotonic())
+            self.update_time_label()
+
+        # Проверка осталось ли еще время, если нет - закрыть окно
+        if self.remaining_time <= 0:
+            self.close()
+
+    def update_time_label(self):
+        """
+        Обновления надписи остатка времени.
+        """
+
+        time_str = QTime(0, 0).addSecs(int(self.remaining_time)).toString("mm:ss")
+        self.time_label.setText(f"Time Left: {time_str}")
+
+    def close(self):
+        """
+        Метод, который вызывается при закрытии окна.
+        Для реализации функции переключения интерфейса используется graphic_interfaces и методы взаимодействия с другими интерфейсами.
+        В первую очередь находится интерфейс с именем "like".
+        После того, как интерфейс найден, текущий видимый интерфейс изменяется на найденный.
+        """
+
+        # Остановка потока камеры, последний кадр уже получен, ожидания камеры нет
+        frame = self.__stop_worker()
+
+        if frame is not None:
+            # Запись кадра в файл с индивидуальным порядковым номером в фоновом потоке
+            path = f"dataset/{self.graphic_interfaces.person_id}.jpg"
+            self.__snapshot = self.__snapshot_writer.submit(write_snapshot, path, frame,
+                                                            self.graphic_interfaces.enrollment)
+            self.__snapshot.add_done_callback(lambda _: self.snapshot_written.emit())
+
+            # Вычисление вектора лица начинается сразу, пока пользователь смотрит на фото
+            if self.graphic_interfaces.enrollment is not None:
+                self.graphic_interfaces.enrollment.prepare(self.graphic_interfaces.person_id, frame, path)
+        else:
+            self.__snapshot = None
+
+        # Освобождение камеры и закрытие всех окон opencv
+        self.__release_camera()
+        cv2.destroyAllWindows()
+
+        # Остановка таймера
+        self.timer.stop()
+
+        # Переключение на следующий интерфейс
+        interface = self.graphic_interfaces.get_interface_by_name('like')
+        interface.display_image(frame)
+        self.graphic_interfaces.change_interface(interface)
+
+    def after_snapshot(self, callback) -> None:
+        """
+        Вызов функции в потоке интерфейса после записи последней фотографии на диск, без ожидания записи.
+        Если фотографию не удалось записать, функция не вызывается.
+        :param callback: Функция без аргументов.
+        """
+        self.__after_snapshot.append(callback)
+        if self.__snapshot is None or self.__snapshot.done():
+            self.__run_after_snapshot()
+
+    def __run_after_snapshot(self) -> None:
+        """
+        Вызов функций, ожидающих записи фотографии. Выполняется в потоке интерфейса.
+        """
+        if self.__snapshot is not None and not self.__snapshot.done():
+            return
+        callbacks, self.__after_snapshot = self.__after_snapshot, []
+        error = self.__snapshot.exception() if self.__snapshot is not None else None
+        if error is not None:
+            print(f'Snapshot was not saved: {error!r}')
+            return
+        for callback in callbacks:
+            callback()
+
+    def start(self):
+        """
+        Метод для старта таймера и потока камеры, чтобы начиналось отображения камеры и обратный отсчет.
+        """
+        if self.video_capture is None:
+            return
+        if self.capture_worker is None:
+            self.capture_worker = CaptureWorker(self.video_capture)
+            self.capture_worker.set_target_size(self.image_label.width(), self.image_label.height())
+            self.capture_worker.frame_ready.connect(self.show_frame)
+            self.capture_worker.start()
+        self.__deadline = time.monotonic() + self.remaining_time
+        self.timer.start(30)
+
+    def prev(self):
+        """
+        Метод для изменения имени.
+        Из config.registry удаляется имя, добавленное для текущего фото.
+        Находится интерфейс с именем "name".
+        Задается значение пустой строки для поля ввода в полученном интерфейсе, чтобы не было видно предыдущего имени.
+        Далее следует замена текущего интерфейса на новый.
+        """
+        person_id = self.graphic_interfaces.person_id
+        if self.graphic_interfaces.enrollment is not None:
+            self.graphic_interfaces.enrollment.remove(person_id)
+        config.registry.remove(person_id)
+        self.graphic_interfaces.person_id = None
+        interface = self.graphic_interfaces.get_interface_by_name('name')
+        interface.text_edit.setText('')
+        self.graphic_interfaces.change_interface(interface)
+
+
+class LikeInterface(QWidget):
+    """
+    Класс LikeInterface:
+    Шаблон окна для показа получившегося фото.
+    Если фото не понравилось, пользователь сможет сделать его еще раз.
+    Если пользователя все устраивает, основной код начнет работу
+    """
+
+    def __init__(self, graphic_interfaces: GraphicInterfaces):
+        """
+        Инициализация объекта класса.
+
+        :param graphic_interfaces: Объект класса GraphicInterfaces, для взаимодействия с другими интерфейсами и управления основным окном.
+        """
+        # Инициализация шрифта
+        self.bold_font = QFont()
+        self.bold_font.setPointSize(20)
+        self.bold_font.setBold(True)
+
+        # Инициализация переменных
+        self.graphic_interfaces = graphic_interfaces
+        self.__image = None
+        self.__pending_commit = None
+
+        # Инициализация графики и самого виджета
+        super().__init__()
+        self.init_ui()
+
+    def init_ui(self):
+        """
+        Инициализация графики, виджетов и их расстановка на экране.
+        """
+
+        # Инициализация элемента надписи заголовка
+        self.label = QLabel('Like', parent=self)
+        self.label.setFont(self.bold_font)
+        self.label.setAlignment(Qt.AlignCenter)
+        self.label.setGeometry(0, 0, 300, 50)
+
+        # Инициализация элемента показа фото
+        self.image_label = QLabel(self)
+        self.image_label.setAlignment(Qt.AlignCenter)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.image_label)
+        self.setLayout(layout)
+
+        # Инициализация кнопки Да
+        self.button_yes = QPushButton('Yes', parent=self)
+        self.button_yes.setGeometry(100, 500, 300, 50)
+        self.button_yes.clicked.connect(self.next)
+
+        # Инициализация кнопки Нет
+        self.button_no = QPushButton('No', parent=self)
+        self.button_no.setGeometry(600, 500, 300, 50)
+        self.button_no.clicked.connect(self.prev)
+
+    def next(self):
+        """
+        Запуск основного кода.
+        Изменение флага на значение True.
+        """
+        self.graphic_interfaces.isStart = True
+
+        # Фото должно быть на диске до того, как его вектор будет записан в кэш,
+        # поэтому подтверждение выполняется после записи, не задерживая интерфейс
+        person_id = self.graphic_interfaces.person_id
+        self.__pending_commit = person_id
+        self.graphic_interfaces.get_interface_by_name('picture').after_snapshot(lambda: self.__commit(person_id))
+
+    def __commit(self, person_id: int) -> None:
+        """
+        Подтверждение фото и сохранение имени после записи фото на диск.
+        Если пользователь успел отказаться от фото, ничего не происходит.
+        :param person_id: Порядковый номер имени.
+        """
+        if self.__pending_commit != person_id:
+            return
+        self.__pending_commit = None
+        if self.graphic_interfaces.enrollment is not None:
+            # Вектор добавляется в галерею и кэш в потоке Enrollment, интерфейс его не ждет
+            self.graphic_interfaces.enrollment.commit(person_id, functools.partial(self.__committed, person_id))
+
+        # Имя сохраняется в фоновом потоке, с Enrollment оно еще и сразу записывается на диск после подтверждения
+        config.save()
+        print('Saved!')
+
+    @staticmethod
+    def __committed(person_id: int, added: bool) -> None:
+        """
+        Сообщение о завершении подтверждения фото и сохранение имени на диск. Вызывается в потоке Enrollment,
+        поэтому запись на диск не задерживает интерфейс.
+        :param person_id: Порядковый номер имени.
+        :param added: True, если лицо добавлено в распознавание.
+        """
+        config.registry.flush()
+        print(f'Face of id {person_id} ' + ('is recognized now' if added else 'was not added to recognition'))
+
+    def prev(self):
+        """
+        Переход на предыдущий интерфейс, для повторного создания фотографии.
+        Для реализации функции переключения интерфейса используется graphic_interfaces и методы взаимодействия с другими интерфейсами.
+        В первую очередь находится интерфейс с именем "picture".
+        После того, как интерфейс найден, текущий видимый интерфейс изменяется на найденный.
+        """
+        self.__pending_commit = None
+        if self.graphic_interfaces.enrollment is not None:
+            self.graphic_interfaces.enrollment.discard(self.graphic_interfaces.person_id)
+        interface = self.graphic_interfaces.get_interface_by_name('picture')
+        interface.start_programm()
+        self.graphic_interfaces.change_interface(interface)
+
+    def display_image(self, frame: Optional[np.ndarray] = None):
+        """
+        Отображения фото на экране.
+        :param frame: Снятый кадр BGR. Если None, вместо фото показывается надпись,
+            прежняя фотография из dataset не показывается, так как она может принадлежать другому человеку.
+        """
+
+        # Снятый кадр показывается сразу, не дожидаясь его записи на диск
+        print(self.graphic_interfaces.person_id)
+        self.__image = frame
+        if self.__image is None:
+            self.image_label.clear()
+            self.image_label.setText('No photo, press No to try again')
+            self.button_yes.setEnabled(False)
+            return
+        self.button_yes.setEnabled(True)
+
+        # Кадр BGR показывается без преобразования в RGB
+        image = np.ascontiguousarray(self.__image)
+        h, w, ch = image.shape
+        bytes_per_line = ch * w
+
+        # Загрузка изображения на экран
+        qt_image = QImage(image.data, w, h, bytes_per_line, QImage.Format_BGR888)
+        pixmap = QPixmap.fromImage(qt_image)
+        self.image_label.setPixmap(pixmap)
+
+
+if __name__ == '__main__':
+    config.load()
+    app = QApplication(sys.argv)
+
+    # Распознавание в этом же процессе, чтобы новые люди сразу становились известны без перезапуска
+    try:
+        import recognize_face
+    except ImportError as error:
+        print(f'Face recognition is not available, new people will be known after restart: {error!r}')
+        recognition = None
+    else:
+        recognition = recognize_face.FaceRecognition(0, 'dataset')
+
+    window = GraphicInterfaces(recognition.enrollment if recognition is not None else None)
+    window.show()
+    code = app.exec_()
+    if recognition is not None:
+        recognition.enrollment.wait()
+        recognition.release()
+    config.registry.flush()
+    sys.exit(code)
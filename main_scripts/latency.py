@@ -0,0 +1,183 @@
+import atexit
+import json
+import math
+import threading
+from typing import Optional
+
+
+class LatencyHistogram:
+    """
+    Класс LatencyHistogram:
+    Гистограмма задержек с логарифмическими корзинами.
+    Каждая корзина шире предыдущей в growth раз, поэтому относительная погрешность процентилей не больше (growth - 1)
+    при любом масштабе задержек, а память не зависит от количества измерений.
+    """
+    def __init__(self, growth: float = 1.05, min_value: float = 1e-6, max_value: float = 100.0):
+        """
+        Инициализация объекта класса.
+        :param growth: Во сколько раз каждая корзина шире предыдущей.
+        :param min_value: Нижняя граница первой корзины в секундах, меньшие значения попадают в нее.
+        :param max_value: Верхняя граница в секундах, большие значения попадают в последнюю корзину.
+        """
+        self.__log_growth = math.log(growth)
+        self.__min_value = min_value
+        self.__counts = [0] * (int(math.log(max_value / min_value) / self.__log_growth) + 2)
+        self.__lock = threading.Lock()
+        self.__count = 0
+        self.__sum = 0.0
+        self.__min = math.inf
+        self.__max = 0.0
+
+    @property
+    def count(self) -> int:
+        return self.__count
+
+    def record(self, seconds: float) -> None:
+        """
+        Добавление измерения.
+        :param seconds: Задержка в секундах.
+        """
+        if seconds <= self.__min_value:
+            index = 0
+        else:
+            index = min(len(self.__counts) - 1, int(math.log(seconds / self.__min_value) / self.__log_growth) + 1)
+        with self.__lock:
+            self.__counts[index] += 1
+            self.__count += 1
+            self.__sum += seconds
+            self.__min = min(self.__min, seconds)
+            self.__max = max(self.__max, seconds)
+
+    def percentile(self, percent: float) -> float:
+        """
+        Процентиль задержки.
+        :param percent: Процент от 0 до 100.
+        :return: Задержка в секундах (середина корзины, ограниченная наблюдавшимися min и max), 0 если измерений нет.
+        """
+        with self.__lock:
+            if not self.__count:
+                return 0.0
+            rank = max(1, math.ceil(self.__count * percent / 100))
+            seen = 0
+            for index, count in enumerate(self.__counts):
+                seen += count
+                if seen >= rank:
+                    break
+            if index == 0:
+                value = self.__min_value
+            else:
+                # Середина корзины [min * growth^(index-1), min * growth^index) в логарифмической шкале
+                value = self.__min_value * math.exp((index - 0.5) * self.__log_growth)
+            return min(max(value, self.__min), self.__max)
+
+    def summary(self) -> dict:
+        """
+        Сводка в миллисекундах: count, mean, min, p50, p95, p99, max.
+        """
+        with self.__lock:
+            count, total, low, high = self.__count, self.__sum, self.__min, self.__max
+        if not count:
+            return {'count': 0, 'mean': 0.0, 'min': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+        return {'count': count, 'mean': total / count * 1000, 'min': low * 1000,
+                'p50': self.percentile(50) * 1000, 'p95': self.percentile(95) * 1000,
+                'p99': self.percentile(99) * 1000, 'max': high * 1000}
+
+    def reset(self) -> None:
+        """
+        Удаление всех измерений.
+        """
+        with self.__lock:
+            self.__counts = [0] * len(self.__counts)
+            self.__count = 0
+            self.__sum = 0.0
+            self.__min = math.inf
+            self.__max = 0.0
+
+
+class LatencyRecorder:
+    """
+    Класс LatencyRecorder:
+    Набор гистограмм задержек по именам этапов, например 'laser.preparation' или 'serial.end_to_end'.
+    Измерения можно запрашивать во время работы (summary, report) и сохранять при выходе (dump_at_exit).
+    """
+    def __init__(self, enabled: bool = True):
+        """
+        Инициализация объекта класса.
+        :param enabled: Если False, измерения не записываются.
+        """
+        self.enabled = enabled
+        self.__histograms = {}
+        self.__lock = threading.Lock()
+        self.__exit_path = None
+        self.__exit_registered = False
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        """
+        Получение гистограммы этапа, при отсутствии она создается.
+        """
+        histogram = self.__histograms.get(name)
+        if histogram is None:
+            with self.__lock:
+                histogram = self.__histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Добавление измерения этапа.
+        :param name: Имя этапа.
+        :param seconds: Задержка в секундах.
+        """
+        if self.enabled:
+            self.histogram(name).record(seconds)
+
+    def summary(self) -> dict:
+        """
+        Сводки всех этапов в миллисекундах: {имя: {count, mean, min, p50, p95, p99, max}}.
+        """
+        with self.__lock:
+            histograms = dict(self.__histograms)
+        return {name: histograms[name].summary() for name in sorted(histograms)}
+
+    def report(self) -> str:
+        """
+        Таблица сводок всех этапов.
+        """
+        lines = [f"{'stage':<24} {'count':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+        for name, values in self.summary().items():
+            lines.append(f"{name:<24} {values['count']:>8} {values['p50']:>9.3f} {values['p95']:>9.3f} "
+                         f"{values['p99']:>9.3f} {values['max']:>9.3f}")
+        return '\n'.join(lines)
+
+    def reset(self) -> None:
+        """
+        Удаление измерений всех этапов.
+        """
+        with self.__lock:
+            histograms = list(self.__histograms.values())
+        for histogram in histograms:
+            histogram.reset()
+
+    def dump(self, path: Optional[str] = None) -> None:
+        """
+        Вывод таблицы сводок, а если задан path, то и сохранение сводок в .json.
+        """
+        if not any(values['count'] for values in self.summary().values()):
+            return
+        print(self.report())
+        if path is not None:
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(self.summary(), file, indent=4)
+
+    def dump_at_exit(self, path: Optional[str] = None) -> None:
+        """
+        Вывод сводок при завершении программы.
+        :param path: Путь к .json для сохранения сводок, None - только вывод на экран.
+        """
+        self.__exit_path = path
+        if not self.__exit_registered:
+            self.__exit_registered = True
+            atexit.register(lambda: self.dump(self.__exit_path))
+
+
+# Общий набор гистограмм для всех подсистем робота
+recorder = LatencyRecorder()
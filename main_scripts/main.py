@@ -1,7 +1,204 @@
-from main_scripts import config, recognize_face, recognize_speech, chase_laser, synthesis_speech, serial, get_capture
-import threading
-import asyncio
-
-
-if __name__ == '__main__':
-    print(config.names)
+import config
+import chase_laser
+import fakes
+import latency
+import orchestrator
+import serial_writer
+import tracing
+import argparse
+import asyncio
+import functools
+import signal
+
+
+def build(fake: bool = False, camera_index: int = 0, port: str = '/dev/ttyUSB0',
+          replay: str = None, processes: bool = False) -> orchestrator.Orchestrator:
+    """
+    Сборка всех подсистем робота в одном Orchestrator.
+    Кадры камеры раздаются погоне за лазером и распознаванию лиц, команды движения уходят в serial,
+    имена узнанных людей и услышанные фразы превращаются в ответы голосом и смену эмоций.
+    :param fake: Если True, все подсистемы заменяются заменителями из fakes и робот работает без оборудования.
+    :param camera_index: Индекс камеры.
+    :param port: Путь к serial порту платы управления.
+    :param replay: Путь к записи recording.py (.rec), которая воспроизводится по кругу вместо камеры.
+    :param processes: Если True, камера, погоня за лазером и распознавание лиц работают в отдельных процессах
+        и обмениваются кадрами через общую память (shm_pipeline), в этот процесс приходят только результаты.
+    :return: Объект класса Orchestrator, готовый к запуску.
+    """
+    robot = orchestrator.Orchestrator()
+
+    # Камера для отдельного процесса создается уже в нем, поэтому здесь только описание, как ее создать
+    if replay is not None:
+        import recording
+        camera_factory = functools.partial(recording.ReplayCapture, replay, loop=True)
+    elif fake:
+        camera_factory = functools.partial(fakes.FakeCapture, camera_index)
+    else:
+        import get_capture
+        camera_factory = functools.partial(get_capture.GetCapture, camera_index, threaded=True)
+
+    vision = None
+    if processes:
+        import shm_pipeline
+        vision = shm_pipeline.VisionPipeline(camera_factory, {'laser': shm_pipeline.LaserConsumer((320, 240)),
+                                                             'faces': shm_pipeline.FaceConsumer(fake, 'dataset')})
+
+    # Подсистемы с оборудованием подключаются только при необходимости, их зависимости тяжелые
+    if fake:
+        camera = camera_factory() if vision is None else None
+        serial = serial_writer.SerialWriter(fakes.FakeSerial(port))
+        recognition = fakes.FakeFaceRecognition(camera_index, 'dataset') if vision is None else None
+        emotions = fakes.FakeShowEmotions('emojis/')
+    else:
+        import emotions as emotions_module
+        import serial_port
+        camera = recognition = None
+        if vision is None:
+            import camera_broker
+            import recognize_face
+            replay_camera = camera_factory() if replay is not None else None
+            camera = replay_camera or camera_broker.broker.acquire(camera_index, 640, 480)
+            recognition = recognize_face.FaceRecognition(camera_index, 'dataset', camera=replay_camera)
+        serial = serial_writer.SerialWriter(serial_port.SerialPort(port),
+                                            reopen=lambda: serial_port.SerialPort(port))
+        emotions = emotions_module.show
+    robot.on_stop(serial.close)
+    # Имена, измененные без сохранения, записываются при остановке
+    robot.on_stop(config.registry.flush)
+    if vision is None:
+        robot.on_stop(camera.release)
+        robot.on_stop(recognition.release)
+    else:
+        vision.start()
+        robot.on_stop(vision.stop)
+
+    # Модулей распознавания и синтеза речи пока нет, поэтому речь всегда заменяется
+    speech = fakes.FakeRecognizeSpeech()
+    voice = fakes.FakeSynthesisSpeech()
+    robot.on_interrupt(speech.close)
+
+    # Очереди между задачами, в каждой только самые свежие данные
+    laser_frames = robot.queue('laser_frames', 1)
+    face_frames = robot.queue('face_frames', 1)
+    commands = robot.queue('commands', 2)
+    reactions = robot.queue('reactions', 4)
+    vision_results = robot.queue('vision_results', 8)
+
+    greeted = set()
+
+    def greet(names):
+        # Приветствие только для тех, кто появился в кадре впервые
+        new_names = names - greeted
+        greeted.update(new_names)
+        return ('greet', sorted(new_names)) if new_names else None
+
+    def faces(captured):
+        return greet({track.name for track in recognition.pipeline.process(captured.frame) if track.person_id >= 0})
+
+    def route(item):
+        # Результаты процессов обработки кадров расходятся по очередям из цикла asyncio
+        name, captured, result = item
+        if name == 'laser':
+            commands.put((result, captured.timestamp))
+        else:
+            reaction = greet({face_name for person_id, face_name, box in result if person_id >= 0})
+            if reaction is not None:
+                reactions.put(reaction)
+
+    def hear():
+        speech.listen()
+        speech.recognize()
+        return ('phrase', speech.text) if speech.text else None
+
+    def react(reaction):
+        kind, value = reaction
+        if kind == 'greet':
+            voice.synthesis('Привет, ' + ', '.join(value))
+            emotions.change_emotion('blink.mp4')
+        else:
+            voice.synthesis(f'Я услышал: {value}')
+            emotions.change_emotion('sadblink.mp4' if value.lower() == 'стоп' else 'blink.mp4')
+
+    def report():
+        parts = []
+        for name, values in robot.statistics.items():
+            if 'rate' in values:
+                parts.append(f"{name} {values['rate']:.1f}/{values['target'] or '-'} Hz"
+                             + (f" ({values['errors']} errors)" if values['errors'] else ''))
+            elif values['dropped']:
+                parts.append(f"{name} dropped {values['dropped']}")
+        if vision is not None:
+            parts.extend(f"{name} {values['rate']:.1f} Hz, skipped {values['skipped']}"
+                         for name, values in vision.statistics.items())
+        print('; '.join(parts))
+
+    if vision is None:
+        # В режиме процессов погоня за лазером работает в процессе shm_pipeline.LaserConsumer
+        chase = chase_laser.ChaseLaser(None, processing_size=(320, 240))
+
+        # Команда идет в serial вместе со временем захвата кадра, SerialWriter измеряет задержку до записи в порт
+        def laser(captured):
+            chase.set_camera(captured.frame, captured.timestamp, captured.sequence)
+            chase.chase()
+            return chase.action, captured.timestamp
+
+        robot.add_task('capture', camera.read_frame, rate=30, offload='thread', sinks=(laser_frames, face_frames))
+        robot.add_task('laser', laser, offload='thread', source=laser_frames, sinks=(commands,))
+        robot.add_task('faces', faces, rate=10, offload='thread', source=face_frames, sinks=(reactions,))
+    else:
+        robot.add_task('vision', lambda: vision.get(0.1), offload='thread', sinks=(vision_results,))
+        robot.add_task('route', route, source=vision_results)
+    robot.add_task('serial', lambda command: serial.write(*command), offload='thread', source=commands)
+    robot.add_task('speech', hear, offload='thread', sinks=(reactions,))
+    robot.add_task('react', react, offload='thread', source=reactions)
+    robot.add_task('emotions', emotions.show, rate=30, offload='thread')
+    robot.add_task('report', report, rate=0.2)
+    return robot
+
+
+async def main(arguments: argparse.Namespace) -> None:
+    """
+    Запуск робота до Ctrl+C, SIGTERM или истечения времени работы.
+    """
+    robot = build(arguments.fake, arguments.camera, arguments.port, arguments.replay, arguments.processes)
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, robot.stop)
+
+    # SIGUSR1 включает и выключает трассировку во время работы, при выключении трасса сохраняется
+    def toggle_tracing():
+        if tracing.tracer.enabled:
+            tracing.tracer.disable()
+            print(f'Trace: {tracing.tracer.export(arguments.trace)} events saved to {arguments.trace}')
+        else:
+            tracing.tracer.clear()
+            tracing.tracer.enable()
+            print('Trace: started')
+    loop.add_signal_handler(signal.SIGUSR1, toggle_tracing)
+
+    try:
+        await robot.run(arguments.duration)
+    finally:
+        if tracing.tracer.enabled:
+            toggle_tracing()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Запуск всех подсистем робота')
+    parser.add_argument('--fake', action='store_true', help='заменить оборудование заменителями')
+    parser.add_argument('--camera', type=int, default=0, help='индекс камеры')
+    parser.add_argument('--replay', default=None, help='запись .rec вместо камеры')
+    parser.add_argument('--processes', action='store_true', help='обработка кадров в отдельных процессах')
+    parser.add_argument('--port', default='/dev/ttyUSB0', help='serial порт платы управления')
+    parser.add_argument('--duration', type=float, default=None, help='время работы в секундах')
+    parser.add_argument('--latency', default=None, help='файл .json для сводки задержек при выходе')
+    parser.add_argument('--trace', default='trace.json', help='файл Chrome trace, куда сохраняется трасса')
+    parser.add_argument('--trace-on-start', action='store_true', help='включить трассировку сразу при запуске')
+
+    arguments = parser.parse_args()
+    if arguments.trace_on_start:
+        tracing.tracer.enable()
+    latency.recorder.dump_at_exit(arguments.latency)
+    config.load()
+    print(dict(config.registry.snapshot()))
+    asyncio.run(main(arguments))
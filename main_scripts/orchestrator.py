@@ -0,0 +1,317 @@
+import asyncio
+import time
+import tracing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+
+# Пауза после ошибки шага в секундах, удваивается с каждой ошибкой подряд до MAX_ERROR_DELAY
+ERROR_DELAY = 0.05
+MAX_ERROR_DELAY = 5.0
+
+
+class DropOldestQueue:
+    """
+    Класс DropOldestQueue:
+    Ограниченная очередь между задачами Orchestrator.
+    Если очередь заполнена, самый старый элемент выбрасывается, чтобы освободить место новому:
+    медленная задача всегда получает свежие данные, а быстрая никогда не ждет медленную.
+    """
+    def __init__(self, name: str, maxsize: int = 2):
+        """
+        Инициализация объекта класса.
+        :param name: Имя очереди для статистики.
+        :param maxsize: Максимальное количество элементов.
+        """
+        self.name = name
+        self.__queue = asyncio.Queue(max(1, maxsize))
+        self.__put = 0
+        self.__dropped = 0
+
+    @property
+    def statistics(self) -> dict:
+        """
+        Счетчики: put - добавлено элементов, dropped - выброшено старых элементов, size - элементов в очереди сейчас.
+        """
+        return {'put': self.__put, 'dropped': self.__dropped, 'size': self.__queue.qsize()}
+
+    def put(self, item) -> None:
+        """
+        Добавление элемента без ожидания, при заполненной очереди выбрасывается самый старый элемент.
+        """
+        self.__put += 1
+        if self.__queue.full():
+            self.__queue.get_nowait()
+            self.__dropped += 1
+        self.__queue.put_nowait(item)
+
+    async def get(self):
+        """
+        Ожидание и получение самого старого элемента.
+        """
+        return await self.__queue.get()
+
+
+class Task:
+    """
+    Класс Task:
+    Описание одной задачи Orchestrator и ее статистика.
+    """
+    def __init__(self, name: str, step: Callable, rate: Optional[float] = None, offload: str = 'inline',
+                 source: Optional[DropOldestQueue] = None, sinks: tuple = (), max_errors: Optional[int] = None):
+        """
+        Инициализация объекта класса.
+        :param name: Имя задачи.
+        :param step: Функция одного шага. Без source вызывается без аргументов, иначе с элементом из source.
+            Результат, если он не None, передается во все очереди sinks.
+        :param rate: Целевая частота шагов в секунду, None - без ограничения (задача с source ждет данных).
+        :param offload: Где выполняется шаг: 'inline' - в цикле asyncio (только для быстрых шагов),
+            'thread' - в собственном потоке задачи, 'process' - в общем пуле процессов (step должен передаваться через pickle).
+        :param source: Входная очередь.
+        :param sinks: Выходные очереди.
+        :param max_errors: Количество ошибок шага подряд, после которого останавливается весь робот,
+            None - никогда: шаг с ошибкой пропускается, и задача продолжает работу.
+        """
+        if offload not in ('inline', 'thread', 'process'):
+            raise ValueError(f'Неизвестный способ выполнения {offload}')
+        self.name = name
+        self.trace_name = f'task.{name}'
+        self.step = step
+        self.rate = rate
+        self.offload = offload
+        self.source = source
+        self.sinks = tuple(sinks)
+        self.max_errors = max_errors
+        self.runs = 0
+        self.errors = 0
+        self.overruns = 0
+        self.busy = 0.0
+        self.started_at = None
+
+    @property
+    def statistics(self) -> dict:
+        """
+        Статистика задачи: rate - достигнутая частота, target - целевая частота,
+        runs - выполнено шагов, overruns - шагов, не уложившихся в период, load - доля времени в шаге,
+        errors - шагов, завершившихся ошибкой.
+        """
+        elapsed = time.monotonic() - self.started_at if self.started_at is not None else 0.0
+        return {'rate': self.runs / elapsed if elapsed > 0 else 0.0, 'target': self.rate, 'runs': self.runs,
+                'overruns': self.overruns, 'load': self.busy / elapsed if elapsed > 0 else 0.0,
+                'errors': self.errors}
+
+
+class Orchestrator:
+    """
+    Класс Orchestrator:
+    Одновременная работа подсистем робота в одном цикле asyncio.
+    Каждая задача выполняет свой шаг с целевой частотой, задачи связаны ограниченными очередями DropOldestQueue.
+    Тяжелые шаги выполняются в отдельном потоке задачи (у каждой задачи свой поток, поэтому медленная задача
+    не задерживает остальные, а окна opencv и порты всегда используются из одного потока) или в пуле процессов.
+    Ошибка шага выводится и пропускает только этот шаг: задача продолжает работу после паузы, которая растет
+    с каждой ошибкой подряд, а пул процессов с упавшим процессом создается заново. Робот останавливается,
+    только если у задачи задан max_errors и столько шагов подряд завершились ошибкой.
+    При остановке задачи отменяются, потоки и процессы завершаются, затем вызываются функции закрытия подсистем.
+    """
+    def __init__(self, processes: int = 1):
+        """
+        Инициализация объекта класса.
+        :param processes: Количество процессов пула для задач с offload='process'.
+        """
+        self.__processes = processes
+        self.__tasks = []
+        self.__queues = []
+        self.__closers = []
+        self.__interrupters = []
+        self.__executors = {}
+        self.__process_pool = None
+        self.__stop_event = None
+        self.__error = None
+
+    def queue(self, name: str, maxsize: int = 2) -> DropOldestQueue:
+        """
+        Создание очереди между задачами.
+        :param name: Имя очереди.
+        :param maxsize: Максимальное количество элементов.
+        :return: Объект класса DropOldestQueue.
+        """
+        queue = DropOldestQueue(name, maxsize)
+        self.__queues.append(queue)
+        return queue
+
+    def add_task(self, name: str, step: Callable, rate: Optional[float] = None, offload: str = 'inline',
+                 source: Optional[DropOldestQueue] = None, sinks: tuple = (), max_errors: Optional[int] = None) -> Task:
+        """
+        Добавление задачи. Параметры описаны в классе Task.
+        :return: Объект класса Task.
+        """
+        task = Task(name, step, rate, offload, source, sinks, max_errors)
+        self.__tasks.append(task)
+        return task
+
+    def on_stop(self, closer: Callable[[], None]) -> None:
+        """
+        Регистрация функции закрытия подсистемы. Функции вызываются в обратном порядке после остановки задач.
+        """
+        self.__closers.append(closer)
+
+    def on_interrupt(self, interrupter: Callable[[], None]) -> None:
+        """
+        Регистрация функции, которая прерывает долгое ожидание внутри шага (например, прослушивание микрофона).
+        Функции вызываются сразу после отмены задач, до ожидания завершения их потоков.
+        """
+        self.__interrupters.append(interrupter)
+
+    @property
+    def statistics(self) -> dict:
+        """
+        Статистика всех задач и очередей по именам.
+        """
+        statistics = {task.name: task.statistics for task in self.__tasks}
+        statistics.update({queue.name: queue.statistics for queue in self.__queues})
+        return statistics
+
+    def stop(self) -> None:
+        """
+        Запрос остановки. Может вызываться из цикла asyncio, в том числе из обработчика сигнала.
+        """
+        if self.__stop_event is not None:
+            self.__stop_event.set()
+
+    async def run(self, duration: Optional[float] = None) -> None:
+        """
+        Запуск всех задач до вызова stop(), остановки задачи после max_errors ошибок подряд
+        или истечения duration секунд.
+        :param duration: Время работы в секундах, None - без ограничения.
+        :raises Exception: Ошибка задачи, которая остановила робота, после остановки всех подсистем.
+        """
+        self.__stop_event = asyncio.Event()
+        self.__error = None
+        for task in self.__tasks:
+            if task.offload == 'thread':
+                self.__executors[task.name] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=task.name)
+            elif task.offload == 'process' and self.__process_pool is None:
+                self.__process_pool = ProcessPoolExecutor(max_workers=self.__processes)
+
+        workers = [asyncio.ensure_future(self.__task_loop(task)) for task in self.__tasks]
+        try:
+            await asyncio.wait_for(self.__stop_event.wait(), duration)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.__shutdown()
+
+        if self.__error is not None:
+            raise self.__error
+
+    async def __task_loop(self, task: Task) -> None:
+        """
+        Цикл одной задачи: ожидание входных данных и периода, выполнение шага, передача результата.
+        """
+        loop = asyncio.get_running_loop()
+        period = 1 / task.rate if task.rate else 0.0
+        deadline = loop.time()
+        task.started_at = time.monotonic()
+        failures = 0
+        try:
+            while True:
+                item = await task.source.get() if task.source is not None else None
+
+                # Ожидание начала следующего периода, при отставании период начинается заново без серии догоняющих шагов
+                if period:
+                    now = loop.time()
+                    if now < deadline:
+                        await asyncio.sleep(deadline - now)
+                        deadline += period
+                    else:
+                        if task.runs and now - deadline > period:
+                            task.overruns += 1
+                        deadline = now + period
+
+                args = (item,) if task.source is not None else ()
+                started = time.monotonic()
+                process_pool = self.__process_pool
+                try:
+                    if task.offload == 'inline':
+                        result = self.__call_step(task, *args)
+                    elif task.offload == 'thread':
+                        result = await loop.run_in_executor(self.__executors[task.name], self.__call_step, task, *args)
+                    else:
+                        result = await loop.run_in_executor(process_pool, task.step, *args)
+                except Exception as error:
+                    task.busy += time.monotonic() - started
+                    task.errors += 1
+                    failures += 1
+                    print(f'Task {task.name} step failed ({failures} in a row): {error!r}')
+                    if task.max_errors is not None and failures >= task.max_errors:
+                        raise
+                    if isinstance(error, BrokenProcessPool):
+                        self.__restart_process_pool(process_pool)
+                    # Пауза, чтобы постоянно падающий шаг не занимал процессор и не засорял вывод
+                    await asyncio.sleep(min(MAX_ERROR_DELAY, ERROR_DELAY * 2 ** (failures - 1)))
+                    continue
+                failures = 0
+                task.busy += time.monotonic() - started
+                task.runs += 1
+
+                if result is not None:
+                    for sink in task.sinks:
+                        sink.put(result)
+
+                # Быстрый источник без частоты не должен занимать цикл целиком
+                if task.offload == 'inline' and task.source is None and not period:
+                    await asyncio.sleep(0)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            print(f'Task {task.name} stopped the robot: {error!r}')
+            if self.__error is None:
+                self.__error = error
+            self.stop()
+
+    def __restart_process_pool(self, broken: ProcessPoolExecutor) -> None:
+        """
+        Замена пула процессов, в котором процесс завершился аварийно. Такой пул больше не принимает шаги.
+        Если другая задача уже заменила пул, ничего не делается.
+        """
+        if self.__process_pool is not broken:
+            return
+        print('Process pool is broken, restarting')
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.__process_pool = ProcessPoolExecutor(max_workers=self.__processes)
+
+    @staticmethod
+    def __call_step(task: Task, *args):
+        """
+        Выполнение шага задачи в отрезке трассировки task.<имя задачи>.
+        """
+        with tracing.span(task.trace_name, 'task'):
+            return task.step(*args)
+
+    def __shutdown(self) -> None:
+        """
+        Завершение потоков и процессов задач и закрытие подсистем.
+        Шаги, уже переданные в потоки, дорабатывают до конца, новые не запускаются.
+        """
+        for interrupter in self.__interrupters:
+            try:
+                interrupter()
+            except Exception as error:
+                print(f'Interrupt failed: {error!r}')
+
+        for executor in self.__executors.values():
+            executor.shutdown(wait=True, cancel_futures=True)
+        self.__executors = {}
+        if self.__process_pool is not None:
+            self.__process_pool.shutdown(wait=True, cancel_futures=True)
+            self.__process_pool = None
+
+        for closer in reversed(self.__closers):
+            try:
+                closer()
+            except Exception as error:
+                print(f'Close failed: {error!r}')
@@ -0,0 +1,238 @@
+import interfaces
+import binascii
+import struct
+import threading
+from typing import NamedTuple, Optional
+
+
+'''
+Двоичный протокол обмена с микроконтроллером.
+
+Кадр имеет фиксированный размер FRAME_SIZE = 16 байт:
+    0-1   синхробайты 0xA5 0x5A
+    2     порядковый номер кадра (0-255, по кругу)
+    3     количество команд в кадре (0-3)
+    4-12  три команды по 3 байта: код команды (uint8), скорость (int8), поворот (int8)
+    13    зарезервировано, 0
+    14-15 CRC-16/CCITT байтов 2-13, little-endian
+Микроконтроллер отбрасывает кадры с неверной суммой и кадры, номер которых не новее последнего выполненного.
+'''
+
+SYNC = b'\xa5\x5a'
+COMMANDS_PER_FRAME = 3
+FRAME_SIZE = 16
+
+# Коды команд
+CMD_STOP = 0
+CMD_DRIVE = 1
+CMD_HEARTBEAT = 2
+
+MAX_VALUE = 127
+
+_FRAME_BODY = struct.Struct('<BB' + 'Bbb' * COMMANDS_PER_FRAME + 'x')
+_FRAME_CRC = struct.Struct('<H')
+
+
+class Command(NamedTuple):
+    """
+    Команда движения.
+    command - код команды CMD_*, speed - скорость вперед/назад, turn - поворот (положительный - влево),
+    оба значения в диапазоне -MAX_VALUE..MAX_VALUE.
+    """
+    command: int
+    speed: int = 0
+    turn: int = 0
+
+
+# Соответствие текстовых команд ChaseLaser командам протокола
+LETTER_COMMANDS = {'F': Command(CMD_DRIVE, MAX_VALUE, 0),
+                   'S': Command(CMD_STOP),
+                   'L': Command(CMD_DRIVE, 0, MAX_VALUE),
+                   'R': Command(CMD_DRIVE, 0, -MAX_VALUE)}
+
+
+def clamp(value: float) -> int:
+    """
+    Округление значения и ограничение диапазоном -MAX_VALUE..MAX_VALUE.
+    """
+    return max(-MAX_VALUE, min(MAX_VALUE, int(round(value))))
+
+
+def drive(speed: float, turn: float) -> Command:
+    """
+    Создание команды пропорционального движения.
+    :param speed: Скорость от -1.0 до 1.0.
+    :param turn: Поворот от -1.0 (вправо) до 1.0 (влево).
+    :return: Объект Command.
+    """
+    return Command(CMD_DRIVE, clamp(speed * MAX_VALUE), clamp(turn * MAX_VALUE))
+
+
+def encode_frame(sequence: int, commands) -> bytes:
+    """
+    Упаковка команд в кадр.
+    :param sequence: Порядковый номер кадра, берется по модулю 256.
+    :param commands: От 0 до COMMANDS_PER_FRAME объектов Command.
+    :return: Кадр размером FRAME_SIZE байт.
+    """
+    commands = list(commands)
+    if len(commands) > COMMANDS_PER_FRAME:
+        raise ValueError(f'В кадре может быть не больше {COMMANDS_PER_FRAME} команд')
+
+    values = []
+    for command in commands:
+        values.extend((command.command, clamp(command.speed), clamp(command.turn)))
+    values.extend((0, 0, 0) * (COMMANDS_PER_FRAME - len(commands)))
+
+    body = _FRAME_BODY.pack(sequence & 0xFF, len(commands), *values)
+    return SYNC + body + _FRAME_CRC.pack(binascii.crc_hqx(body, 0xFFFF))
+
+
+def decode_frame(frame: bytes) -> tuple:
+    """
+    Распаковка кадра.
+    :param frame: Кадр размером FRAME_SIZE байт.
+    :return: Пара (порядковый номер, список объектов Command).
+    :raises ValueError: Если кадр поврежден.
+    """
+    if len(frame) != FRAME_SIZE or frame[:2] != SYNC:
+        raise ValueError('Неверный заголовок кадра')
+    body = frame[2:-2]
+    if _FRAME_CRC.unpack(frame[-2:])[0] != binascii.crc_hqx(body, 0xFFFF):
+        raise ValueError('Неверная контрольная сумма кадра')
+
+    sequence, count, *values = _FRAME_BODY.unpack(body)
+    if count > COMMANDS_PER_FRAME:
+        raise ValueError('Неверное количество команд в кадре')
+    commands = [Command(*values[i * 3:i * 3 + 3]) for i in range(count)]
+    return sequence, commands
+
+
+class FrameDecoder:
+    """
+    Класс FrameDecoder:
+    Разбор потока байтов на кадры так, как это делает микроконтроллер.
+    Поврежденные кадры пропускаются с поиском следующих синхробайтов,
+    устаревшие кадры (номер не новее последнего принятого) отбрасываются.
+    """
+    def __init__(self):
+        """
+        Инициализация объекта класса.
+        """
+        self.__buffer = bytearray()
+        self.__last_sequence = None
+        self.dropped = 0
+        self.corrupted = 0
+
+    def feed(self, data: bytes) -> list:
+        """
+        Добавление принятых байтов.
+        :param data: Байты из порта.
+        :return: Список пар (порядковый номер, список Command) для новых корректных кадров.
+        """
+        self.__buffer.extend(data)
+        frames = []
+        while True:
+            start = self.__buffer.find(SYNC)
+            if start < 0:
+                # Последний байт может быть началом синхропоследовательности
+                del self.__buffer[:max(0, len(self.__buffer) - 1)]
+                return frames
+            del self.__buffer[:start]
+            if len(self.__buffer) < FRAME_SIZE:
+                return frames
+
+            try:
+                sequence, commands = decode_frame(bytes(self.__buffer[:FRAME_SIZE]))
+            except ValueError:
+                # Ложные синхробайты или поврежденный кадр, ищем дальше
+                self.corrupted += 1
+                del self.__buffer[:1]
+                continue
+            del self.__buffer[:FRAME_SIZE]
+
+            # Разница номеров по модулю 256 в пределах половины круга означает более новый кадр
+            if self.__last_sequence is not None and not 0 < (sequence - self.__last_sequence) % 256 < 128:
+                self.dropped += 1
+                continue
+            self.__last_sequence = sequence
+            frames.append((sequence, commands))
+
+
+class FramedSerial(interfaces.Serial):
+    """
+    Класс FramedSerial:
+    Отправка команд двоичными кадрами поверх interfaces.BinarySerial.
+    Несколько команд, отправленных одним вызовом, упаковываются в общий кадр.
+    Поддерживает текстовые команды ChaseLaser ('F', 'S', 'L', 'R') через метод write().
+    """
+    def __init__(self, serial: interfaces.BinarySerial):
+        """
+        Инициализация объекта класса.
+        :param serial: Объект класса interfaces.BinarySerial, в который отправляются кадры.
+        """
+        self.__serial = serial
+        self.__sequence = 0
+        self.__lock = threading.Lock()
+
+    def send(self, *commands: Command) -> None:
+        """
+        Отправка команд. Команды упаковываются по COMMANDS_PER_FRAME в кадр, кадры отправляются одной записью.
+        :param commands: Объекты Command.
+        """
+        frames = []
+        with self.__lock:
+            for i in range(0, max(1, len(commands)), COMMANDS_PER_FRAME):
+                frames.append(encode_frame(self.__sequence, commands[i:i + COMMANDS_PER_FRAME]))
+                self.__sequence = (self.__sequence + 1) & 0xFF
+            self.__serial.write_bytes(b''.join(frames))
+
+    def write(self, data) -> None:
+        """
+        Отправка команд.
+        :param data: Строка из текстовых команд LETTER_COMMANDS, объект Command или кортеж объектов Command.
+        """
+        if isinstance(data, Command):
+            self.send(data)
+        elif isinstance(data, str):
+            self.send(*(LETTER_COMMANDS[letter] for letter in data))
+        else:
+            self.send(*data)
+
+    def read(self) -> str:
+        """
+        Чтение ответа микроконтроллера.
+        :return: Прочитанная строка.
+        """
+        return self.__serial.read()
+
+
+class LoopbackSerial(interfaces.BinarySerial):
+    """
+    Класс LoopbackSerial:
+    Замена порта для проверки без робота: все отправленные байты можно прочитать обратно.
+    """
+    def __init__(self, port: str = 'loopback'):
+        """
+        Инициализация объекта класса.
+        :param port: Имя порта, не используется.
+        """
+        self.__buffer = bytearray()
+        self.__lock = threading.Lock()
+
+    def write(self, data: str) -> None:
+        self.write_bytes(data.encode('ascii'))
+
+    def write_bytes(self, data: bytes) -> None:
+        with self.__lock:
+            self.__buffer.extend(data)
+
+    def read(self) -> str:
+        return self.read_bytes().decode('ascii', errors='replace')
+
+    def read_bytes(self, size: Optional[int] = None) -> bytes:
+        with self.__lock:
+            size = len(self.__buffer) if size is None else size
+            data = bytes(self.__buffer[:size])
+            del self.__buffer[:size]
+            return data
@@ -0,0 +1,151 @@
+import interfaces
+import camera_broker
+import encoding_cache
+import enrollment
+import face_matcher
+import face_tracker
+import cv2
+import glob
+import os
+import face_recognition
+import numpy as np
+from typing import Optional
+
+
+def encode_image(path: str) -> Optional[np.ndarray]:
+    """
+    Вычисление вектора лица для фотографии.
+    :param path: Путь к фотографии.
+    :return: Вектор лица первого найденного лица или None, если лиц нет.
+    """
+    image = face_recognition.load_image_file(path)
+    encodings = face_recognition.face_encodings(image)
+    return encodings[0] if encodings else None
+
+
+def encode_frame(frame: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Вычисление вектора лица для кадра с камеры.
+    :param frame: Кадр BGR.
+    :return: Вектор лица первого найденного лица или None, если лиц нет.
+    """
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    encodings = face_recognition.face_encodings(rgb)
+    return encodings[0] if encodings else None
+
+
+class FaceRecognition(interfaces.FaceRecognition):
+    """
+    Класс FaceRecognition:
+    Класс, который отвечает за распознавание лиц людей, чьи фотографии есть в dataset.
+    Фотографии называются по порядковому номеру имени из config.registry, например dataset/0.jpg.
+    Векторы лиц хранятся в EncodingCache, поэтому при запуске вычисляются только новые фотографии.
+    """
+    def __init__(self, index_camera: int, dataset: str, tolerance: float = 0.6, index_threshold: Optional[int] = 2000,
+                 workers: int = 1, chunksize: int = 4, cadence: int = 5,
+                 camera: Optional[interfaces.GetCapture] = None):
+        """
+        Инициализация объекта класса.
+        :param index_camera: Индекс камеры, камера берется из общего camera_broker.
+        :param dataset: Путь к директории с фотографиями.
+        :param tolerance: Максимальное расстояние между векторами лиц одного человека.
+        :param index_threshold: Размер галереи, начиная с которого используется приближенный поиск, None - никогда.
+        :param workers: Количество процессов для вычисления векторов лиц, 1 - в текущем процессе.
+        :param chunksize: Количество фотографий, которое процесс получает за один раз.
+        :param cadence: Полное распознавание выполняется на каждом cadence-м кадре, между ними лица отслеживаются.
+        :param camera: Камера вместо камеры из camera_broker, например recording.ReplayCapture.
+        """
+        self.__camera = camera if camera is not None else camera_broker.broker.acquire(index_camera)
+        self.__dataset = dataset
+        self.__matcher = face_matcher.GalleryMatcher(tolerance, index_threshold)
+        self.__workers = workers
+        self.__chunksize = chunksize
+        self.__cache = encoding_cache.EncodingCache(encode_image, os.path.join(dataset, 'encodings.npz'))
+
+        self.__enrollment = enrollment.Enrollment(self.__matcher, encode_frame, self.__cache)
+        self.__pipeline = face_tracker.RecognitionPipeline(self.identify, cadence)
+        self.faces = []
+
+        self.findEncodings()
+
+    def findEncodings(self, workers: Optional[int] = None) -> None:
+        """
+        Получение векторов лиц всех фотографий из dataset.
+        Новые фотографии могут вычисляться параллельно в нескольких процессах, результат от этого не меняется.
+        :param workers: Количество процессов, None - значение, заданное при создании объекта.
+        """
+        paths = []
+        ids = []
+        for path in sorted(glob.glob(os.path.join(self.__dataset, '*.jpg'))):
+            name = os.path.splitext(os.path.basename(path))[0]
+            if name.isdigit():
+                paths.append(path)
+                ids.append(int(name))
+
+        known_ids = []
+        known_encodings = []
+        workers = self.__workers if workers is None else workers
+        encodings = self.__cache.encodings(paths, workers, self.__chunksize, self.__print_progress)
+        for person_id, encoding in zip(ids, encodings):
+            if encoding is not None:
+                known_ids.append(person_id)
+                known_encodings.append(encoding)
+        self.__matcher.set_gallery(known_ids, known_encodings)
+
+    @staticmethod
+    def __print_progress(done: int, total: int) -> None:
+        """
+        Вывод прогресса вычисления векторов лиц.
+        """
+        print(f'\rEncoding faces: {done}/{total}', end='\n' if done == total else '', flush=True)
+
+    @property
+    def enrollment(self) -> enrollment.Enrollment:
+        """
+        Добавление новых людей без перезапуска, передается в GraphicInterfaces.
+        """
+        return self.__enrollment
+
+    @property
+    def pipeline(self) -> face_tracker.RecognitionPipeline:
+        """
+        Конвейер распознавания, через него можно изменить частоту распознавания и получить статистику.
+        """
+        return self.__pipeline
+
+    def identify(self, frame: np.ndarray) -> list:
+        """
+        Полное распознавание лиц на кадре: поиск лиц, вычисление векторов и сопоставление с галереей.
+        :param frame: Кадр BGR.
+        :return: Список кортежей (порядковый номер, имя, расстояние, (top, right, bottom, left)),
+            для неизвестных лиц порядковый номер равен -1, а имя пустое.
+        """
+        # Уменьшение кадра для ускорения поиска лиц
+        small = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
+        rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+        locations = face_recognition.face_locations(rgb)
+        encodings = face_recognition.face_encodings(rgb, locations)
+
+        # Все лица кадра сопоставляются с галереей одним вычислением
+        faces = []
+        for match, (top, right, bottom, left) in zip(self.__matcher.match(encodings), locations):
+            faces.append((match.id, match.name, match.distance, (top * 4, right * 4, bottom * 4, left * 4)))
+        return faces
+
+    def recognize(self) -> None:
+        """
+        Основной метод класса.
+        Распознавание лиц на текущем кадре камеры.
+        Полное распознавание выполняется только раз в cadence кадров, на остальных кадрах лица отслеживаются.
+        Результат записывается в переменную faces в формате метода identify().
+        """
+        frame = self.__camera.read_capture()
+        if frame is None:
+            return
+        self.faces = [track.as_face() for track in self.__pipeline.process(frame)]
+
+    def release(self) -> None:
+        """
+        Освобождение камеры.
+        """
+        self.__camera.release()
@@ -0,0 +1,307 @@
+import interfaces
+import get_capture
+import argparse
+import os
+import struct
+import time
+import cv2
+import numpy as np
+from typing import Optional, Union
+
+
+'''
+Запись кадров камеры вместе со временем захвата и их воспроизведение.
+Файл записи (.rec): заголовок фиксированного размера, затем записи одинакового размера
+(время захвата float64, порядковый номер uint64, кадр без сжатия). Поэтому файл открывается через np.memmap,
+кадры читаются без копирования, а недописанная при обрыве последняя запись просто отбрасывается.
+Запуск:
+    python recording.py record out.rec --camera 0 --seconds 10
+    python recording.py info out.rec
+    python recording.py replay out.rec [--realtime]
+'''
+
+_MAGIC = b'ROBOREC1'
+_HEADER = struct.Struct('<8sIII')
+_HEADER_SIZE = 64
+
+
+def record_dtype(height: int, width: int, channels: int) -> np.dtype:
+    """
+    Тип одной записи файла: время захвата, порядковый номер и кадр.
+    """
+    return np.dtype([('timestamp', '<f8'), ('sequence', '<u8'), ('frame', np.uint8, (height, width, channels))])
+
+
+class FrameRecorder:
+    """
+    Класс FrameRecorder:
+    Запись кадров в файл .rec. Размер кадров определяется по первому кадру и дальше не меняется.
+    Можно использовать в блоке with.
+    """
+    def __init__(self, path: str):
+        """
+        Инициализация объекта класса.
+        :param path: Путь к файлу записи, существующий файл перезаписывается.
+        """
+        self.__path = path
+        self.__file = open(path, 'wb')
+        self.__shape = None
+        self.__sequence = 0
+        self.count = 0
+
+    def write(self, frame: np.ndarray, timestamp: Optional[float] = None, sequence: Optional[int] = None) -> None:
+        """
+        Запись кадра.
+        :param frame: Кадр BGR (или любой кадр uint8 того же размера, что и первый).
+        :param timestamp: Время захвата по time.monotonic(), None - текущее время.
+        :param sequence: Порядковый номер кадра, None - следующий по счету.
+        :raises ValueError: Если размер кадра отличается от размера первого кадра.
+        """
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        if frame.ndim == 2:
+            frame = frame[:, :, None]
+        if self.__shape is None:
+            self.__shape = frame.shape
+            header = _HEADER.pack(_MAGIC, frame.shape[1], frame.shape[0], frame.shape[2])
+            self.__file.write(header.ljust(_HEADER_SIZE, b'\0'))
+        elif frame.shape != self.__shape:
+            raise ValueError(f'Размер кадра {frame.shape} отличается от размера записи {self.__shape}')
+
+        self.__sequence = sequence if sequence is not None else self.__sequence + 1
+        timestamp = timestamp if timestamp is not None else time.monotonic()
+        self.__file.write(struct.pack('<dQ', timestamp, self.__sequence))
+        self.__file.write(frame.data)
+        self.count += 1
+
+    def write_captured(self, captured: get_capture.CapturedFrame) -> None:
+        """
+        Запись кадра вместе с его временем захвата и порядковым номером.
+        """
+        self.write(captured.frame, captured.timestamp, captured.sequence)
+
+    def close(self) -> None:
+        """
+        Завершение записи.
+        """
+        if not self.__file.closed:
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+            self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def record(camera, path: str, seconds: Optional[float] = None, frames: Optional[int] = None) -> int:
+    """
+    Запись кадров камеры в файл.
+    Каждый кадр записывается один раз: кадр с номером не больше последнего записанного пропускается.
+    :param camera: Объект с методом read_frame(), который ожидает новый кадр, например GetCapture или SharedCapture.
+    :param path: Путь к файлу записи.
+    :param seconds: Длительность записи в секундах, None - без ограничения.
+    :param frames: Количество кадров, None - без ограничения.
+    :return: Количество записанных кадров.
+    """
+    end = time.monotonic() + seconds if seconds is not None else None
+    last_sequence = 0
+    with FrameRecorder(path) as recorder:
+        while (end is None or time.monotonic() < end) and (frames is None or recorder.count < frames):
+            captured = camera.read_frame()
+            if captured is None or captured.sequence <= last_sequence:
+                continue
+            last_sequence = captured.sequence
+            recorder.write_captured(captured)
+        return recorder.count
+
+
+class Recording:
+    """
+    Класс Recording:
+    Файл записи, открытый через np.memmap. Кадры, время захвата и номера - представления файла без копирования.
+    """
+    def __init__(self, path: str):
+        """
+        Инициализация объекта класса.
+        :param path: Путь к файлу записи.
+        :raises ValueError: Если файл не является записью.
+        """
+        with open(path, 'rb') as file:
+            header = file.read(_HEADER_SIZE)
+        if len(header) < _HEADER.size or header[:len(_MAGIC)] != _MAGIC:
+            raise ValueError(f'{path} не является файлом записи')
+        _, width, height, channels = _HEADER.unpack_from(header)
+
+        dtype = record_dtype(height, width, channels)
+        count = max(0, os.path.getsize(path) - _HEADER_SIZE) // dtype.itemsize
+        self.path = path
+        self.size = (width, height)
+        if count:
+            self.__records = np.memmap(path, dtype=dtype, mode='r', offset=_HEADER_SIZE, shape=(count,))
+        else:
+            self.__records = np.zeros(0, dtype=dtype)
+
+    def __len__(self) -> int:
+        return len(self.__records)
+
+    def __getitem__(self, index: int) -> get_capture.CapturedFrame:
+        """
+        Кадр записи без копирования, доступный только для чтения.
+        """
+        record_item = self.__records[index]
+        return get_capture.CapturedFrame(record_item['frame'], float(record_item['timestamp']),
+                                         int(record_item['sequence']))
+
+    @property
+    def frames(self) -> np.ndarray:
+        """
+        Все кадры одним массивом (количество, высота, ширина, каналы) без копирования.
+        """
+        return self.__records['frame']
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.__records['timestamp']
+
+    @property
+    def duration(self) -> float:
+        """
+        Длительность записи в секундах.
+        """
+        return float(self.timestamps[-1] - self.timestamps[0]) if len(self) > 1 else 0.0
+
+
+class ReplayCapture(interfaces.GetCapture):
+    """
+    Класс ReplayCapture:
+    Камера, которая воспроизводит запись .rec.
+    Кадры выдаются без копирования (только для чтения) с исходными интервалами между ними или так быстро,
+    как их забирают. Порядок кадров всегда один и тот же, поэтому ChaseLaser и распознавание лиц
+    на одной записи дают одинаковый результат.
+    Время захвата выдаваемых кадров - момент их выдачи по time.monotonic(), номера кадров - исходные.
+    """
+    def __init__(self, recording: Union[str, Recording], realtime: bool = True, speed: float = 1.0, loop: bool = False):
+        """
+        Инициализация объекта класса.
+        :param recording: Путь к файлу записи или объект Recording.
+        :param realtime: Если True, кадры выдаются с исходными интервалами, иначе без ожидания.
+        :param speed: Во сколько раз быстрее исходного воспроизводится запись в режиме realtime.
+        :param loop: Если True, после последнего кадра воспроизведение начинается сначала.
+        """
+        self.__recording = recording if isinstance(recording, Recording) else Recording(recording)
+        self.__realtime = realtime
+        self.__speed = speed
+        self.__loop = loop
+        self.__position = 0
+        self.__started_at = None
+
+    @property
+    def recording(self) -> Recording:
+        return self.__recording
+
+    @property
+    def position(self) -> int:
+        """
+        Номер следующего кадра записи.
+        """
+        return self.__position
+
+    def rewind(self) -> None:
+        """
+        Возврат к началу записи.
+        """
+        self.__position = 0
+        self.__started_at = None
+
+    def read_frame(self) -> Optional[get_capture.CapturedFrame]:
+        """
+        Получение следующего кадра записи, в режиме realtime с ожиданием его момента.
+        :return: Объект CapturedFrame или None, если запись закончилась.
+        """
+        recording = self.__recording
+        if self.__position >= len(recording):
+            if not self.__loop or len(recording) == 0:
+                return None
+            self.rewind()
+
+        captured = recording[self.__position]
+        if self.__realtime:
+            offset = (captured.timestamp - recording.timestamps[0]) / self.__speed
+            if self.__started_at is None:
+                self.__started_at = time.monotonic()
+            delay = self.__started_at + offset - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            timestamp = max(self.__started_at + offset, time.monotonic())
+        else:
+            timestamp = time.monotonic()
+        self.__position += 1
+        return captured._replace(timestamp=timestamp)
+
+    def read_next(self, timeout: Optional[float] = None) -> Optional[get_capture.CapturedFrame]:
+        """
+        То же, что read_frame(), для совместимости с SharedCapture (например, CaptureWorker).
+        """
+        return self.read_frame()
+
+    def read_capture(self) -> cv2.typing.MatLike:
+        """
+        Основной метод класса.
+        :return frame: Следующий кадр записи или None, если запись закончилась.
+        """
+        captured = self.read_frame()
+        if captured is not None:
+            return captured.frame
+
+    def release(self) -> None:
+        pass
+
+
+def main(argv=None) -> None:
+    """
+    Запись и воспроизведение из командной строки.
+    """
+    parser = argparse.ArgumentParser(description='Запись кадров камеры и воспроизведение записей')
+    commands = parser.add_subparsers(dest='command', required=True)
+    record_parser = commands.add_parser('record', help='записать кадры камеры')
+    record_parser.add_argument('path')
+    record_parser.add_argument('--camera', type=int, default=0, help='индекс камеры')
+    record_parser.add_argument('--seconds', type=float, default=10.0, help='длительность записи')
+    info_parser = commands.add_parser('info', help='описание записи')
+    info_parser.add_argument('path')
+    replay_parser = commands.add_parser('replay', help='прогнать ChaseLaser по записи')
+    replay_parser.add_argument('path')
+    replay_parser.add_argument('--realtime', action='store_true', help='с исходными интервалами между кадрами')
+    arguments = parser.parse_args(argv)
+
+    if arguments.command == 'record':
+        camera = get_capture.GetCapture(arguments.camera, threaded=True)
+        try:
+            print(f'{record(camera, arguments.path, arguments.seconds)} frames recorded')
+        finally:
+            camera.release()
+    elif arguments.command == 'info':
+        recording = Recording(arguments.path)
+        fps = (len(recording) - 1) / recording.duration if recording.duration else 0.0
+        print(f'{len(recording)} frames {recording.size[0]}x{recording.size[1]}, '
+              f'{recording.duration:.2f} s, {fps:.1f} fps')
+    else:
+        import chase_laser
+        camera = ReplayCapture(arguments.path, realtime=arguments.realtime)
+        chase = chase_laser.ChaseLaser(None)
+        actions = []
+        start = time.perf_counter()
+        while (captured := camera.read_frame()) is not None:
+            chase.set_camera(captured.frame, captured.timestamp, captured.sequence)
+            chase.chase()
+            actions.append(chase.action)
+        elapsed = time.perf_counter() - start
+        print(f"{len(actions)} frames in {elapsed:.2f} s ({len(actions) / elapsed if elapsed else 0:.1f} fps): "
+              f"{''.join(actions)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+import interfaces
+import os
+import select
+import termios
+import time
+import tracing
+import tty
+
+
+# Соответствие скорости порта константам termios
+BAUDRATES = {9600: termios.B9600, 19200: termios.B19200, 38400: termios.B38400,
+             57600: termios.B57600, 115200: termios.B115200}
+
+
+class SerialPort(interfaces.BinarySerial):
+    """
+    Класс SerialPort:
+    Класс, который отвечает за обмен данными с микроконтроллером по Serial COM порту.
+    Порт открывается средствами termios в неблокирующем режиме, поэтому работает
+    как с USB-переходником, так и с псевдотерминалом PseudoTerminal.
+    """
+    def __init__(self, port: str, baudrate: int = 9600, write_timeout: float = 1.0):
+        """
+        Инициализация объекта класса.
+        :param port: Путь к устройству порта, например '/dev/ttyUSB0'.
+        :param baudrate: Скорость порта, одно из значений BAUDRATES.
+        :param write_timeout: Максимальное время ожидания освобождения буфера драйвера при записи в секундах.
+        """
+        self.__port = port
+        self.__write_timeout = write_timeout
+        self.__fd = os.open(port, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+
+        # Настройка порта: без обработки символов, заданная скорость
+        tty.setraw(self.__fd)
+        attributes = termios.tcgetattr(self.__fd)
+        attributes[4] = attributes[5] = BAUDRATES[baudrate]
+        termios.tcsetattr(self.__fd, termios.TCSANOW, attributes)
+
+    @property
+    def port(self) -> str:
+        return self.__port
+
+    def write(self, data: str) -> None:
+        """
+        Отправка строки в порт.
+        :param data: Строка, которая будет отправлена в кодировке ASCII.
+        """
+        self.write_bytes(data.encode('ascii'))
+
+    def write_bytes(self, data: bytes) -> None:
+        """
+        Отправка байтов в порт. Метод возвращается, когда все байты переданы драйверу.
+        :param data: Байты для отправки.
+        :raises TimeoutError: Если буфер драйвера не освобождался дольше write_timeout секунд, например порт завис.
+        """
+        with tracing.span('serial.port_write', 'serial'):
+            view = memoryview(data)
+            deadline = time.monotonic() + self.__write_timeout
+            while view:
+                try:
+                    written = os.write(self.__fd, view)
+                except BlockingIOError:
+                    # Буфер драйвера заполнен, ждем пока он освободится, но не дольше write_timeout
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not select.select([], [self.__fd], [], remaining)[1]:
+                        raise TimeoutError(f'Порт {self.__port} не принимает данные {self.__write_timeout} с')
+                    continue
+                view = view[written:]
+                deadline = time.monotonic() + self.__write_timeout
+
+    def read(self) -> str:
+        """
+        Чтение всех данных, которые уже пришли в порт.
+        :return: Прочитанная строка, пустая строка, если данных нет.
+        """
+        return self.read_bytes().decode('ascii', errors='replace')
+
+    def read_bytes(self, size: int = 4096) -> bytes:
+        """
+        Чтение пришедших байтов без ожидания.
+        :param size: Максимальное количество байтов.
+        :return: Прочитанные байты, пустые, если данных нет.
+        """
+        try:
+            return os.read(self.__fd, size)
+        except BlockingIOError:
+            return b''
+
+    def close(self) -> None:
+        """
+        Закрытие порта.
+        """
+        if self.__fd is not None:
+            os.close(self.__fd)
+            self.__fd = None
+
+
+class PseudoTerminal:
+    """
+    Класс PseudoTerminal:
+    Замена микроконтроллера для проверки без робота.
+    Создает пару псевдотерминалов: к порту port подключается SerialPort,
+    а через методы этого класса читаются и отправляются данные со стороны микроконтроллера.
+    """
+    def __init__(self):
+        """
+        Инициализация объекта класса.
+        """
+        self.__master, slave = os.openpty()
+        tty.setraw(self.__master)
+        tty.setraw(slave)
+        self.__port = os.ttyname(slave)
+        self.__slave = slave
+        os.set_blocking(self.__master, False)
+
+    @property
+    def port(self) -> str:
+        """
+        Путь к порту, который нужно передать в SerialPort.
+        """
+        return self.__port
+
+    def receive(self, size: int = 4096) -> bytes:
+        """
+        Чтение байтов, которые отправил робот.
+        :return: Прочитанные байты, пустые, если данных нет.
+        """
+        try:
+            return os.read(self.__master, size)
+        except (BlockingIOError, OSError):
+            return b''
+
+    def send(self, data: bytes) -> None:
+        """
+        Отправка байтов роботу.
+        :param data: Байты для отправки.
+        """
+        os.write(self.__master, data)
+
+    def close(self) -> None:
+        """
+        Закрытие псевдотерминала.
+        """
+        os.close(self.__master)
+        os.close(self.__slave)
@@ -0,0 +1,191 @@
+import interfaces
+import latency
+import threading
+import time
+import tracing
+from typing import Callable, Optional
+
+
+class SerialWriter(interfaces.Serial):
+    """
+    Класс SerialWriter:
+    Асинхронная отправка команд в Serial порт.
+    Метод write() не блокирует вызывающий поток: команда запоминается, а отправляет ее отдельный поток.
+    Повторяющиеся команды не отправляются, частота отправки ограничена,
+    а последняя команда периодически повторяется, чтобы микроконтроллер знал, что связь есть.
+    Задержки записываются в гистограммы latency.recorder: serial.queue - от вызова write() до окончания записи в порт,
+    serial.port - сама запись в порт, а для команд с известным временем захвата кадра serial.end_to_end -
+    от захвата кадра, по которому принята команда, до окончания ее записи в порт.
+    Ошибка записи (например, отключение USB-переходника) выводится и не останавливает поток: отправка повторяется
+    с нарастающей паузой, а если задан reopen, перед повтором порт открывается заново.
+    """
+    def __init__(self, serial: interfaces.Serial, max_rate: float = 20.0, heartbeat: Optional[float] = 0.5,
+                 reopen: Optional[Callable[[], interfaces.Serial]] = None, max_backoff: float = 2.0):
+        """
+        Инициализация объекта класса.
+        :param serial: Объект класса interfaces.Serial, в который отправляются команды.
+        :param max_rate: Максимальное количество отправок в секунду.
+        :param heartbeat: Период повторной отправки последней команды в секундах, None - не повторять.
+        :param reopen: Функция, которая открывает порт заново после ошибки записи, None - писать в тот же порт.
+        :param max_backoff: Максимальная пауза между повторами после ошибок в секундах.
+        """
+        self.__serial = serial
+        self.__interval = 1.0 / max_rate
+        self.__heartbeat = heartbeat
+        self.__reopen = reopen
+        self.__max_backoff = max_backoff
+        self.__backoff = 0.0
+
+        self.__condition = threading.Condition()
+        self.__pending = None
+        self.__pending_time = 0.0
+        self.__pending_captured_at = None
+        self.__last_sent = None
+        self.__last_time = 0.0
+        self.__statistics = {'requested': 0, 'sent': 0, 'heartbeats': 0, 'errors': 0}
+
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__write_loop, name='SerialWriter', daemon=True)
+        self.__thread.start()
+
+    @property
+    def statistics(self) -> dict:
+        """
+        Счетчики: requested - вызовы write(), sent - отправки в порт,
+        skipped - команды, которые не пришлось отправлять, heartbeats - повторы последней команды,
+        errors - неудачные записи в порт.
+        """
+        with self.__condition:
+            statistics = dict(self.__statistics)
+            pending = 1 if self.__pending is not None else 0
+        statistics['skipped'] = statistics['requested'] - (statistics['sent'] - statistics['heartbeats']) - pending
+        return statistics
+
+    def write(self, data: str, captured_at: Optional[float] = None) -> None:
+        """
+        Передача команды на отправку. Метод сразу возвращает управление.
+        Если предыдущая команда еще не отправлена, она заменяется новой.
+        :param data: Команда, например 'F', 'S', 'L', 'R'.
+        :param captured_at: Время захвата кадра, по которому принята команда, по time.monotonic(),
+            например CapturedFrame.timestamp. None - задержка от захвата кадра не измеряется.
+        """
+        with self.__condition:
+            self.__statistics['requested'] += 1
+            self.__pending = data
+            self.__pending_time = time.monotonic()
+            self.__pending_captured_at = captured_at
+            self.__condition.notify()
+
+    def read(self) -> str:
+        """
+        Чтение ответа микроконтроллера.
+        :return: Прочитанная строка.
+        """
+        return self.__serial.read()
+
+    def __next_command(self) -> Optional[tuple]:
+        """
+        Ожидание момента, когда нужно что-то отправить.
+        Вызывается под блокировкой.
+        :return: Кортеж (команда, это повтор, время вызова write(), время захвата кадра) или None при остановке.
+        """
+        while self.__running:
+            now = time.monotonic()
+            ready_at = self.__last_time + self.__interval
+
+            # Новая команда, отличная от последней отправленной
+            if self.__pending is not None and self.__pending != self.__last_sent:
+                if now >= ready_at:
+                    command, self.__pending = self.__pending, None
+                    return command, False, self.__pending_time, self.__pending_captured_at
+                self.__condition.wait(ready_at - now)
+                continue
+
+            # Команда совпадает с последней, отправлять ее не нужно
+            self.__pending = None
+
+            # Повтор последней команды
+            if self.__heartbeat is not None and self.__last_sent is not None:
+                heartbeat_at = max(ready_at, self.__last_time + self.__heartbeat)
+                if now >= heartbeat_at:
+                    return self.__last_sent, True, None, None
+                self.__condition.wait(heartbeat_at - now)
+            else:
+                self.__condition.wait()
+        return None
+
+    def __write_loop(self) -> None:
+        """
+        Цикл потока отправки.
+        """
+        while True:
+            with self.__condition:
+                item = self.__next_command()
+                if item is None:
+                    return
+                command, is_heartbeat, requested_at, captured_at = item
+                self.__last_sent = command
+                self.__last_time = time.monotonic()
+                self.__statistics['sent'] += 1
+                if is_heartbeat:
+                    self.__statistics['heartbeats'] += 1
+
+            # Запись в порт выполняется вне блокировки, чтобы write() никогда не ждал порт
+            start = time.monotonic()
+            try:
+                with tracing.span('serial.write', 'serial'):
+                    self.__serial.write(command)
+            except Exception as error:
+                self.__recover(command, is_heartbeat, captured_at, error)
+                continue
+            self.__backoff = 0.0
+            end = time.monotonic()
+            latency.recorder.record('serial.port', end - start)
+            if requested_at is not None:
+                latency.recorder.record('serial.queue', end - requested_at)
+            if captured_at is not None:
+                latency.recorder.record('serial.end_to_end', end - captured_at)
+
+    def __recover(self, command: str, is_heartbeat: bool, captured_at: Optional[float], error: Exception) -> None:
+        """
+        Обработка ошибки записи: команда возвращается в очередь, если ее не заменила более новая,
+        поток ждет паузу (после каждой ошибки подряд она удваивается) и, если задан reopen, открывает порт заново.
+        """
+        if not self.__backoff:
+            print(f'Serial write failed: {error!r}')
+        self.__backoff = min(self.__max_backoff, max(self.__interval, self.__backoff * 2))
+
+        with self.__condition:
+            self.__statistics['errors'] += 1
+            self.__statistics['sent'] -= 1
+            if is_heartbeat:
+                self.__statistics['heartbeats'] -= 1
+            else:
+                # Неизвестно, дошла ли команда, поэтому она отправляется снова даже при совпадении с последней
+                if self.__pending is None:
+                    self.__pending = command
+                    self.__pending_time = time.monotonic()
+                    self.__pending_captured_at = captured_at
+                self.__last_sent = None
+            self.__condition.wait_for(lambda: not self.__running, self.__backoff)
+            if not self.__running:
+                return
+
+        if self.__reopen is not None:
+            try:
+                self.__serial.close()
+            except Exception:
+                pass
+            try:
+                self.__serial = self.__reopen()
+            except Exception as reopen_error:
+                print(f'Serial reopen failed: {reopen_error!r}')
+
+    def close(self) -> None:
+        """
+        Остановка потока отправки. Неотправленная команда отбрасывается.
+        """
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify()
+        self.__thread.join()
@@ -0,0 +1,432 @@
+import interfaces
+import get_capture
+import latency
+import argparse
+import functools
+import multiprocessing
+import queue
+import time
+import cv2
+import numpy as np
+from multiprocessing import shared_memory
+from typing import Callable, Optional
+
+
+'''
+Многопроцессная обработка кадров без общего GIL.
+Процесс камеры один раз записывает каждый кадр в кольцо кадров в общей памяти, процессы-потребители
+(погоня за лазером, распознавание лиц) читают кадры оттуда без pickle и передачи через pipe,
+а обратно по общей очереди отправляют только маленькие результаты (действие, номера и рамки лиц).
+Запуск:
+    python shm_pipeline.py --seconds 10 --fps 60
+'''
+
+
+class FrameRing:
+    """
+    Класс FrameRing:
+    Кольцо кадров одинакового размера в multiprocessing.shared_memory.
+    Пишет один процесс, читать могут любые. У каждой ячейки есть номер кадра и своя блокировка
+    multiprocessing.Lock, под которой писатель записывает ячейку, а читатель копирует из нее кадр.
+    Блокировка нужна не только для взаимного исключения: обычные записи numpy в общую память не упорядочены,
+    и на процессорах со слабым порядком памяти (ARM) читатель без барьеров мог бы увидеть новый номер кадра
+    вместе со старыми байтами кадра. Захват и освобождение блокировки - барьеры памяти на любом процессоре.
+    Блокировки ячеек разные, поэтому писатель ждет читателя, только если обогнал его на целое кольцо.
+    Если писатель успел записать в ячейку более новый кадр, чем тот, что искал читатель, берется самый свежий.
+    """
+    def __init__(self, shape: tuple, slots: int = 4, name: Optional[str] = None, locks: Optional[tuple] = None,
+                 context=None):
+        """
+        Инициализация объекта класса.
+        :param shape: Форма кадра (высота, ширина, каналы).
+        :param slots: Количество ячеек. Чем больше ячеек, тем реже медленный читатель теряет кадр из-за перезаписи.
+        :param name: Имя существующего кольца для подключения к нему из другого процесса, None - создать новое.
+        :param locks: Блокировки ячеек существующего кольца (FrameRing.locks), передаются в процесс при его запуске.
+            Обязательны при подключении по имени.
+        :param context: Контекст multiprocessing, в котором будут запускаться процессы, работающие с кольцом
+            (блокировки контекста fork нельзя передать процессу, запущенному через spawn). None - контекст по умолчанию.
+        :raises ValueError: Если задано name, но не заданы locks.
+        """
+        if name is not None and locks is None:
+            raise ValueError('Для подключения к кольцу нужны его блокировки FrameRing.locks')
+        self.shape = tuple(shape)
+        self.slots = slots
+        frame_size = int(np.prod(self.shape))
+        # Заголовок: номер последнего кадра, затем номер и время захвата каждой ячейки
+        header_size = 8 * (1 + 2 * slots)
+        self.__owner = name is None
+        if self.__owner:
+            self.__memory = shared_memory.SharedMemory(create=True, size=header_size + frame_size * slots)
+        else:
+            self.__memory = shared_memory.SharedMemory(name=name)
+        buffer = self.__memory.buf
+        self.__latest = np.ndarray((1,), np.uint64, buffer, 0)
+        self.__sequences = np.ndarray((slots,), np.uint64, buffer, 8)
+        self.__timestamps = np.ndarray((slots,), np.float64, buffer, 8 * (1 + slots))
+        self.__frames = np.ndarray((slots,) + self.shape, np.uint8, buffer, header_size)
+        if self.__owner:
+            self.__latest[0] = 0
+            self.__sequences[:] = 0
+        if locks is None:
+            locks = [(context or multiprocessing).Lock() for _ in range(slots)]
+        self.__locks = tuple(locks)
+        self.torn = 0
+
+    @property
+    def name(self) -> str:
+        """
+        Имя общей памяти, по нему к кольцу подключаются другие процессы.
+        """
+        return self.__memory.name
+
+    @property
+    def locks(self) -> tuple:
+        """
+        Блокировки ячеек, их нужно передать в процесс, который подключается к кольцу по имени.
+        """
+        return self.__locks
+
+    @property
+    def latest(self) -> int:
+        """
+        Номер последнего записанного кадра, 0 - кадров еще нет.
+        """
+        return int(self.__latest[0])
+
+    def write(self, frame: np.ndarray, timestamp: float, sequence: int) -> None:
+        """
+        Запись кадра в следующую ячейку.
+        :param frame: Кадр формы shape.
+        :param timestamp: Время захвата по time.monotonic().
+        :param sequence: Порядковый номер кадра, больше 0 и больше номера предыдущего кадра.
+        """
+        slot = sequence % self.slots
+        with self.__locks[slot]:
+            self.__sequences[slot] = 0
+            self.__frames[slot] = frame
+            self.__timestamps[slot] = timestamp
+            self.__sequences[slot] = sequence
+        # Номер последнего кадра выставляется после освобождения блокировки, поэтому читатель,
+        # увидевший этот номер, получит ячейку не раньше, чем запись в нее закончится
+        self.__latest[0] = sequence
+
+    def read(self, out: np.ndarray) -> Optional[get_capture.CapturedFrame]:
+        """
+        Копирование самого свежего кадра в заранее выделенный массив.
+        :param out: Массив формы shape, в который копируется кадр.
+        :return: Объект CapturedFrame с кадром out или None, если кадров еще нет.
+        """
+        while True:
+            sequence = int(self.__latest[0])
+            if sequence == 0:
+                return None
+            slot = sequence % self.slots
+            with self.__locks[slot]:
+                if int(self.__sequences[slot]) == sequence:
+                    timestamp = float(self.__timestamps[slot])
+                    np.copyto(out, self.__frames[slot])
+                    return get_capture.CapturedFrame(out, timestamp, sequence)
+            # Ячейка уже занята более новым кадром, берется самый свежий
+            self.torn += 1
+
+    def close(self) -> None:
+        """
+        Отключение от кольца, создавший процесс также удаляет общую память.
+        """
+        self.__latest = self.__sequences = self.__timestamps = self.__frames = None
+        self.__memory.close()
+        if self.__owner:
+            self.__memory.unlink()
+
+
+class _NoCapture(interfaces.GetCapture):
+    """
+    Пустая камера для FaceRecognition в процессе-потребителе, кадры туда приходят из кольца.
+    """
+    def __init__(self, index_of_camera: int = 0):
+        pass
+
+    def read_capture(self) -> None:
+        return None
+
+    def release(self) -> None:
+        pass
+
+
+class LaserConsumer:
+    """
+    Класс LaserConsumer:
+    Погоня за лазером в процессе-потребителе. Результат - действие ChaseLaser.
+    ChaseLaser создается уже в процессе-потребителе, поэтому сам объект передается в процесс через pickle.
+    """
+    def __init__(self, processing_size: Optional[tuple] = (320, 240)):
+        """
+        Инициализация объекта класса.
+        :param processing_size: Размер кадра для поиска точки, см. ChaseLaser.
+        """
+        self.__processing_size = processing_size
+        self.__chase = None
+
+    def __call__(self, captured: get_capture.CapturedFrame) -> str:
+        if self.__chase is None:
+            import chase_laser
+            self.__chase = chase_laser.ChaseLaser(None, processing_size=self.__processing_size)
+        self.__chase.set_camera(captured.frame, captured.timestamp, captured.sequence)
+        self.__chase.chase()
+        return self.__chase.action
+
+
+class FaceConsumer:
+    """
+    Класс FaceConsumer:
+    Распознавание и слежение за лицами в процессе-потребителе.
+    Результат - кортеж лиц (порядковый номер, имя, (top, right, bottom, left)).
+    """
+    def __init__(self, fake: bool = False, dataset: str = 'dataset', cadence: int = 5):
+        """
+        Инициализация объекта класса.
+        :param fake: Если True, используется fakes.FakeFaceRecognition.
+        :param dataset: Путь к директории с фотографиями.
+        :param cadence: Полное распознавание выполняется на каждом cadence-м кадре.
+        """
+        self.__fake = fake
+        self.__dataset = dataset
+        self.__cadence = cadence
+        self.__pipeline = None
+
+    def __call__(self, captured: get_capture.CapturedFrame) -> tuple:
+        if self.__pipeline is None:
+            if self.__fake:
+                import fakes
+                recognition = fakes.FakeFaceRecognition(dataset=self.__dataset, cadence=self.__cadence)
+            else:
+                import recognize_face
+                recognition = recognize_face.FaceRecognition(0, self.__dataset, cadence=self.__cadence,
+                                                             camera=_NoCapture())
+            self.__pipeline = recognition.pipeline
+        return tuple((track.person_id, track.name, track.box) for track in self.__pipeline.process(captured.frame))
+
+
+def _capture_process(camera_factory: Callable, ring_name: str, shape: tuple, slots: int, locks: tuple,
+                     condition, stop) -> None:
+    """
+    Процесс камеры: чтение кадров и запись каждого нового кадра в кольцо один раз.
+    """
+    ring = FrameRing(shape, slots, ring_name, locks)
+    camera = camera_factory()
+    sequence = 0
+    camera_sequence = None
+    try:
+        while not stop.is_set():
+            captured = camera.read_frame()
+            # Повторно полученный кадр камеры не записывается, иначе потребители обработают его еще раз.
+            # Сравнение на неравенство, так как у зацикленной записи номера после конца начинаются сначала
+            if captured is None or captured.sequence == camera_sequence:
+                continue
+            camera_sequence = captured.sequence
+            frame = captured.frame
+            if frame.shape != ring.shape:
+                frame = cv2.resize(frame, (ring.shape[1], ring.shape[0]), interpolation=cv2.INTER_AREA)
+            sequence += 1
+            ring.write(frame, captured.timestamp, sequence)
+            with condition:
+                condition.notify_all()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        camera.release()
+        ring.close()
+
+
+def _consumer_process(name: str, consumer: Callable, ring_name: str, shape: tuple, slots: int, locks: tuple,
+                      condition, stop, results) -> None:
+    """
+    Процесс-потребитель: ожидание нового кадра, обработка самого свежего и отправка результата.
+    Ошибка обработки кадра выводится и не останавливает процесс, следующий кадр обрабатывается как обычно.
+    """
+    ring = FrameRing(shape, slots, ring_name, locks)
+    frame = np.empty(shape, np.uint8)
+    last = 0
+    last_error = None
+    try:
+        while not stop.is_set():
+            with condition:
+                if not condition.wait_for(lambda: ring.latest > last or stop.is_set(), 0.1):
+                    continue
+            captured = ring.read(frame)
+            if captured is None or captured.sequence <= last:
+                continue
+            last = captured.sequence
+            started = time.monotonic()
+            try:
+                result = consumer(captured)
+            except Exception as error:
+                # Одна и та же ошибка на каждом кадре выводится только один раз, но учитывается каждая
+                if repr(error) != last_error:
+                    last_error = repr(error)
+                    print(f'Consumer {name} failed on frame {captured.sequence}: {error!r}')
+                results.put((name, captured.sequence, captured.timestamp, None, last_error))
+                continue
+            results.put((name, captured.sequence, captured.timestamp, time.monotonic() - started, result))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        results.put((name, None, None, None, ring.torn))
+        ring.close()
+
+
+class VisionPipeline:
+    """
+    Класс VisionPipeline:
+    Процесс камеры и процессы-потребители, связанные кольцом FrameRing.
+    Каждый потребитель всегда обрабатывает самый свежий кадр, медленный потребитель пропускает кадры
+    и не задерживает ни камеру, ни других потребителей. Процессы запускаются методом spawn, поэтому
+    camera_factory и потребители должны передаваться через pickle (функции модулей, functools.partial,
+    объекты LaserConsumer и FaceConsumer).
+    """
+    def __init__(self, camera_factory: Callable, consumers: dict, size: tuple = (640, 480), slots: int = 4):
+        """
+        Инициализация объекта класса.
+        :param camera_factory: Функция без аргументов, которая в процессе камеры создает объект с методами
+            read_frame() и release(), например functools.partial(get_capture.GetCapture, 0, threaded=True).
+        :param consumers: Потребители по именам, каждый принимает CapturedFrame и возвращает маленький результат.
+        :param size: Размер кадров в кольце (ширина, высота), кадры другого размера приводятся к нему.
+        :param slots: Количество ячеек кольца.
+        """
+        self.__camera_factory = camera_factory
+        self.__consumers = dict(consumers)
+        self.__shape = (size[1], size[0], 3)
+        self.__slots = slots
+        self.__context = multiprocessing.get_context('spawn')
+        self.__results = self.__context.Queue()
+        self.__stop = self.__context.Event()
+        self.__condition = self.__context.Condition()
+        self.__ring = None
+        self.__processes = []
+        self.__statistics = {name: {'processed': 0, 'skipped': 0, 'torn': 0, 'errors': 0, 'last': 0, 'busy': 0.0}
+                             for name in self.__consumers}
+        self.__started_at = None
+
+    @property
+    def running(self) -> bool:
+        return self.__ring is not None
+
+    def start(self) -> None:
+        """
+        Создание кольца и запуск процессов.
+        """
+        if self.running:
+            return
+        self.__ring = FrameRing(self.__shape, self.__slots, context=self.__context)
+        self.__stop.clear()
+        arguments = (self.__ring.name, self.__shape, self.__slots, self.__ring.locks, self.__condition, self.__stop)
+        self.__processes = [self.__context.Process(target=_capture_process, name='capture',
+                                                   args=(self.__camera_factory,) + arguments, daemon=True)]
+        for name, consumer in self.__consumers.items():
+            self.__processes.append(self.__context.Process(target=_consumer_process, name=name, daemon=True,
+                                                           args=(name, consumer) + arguments + (self.__results,)))
+        for process in self.__processes:
+            process.start()
+        self.__started_at = time.monotonic()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[tuple]:
+        """
+        Ожидание результата одного из потребителей.
+        :param timeout: Время ожидания в секундах, None - без ограничения.
+        :return: Кортеж (имя потребителя, CapturedFrame без кадра, результат) или None, если результата нет.
+        """
+        while True:
+            try:
+                name, sequence, timestamp, busy, result = self.__results.get(timeout=timeout)
+            except queue.Empty:
+                return None
+            statistics = self.__statistics[name]
+            if sequence is None:
+                # Последнее сообщение завершившегося потребителя - количество испорченных чтений
+                statistics['torn'] = result
+                continue
+            if statistics['last']:
+                statistics['skipped'] += sequence - statistics['last'] - 1
+            statistics['last'] = sequence
+            if busy is None:
+                # Ошибка обработки кадра, потребитель уже вывел ее и продолжает работу
+                statistics['errors'] += 1
+                continue
+            statistics['processed'] += 1
+            statistics['busy'] += busy
+            latency.recorder.record(f'vision.{name}', time.monotonic() - timestamp)
+            return name, get_capture.CapturedFrame(None, timestamp, sequence), result
+
+    @property
+    def statistics(self) -> dict:
+        """
+        Статистика потребителей: rate - кадров в секунду, processed - обработано кадров,
+        skipped - пропущено кадров, busy - доля времени в обработке, torn - кадров, перезаписанных во время чтения,
+        errors - кадров, при обработке которых произошла ошибка (torn известно после stop()).
+        """
+        elapsed = time.monotonic() - self.__started_at if self.__started_at is not None else 0.0
+        return {name: {'rate': values['processed'] / elapsed if elapsed else 0.0,
+                       'processed': values['processed'], 'skipped': values['skipped'],
+                       'busy': values['busy'] / elapsed if elapsed else 0.0, 'torn': values['torn'],
+                       'errors': values['errors']}
+                for name, values in self.__statistics.items()}
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Остановка процессов и удаление кольца.
+        :param timeout: Время ожидания завершения каждого процесса, после него процесс завершается принудительно.
+        """
+        if not self.running:
+            return
+        self.__stop.set()
+        deadline = time.monotonic() + timeout
+        for process in self.__processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        # Сбор оставшихся результатов, в том числе счетчиков испорченных чтений
+        while self.get(0.01) is not None:
+            pass
+        self.__processes = []
+        self.__ring.close()
+        self.__ring = None
+
+
+def main(argv=None) -> None:
+    """
+    Замер пропускной способности потребителей на заменителе камеры.
+    """
+    parser = argparse.ArgumentParser(description='Многопроцессная обработка кадров через общую память')
+    parser.add_argument('--seconds', type=float, default=10.0, help='время работы')
+    parser.add_argument('--fps', type=float, default=60.0, help='частота кадров заменителя камеры')
+    parser.add_argument('--replay', default=None, help='запись .rec вместо заменителя камеры')
+    arguments = parser.parse_args(argv)
+
+    if arguments.replay is not None:
+        import recording
+        camera_factory = functools.partial(recording.ReplayCapture, arguments.replay, loop=True)
+        size = recording.Recording(arguments.replay).size
+    else:
+        import fakes
+        camera_factory = functools.partial(fakes.FakeCapture, 0, fps=arguments.fps)
+        size = (640, 480)
+
+    pipeline = VisionPipeline(camera_factory, {'laser': LaserConsumer(), 'faces': FaceConsumer(fake=True)}, size)
+    pipeline.start()
+    try:
+        end = time.monotonic() + arguments.seconds
+        while time.monotonic() < end:
+            pipeline.get(0.1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+    for name, values in pipeline.statistics.items():
+        print(f"{name}: {values['rate']:.1f} fps, processed {values['processed']}, skipped {values['skipped']}, "
+              f"busy {values['busy']:.0%}, torn {values['torn']}, errors {values['errors']}")
+    latency.recorder.dump()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+import json
+import os
+import shutil
+import threading
+import zlib
+
+
+class AppendLogStorage:
+    """
+    Класс AppendLogStorage:
+    Хранение имен (names) и счетчика имен (count_names) в виде снимка и журнала изменений.
+    Каждое изменение дописывается в журнал небольшой записью с контрольной суммой и сбрасывается на диск (fsync),
+    поэтому стоимость сохранения не зависит от количества имен, а обрыв питания во время записи
+    портит только последнюю запись, которая при загрузке отбрасывается.
+    Когда журнал становится длинным, в фоновом потоке создается новый снимок, а журнал начинается заново.
+    Все операции журнала задают абсолютные значения, поэтому повторное применение записей безопасно.
+    Изменение применяется к данным в памяти только после того, как его запись сброшена на диск.
+    Если снимок записать не удалось, отложенный журнал остается на диске, а следующее сжатие дописывает
+    к нему текущий журнал, поэтому записи, не вошедшие в снимок, не теряются.
+    """
+    def __init__(self, directory: str = '.', name: str = 'data', compact_after: int = 256):
+        """
+        Инициализация объекта класса.
+        :param directory: Директория с файлами хранилища.
+        :param name: Общее имя файлов: <name>.snapshot.json, <name>.log и <name>.log.old.
+        :param compact_after: Количество записей журнала, после которого создается новый снимок.
+        """
+        self.__snapshot_path = os.path.join(directory, f'{name}.snapshot.json')
+        self.__log_path = os.path.join(directory, f'{name}.log')
+        self.__old_log_path = self.__log_path + '.old'
+        self.__compact_after = compact_after
+
+        self.__lock = threading.Lock()
+        self.__names = {}
+        self.__count_names = 0
+        self.__log = None
+        self.__log_records = 0
+        self.__compaction = None
+
+    @property
+    def exists(self) -> bool:
+        """
+        True, если на диске уже есть снимок или журнал.
+        """
+        return any(os.path.exists(path) for path in (self.__snapshot_path, self.__log_path, self.__old_log_path))
+
+    def load(self) -> tuple:
+        """
+        Загрузка данных: снимок, затем недописанный при сжатии старый журнал, затем текущий журнал.
+        :return: Пара (словарь names с ключами int, count_names).
+        """
+        with self.__lock:
+            self.__names, self.__count_names = {}, 0
+            if os.path.exists(self.__snapshot_path):
+                with open(self.__snapshot_path, 'r', encoding='utf-8') as file:
+                    data = json.load(file)
+                self.__names = {int(key): value for key, value in data['names'].items()}
+                self.__count_names = data['count_names']
+
+            recovered = os.path.exists(self.__old_log_path)
+            if recovered:
+                self.__replay(self.__old_log_path)
+            self.__log_records = self.__replay(self.__log_path)
+
+            # Прошлое сжатие не завершилось, сразу записываем снимок, чтобы отложенный журнал не был перезаписан
+            if recovered:
+                self.__write_atomic(self.__snapshot_path, {'names': self.__names, 'count_names': self.__count_names})
+                os.remove(self.__old_log_path)
+            self.__open_log()
+            return dict(self.__names), self.__count_names
+
+    def save(self, names: dict, count_names: int) -> None:
+        """
+        Сохранение всех данных. В журнал записываются только отличия от последнего сохраненного состояния,
+        но для их поиска сравниваются все имена, поэтому при известных изменениях нужно использовать update().
+        :param names: Словарь {порядковый номер: имя}.
+        :param count_names: Счетчик имен.
+        """
+        with self.__lock:
+            records = [{'op': 'del', 'id': key} for key in self.__names.keys() - names.keys()]
+            records.extend({'op': 'set', 'id': int(key), 'name': value}
+                           for key, value in names.items() if self.__names.get(key) != value)
+        self.__write(records, count_names)
+
+    def update(self, changes: dict, count_names: int) -> None:
+        """
+        Сохранение известных изменений. Стоимость зависит только от количества изменений, а не от количества имен.
+        :param changes: Словарь {порядковый номер: новое имя или None, если имя удалено}.
+        :param count_names: Счетчик имен.
+        """
+        records = [{'op': 'del', 'id': int(key)} if value is None else {'op': 'set', 'id': int(key), 'name': value}
+                   for key, value in changes.items()]
+        self.__write(records, count_names)
+
+    def __write(self, records: list, count_names: int) -> None:
+        """
+        Дописывание записей и счетчика, если он изменился, в журнал и запуск сжатия длинного журнала.
+        """
+        with self.__lock:
+            if count_names != self.__count_names:
+                records.append({'op': 'count', 'value': count_names})
+            if not records:
+                return
+
+            self.__append(records)
+            need_compaction = self.__log_records >= self.__compact_after and self.__compaction is None
+
+        if need_compaction:
+            self.compact(wait=False)
+
+    def compact(self, wait: bool = True) -> None:
+        """
+        Создание нового снимка и начало нового журнала.
+        :param wait: Если False, снимок записывается в фоновом потоке.
+        """
+        with self.__lock:
+            if self.__compaction is not None:
+                thread = self.__compaction
+            else:
+                # Текущий журнал откладывается, новые записи идут в новый журнал,
+                # поэтому снимок можно писать без блокировки
+                if self.__log is not None:
+                    self.__log.close()
+                if os.path.exists(self.__old_log_path):
+                    # Прошлый снимок не записан, отложенный журнал еще нужен: текущий дописывается к нему
+                    self.__merge_log()
+                elif os.path.exists(self.__log_path):
+                    os.replace(self.__log_path, self.__old_log_path)
+                self.__open_log()
+                self.__log_records = 0
+
+                names, count_names = dict(self.__names), self.__count_names
+                thread = threading.Thread(target=self.__write_snapshot, args=(names, count_names),
+                                          name='AppendLogStorage', daemon=True)
+                self.__compaction = thread
+                thread.start()
+        if wait:
+            thread.join()
+
+    def export_json(self, path: str) -> None:
+        """
+        Экспорт в прежний формат data.json.
+        :param path: Путь к файлу .json.
+        """
+        with self.__lock:
+            data = {'names': dict(self.__names), 'count_names': self.__count_names}
+        self.__write_atomic(path, data)
+
+    def import_json(self, path: str) -> tuple:
+        """
+        Импорт из прежнего формата data.json. Текущие данные заменяются импортированными.
+        :param path: Путь к файлу .json.
+        :return: Пара (словарь names с ключами int, count_names).
+        """
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        names = {int(key): value for key, value in data['names'].items()}
+        self.save(names, data['count_names'])
+        self.compact()
+        return dict(names), data['count_names']
+
+    def close(self) -> None:
+        """
+        Ожидание фонового сжатия и закрытие журнала.
+        """
+        with self.__lock:
+            thread = self.__compaction
+        if thread is not None:
+            thread.join()
+        with self.__lock:
+            if self.__log is not None:
+                self.__log.close()
+                self.__log = None
+
+    def __open_log(self) -> None:
+        """
+        Открытие журнала для дописывания.
+        """
+        if self.__log is not None and not self.__log.closed:
+            self.__log.close()
+        self.__log = open(self.__log_path, 'ab')
+
+    def __merge_log(self) -> None:
+        """
+        Дописывание текущего журнала к отложенному. Вызывается под блокировкой при закрытом журнале.
+        Если работа прервется до удаления текущего журнала, его записи применятся при загрузке дважды, что безопасно.
+        """
+        if not os.path.exists(self.__log_path):
+            return
+        with open(self.__old_log_path, 'ab') as target, open(self.__log_path, 'rb') as source:
+            shutil.copyfileobj(source, target)
+            target.flush()
+            os.fsync(target.fileno())
+        os.remove(self.__log_path)
+
+    def __append(self, records: list) -> None:
+        """
+        Дописывание записей в журнал. Каждая строка: crc32 в шестнадцатеричном виде, пробел, запись JSON.
+        Несколько записей одного сохранения пишутся одной строкой (op = batch), чтобы при обрыве они
+        применились все или ни одна: иначе имя могло сохраниться без увеличения счетчика и его номер выдался бы снова.
+        Данные в памяти меняются только после fsync. При ошибке записи недописанная строка обрезается,
+        чтобы следующие записи не оказались после испорченной строки, и ошибка передается вызывающему.
+        """
+        if self.__log is None:
+            self.__open_log()
+        record = records[0] if len(records) == 1 else {'op': 'batch', 'records': records}
+        payload = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        position = self.__log.tell()
+        try:
+            self.__log.write(b'%08x %s\n' % (zlib.crc32(payload), payload))
+            self.__log.flush()
+            os.fsync(self.__log.fileno())
+        except BaseException:
+            try:
+                self.__log.close()
+                with open(self.__log_path, 'r+b') as file:
+                    file.truncate(position)
+            except OSError:
+                pass
+            self.__log = None
+            raise
+        self.__apply(record)
+        self.__log_records += len(records)
+
+    def __apply(self, record: dict) -> None:
+        """
+        Применение записи журнала к данным в памяти.
+        """
+        if record['op'] == 'batch':
+            for item in record['records']:
+                self.__apply(item)
+        elif record['op'] == 'set':
+            self.__names[int(record['id'])] = record['name']
+        elif record['op'] == 'del':
+            self.__names.pop(int(record['id']), None)
+        elif record['op'] == 'count':
+            self.__count_names = record['value']
+
+    def __replay(self, path: str) -> int:
+        """
+        Применение записей журнала.
+        Чтение останавливается на первой поврежденной или недописанной записи, журнал обрезается до нее.
+        :return: Количество примененных записей.
+        """
+        if not os.path.exists(path):
+            return 0
+        count = 0
+        valid_size = 0
+        with open(path, 'rb') as file:
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                checksum, _, payload = line.rstrip(b'\n').partition(b' ')
+                try:
+                    if int(checksum, 16) != zlib.crc32(payload):
+                        break
+                    record = json.loads(payload.decode('utf-8'))
+                except ValueError:
+                    break
+                self.__apply(record)
+                valid_size += len(line)
+                count += 1
+
+        if valid_size != os.path.getsize(path):
+            with open(path, 'r+b') as file:
+                file.truncate(valid_size)
+        return count
+
+    def __write_snapshot(self, names: dict, count_names: int) -> None:
+        """
+        Запись снимка и удаление отложенного журнала, изменения из которого вошли в снимок.
+        Если снимок записать не удалось, отложенный журнал остается, ошибка выводится.
+        """
+        try:
+            self.__write_atomic(self.__snapshot_path, {'names': names, 'count_names': count_names})
+            if os.path.exists(self.__old_log_path):
+                os.remove(self.__old_log_path)
+        except Exception as error:
+            print(f'Snapshot {self.__snapshot_path} was not written, the log is kept: {error!r}')
+        finally:
+            with self.__lock:
+                self.__compaction = None
+
+    @staticmethod
+    def __write_atomic(path: str, data: dict) -> None:
+        """
+        Запись JSON во временный файл с fsync и атомарная замена им файла path.
+        """
+        temporary = path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+
+        # Сброс на диск записи директории, чтобы переименование пережило обрыв питания
+        directory = None
+        try:
+            directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+            os.fsync(directory)
+        except OSError:
+            pass
+        finally:
+            if directory is not None:
+                os.close(directory)
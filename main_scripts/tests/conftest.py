@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули робота лежат в main_scripts и импортируются без пакета, как при запуске из этой директории
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
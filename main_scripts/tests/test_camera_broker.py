@@ -0,0 +1,93 @@
+import camera_broker
+import threading
+import pytest
+
+
+class SlowCapture:
+    """
+    Камера, открытие которой ждет разрешения теста.
+    """
+    opened = []
+    allow = {}
+
+    def __init__(self, index_of_camera: int):
+        SlowCapture.allow.setdefault(index_of_camera, threading.Event()).wait(5)
+        if index_of_camera < 0:
+            raise OSError('Камера не найдена')
+        self.index = index_of_camera
+        self.started = False
+        self.released = False
+        SlowCapture.opened.append(self)
+
+    def set_property(self, property_id: int, value: float) -> bool:
+        return True
+
+    def start(self) -> None:
+        self.started = True
+
+    def release(self) -> None:
+        self.released = True
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    SlowCapture.opened = []
+    SlowCapture.allow = {}
+    monkeypatch.setattr(camera_broker.get_capture, 'GetCapture', SlowCapture)
+    return camera_broker.CameraBroker()
+
+
+def acquire_in_thread(broker, index: int, results: list) -> threading.Thread:
+    thread = threading.Thread(target=lambda: results.append(broker.acquire(index)))
+    thread.start()
+    return thread
+
+
+def test_opened_camera_is_available_while_other_camera_opens(broker):
+    SlowCapture.allow[0] = threading.Event()
+    SlowCapture.allow[0].set()
+    first = broker.acquire(0)
+
+    # Камера 1 открывается медленно, подписка на камеру 0 и отписка от нее не ждут
+    SlowCapture.allow[1] = threading.Event()
+    results = []
+    opening = acquire_in_thread(broker, 1, results)
+    second = broker.acquire(0)
+    assert broker.active_cameras() == {0: 2}
+    second.release()
+    assert broker.active_cameras() == {0: 1}
+
+    SlowCapture.allow[1].set()
+    opening.join()
+    assert broker.active_cameras() == {0: 1, 1: 1}
+    first.release()
+    results[0].release()
+    assert broker.active_cameras() == {}
+    assert all(capture.released for capture in SlowCapture.opened)
+
+
+def test_concurrent_subscribers_open_camera_once(broker):
+    SlowCapture.allow[0] = threading.Event()
+    results = []
+    threads = [acquire_in_thread(broker, 0, results) for _ in range(4)]
+    SlowCapture.allow[0].set()
+    for thread in threads:
+        thread.join()
+
+    assert len(SlowCapture.opened) == 1 and SlowCapture.opened[0].started
+    assert broker.active_cameras() == {0: 4}
+    for subscriber in results:
+        subscriber.release()
+    assert SlowCapture.opened[0].released
+    assert broker.active_cameras() == {}
+
+
+def test_failed_open_is_not_published(broker):
+    SlowCapture.allow[-1] = threading.Event()
+    SlowCapture.allow[-1].set()
+    with pytest.raises(OSError):
+        broker.acquire(-1)
+    assert broker.active_cameras() == {}
+    # Следующий подписчик пробует открыть камеру снова
+    with pytest.raises(OSError):
+        broker.acquire(-1)
@@ -0,0 +1,41 @@
+import chase_laser
+import cv2
+import numpy as np
+import pytest
+
+
+def in_range_mask(image: np.ndarray, hsv_ranges=chase_laser.LASER_HSV_RANGES) -> np.ndarray:
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    mask = np.zeros(image.shape[:2], np.uint8)
+    for low, high in hsv_ranges:
+        mask |= cv2.inRange(hsv, low, high)
+    return mask != 0
+
+
+@pytest.fixture(scope='module')
+def table():
+    return chase_laser.ColorLookupTable()
+
+
+@pytest.fixture(scope='module')
+def noisy():
+    # Шумный кадр, в котором встречаются цвета на границах диапазонов
+    return np.random.default_rng(0).integers(0, 256, (72, 128, 3), dtype=np.uint8)
+
+
+def test_lookup_mask_equals_in_range_mask(table, noisy):
+    assert ((table.apply(noisy) != 0) == in_range_mask(noisy)).all()
+
+
+def test_lookup_mask_equals_in_range_mask_on_roi(table, noisy):
+    # Окна поиска в режиме слежения - срезы кадра, которые не лежат в памяти непрерывно
+    for roi in (noisy[10:50, 20:90], noisy[1:2, :], noisy[:, 127:], noisy[5:60:3, 7:100:2]):
+        assert ((table.apply(roi) != 0) == in_range_mask(roi)).all()
+
+
+def test_lookup_mask_follows_new_ranges(table, noisy):
+    ranges = (((40, 50, 50), (80, 255, 255)),)
+    lookup = chase_laser.ColorLookupTable(ranges)
+    assert ((lookup.apply(noisy) != 0) == in_range_mask(noisy, ranges)).all()
+    lookup.set_ranges(chase_laser.LASER_HSV_RANGES)
+    assert ((lookup.apply(noisy) != 0) == (table.apply(noisy) != 0)).all()
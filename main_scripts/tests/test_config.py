@@ -0,0 +1,120 @@
+import config
+import storage
+import time
+import pytest
+
+
+@pytest.fixture
+def names_storage(tmp_path):
+    names_storage = storage.AppendLogStorage(str(tmp_path), 'data')
+    names_storage.load()
+    yield names_storage
+    names_storage.close()
+
+
+def reopen(directory) -> tuple:
+    names_storage = storage.AppendLogStorage(str(directory), 'data')
+    try:
+        return names_storage.load()
+    finally:
+        names_storage.close()
+
+
+def test_add_and_find(names_storage):
+    registry = config.NameRegistry(names_storage)
+    assert registry.add('Анна') == 0
+    assert registry.add('Борис') == 1
+    assert registry.count == 2
+    assert (registry.get(1), registry.find('Анна'), registry.find('Вера')) == ('Борис', 0, None)
+
+
+def test_find_returns_last_id_of_repeated_name(names_storage):
+    registry = config.NameRegistry(names_storage)
+    for name in ('Анна', 'Борис', 'Анна', 'Анна'):
+        registry.add(name)
+    assert registry.find('Анна') == 3
+
+    # Индекс обновляется по номерам этого имени, а не перебором всех имен
+    registry.remove(3)
+    assert registry.find('Анна') == 2
+    registry.remove(0)
+    assert registry.find('Анна') == 2
+    registry.remove(2)
+    assert registry.find('Анна') is None
+    assert registry.find('Борис') == 1
+
+
+def test_removing_last_id_reuses_it(names_storage):
+    registry = config.NameRegistry(names_storage)
+    registry.add('Анна')
+    registry.add('Борис')
+    registry.remove(1)
+    assert registry.count == 1
+    assert registry.add('Вера') == 1
+
+    # Номер из середины не выдается снова
+    registry.remove(0)
+    assert registry.count == 2
+    registry.remove(5)
+    assert dict(registry.snapshot()) == {1: 'Вера'}
+
+
+def test_snapshot_does_not_change_after_edits(names_storage):
+    registry = config.NameRegistry(names_storage)
+    registry.add('Анна')
+    snapshot = registry.snapshot()
+    registry.add('Борис')
+    assert dict(snapshot) == {0: 'Анна'}
+    with pytest.raises(TypeError):
+        snapshot[5] = 'Вера'
+
+
+def test_load_rebuilds_index(tmp_path, names_storage):
+    names_storage.update({0: 'Анна', 1: 'Борис', 2: 'Анна'}, 3)
+    registry = config.NameRegistry(names_storage)
+    registry.load()
+    assert (registry.count, registry.find('Анна'), registry.find('Борис')) == (3, 2, 1)
+    registry.remove(2)
+    assert registry.find('Анна') == 0
+
+
+def test_flush_writes_only_changes(tmp_path, names_storage):
+    registry = config.NameRegistry(names_storage)
+    registry.add('Анна')
+    registry.add('Борис')
+    registry.flush()
+    assert reopen(tmp_path) == ({0: 'Анна', 1: 'Борис'}, 2)
+
+    registry.remove(0)
+    registry.add('Вера')
+    registry.flush()
+    assert reopen(tmp_path) == ({1: 'Борис', 2: 'Вера'}, 3)
+
+
+def test_save_batches_changes_in_background(tmp_path, names_storage):
+    registry = config.NameRegistry(names_storage, flush_delay=0.2)
+    registry.add('Анна')
+    registry.save()
+    registry.add('Борис')
+    registry.save()
+    # Сохранение отложено и не задерживает вызывающий поток
+    assert reopen(tmp_path) == ({}, 0)
+
+    deadline = time.monotonic() + 5
+    while reopen(tmp_path) != ({0: 'Анна', 1: 'Борис'}, 2) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert reopen(tmp_path) == ({0: 'Анна', 1: 'Борис'}, 2)
+
+
+def test_flush_cancels_pending_save(tmp_path, names_storage):
+    registry = config.NameRegistry(names_storage, flush_delay=60)
+    registry.add('Анна')
+    registry.save()
+    registry.flush()
+    assert reopen(tmp_path) == ({0: 'Анна'}, 1)
+
+    # После flush() следующий save() снова запускает отложенное сохранение
+    registry.add('Борис')
+    registry.save()
+    registry.flush()
+    assert reopen(tmp_path) == ({0: 'Анна', 1: 'Борис'}, 2)
@@ -0,0 +1,87 @@
+import encoding_cache
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def photos(tmp_path):
+    paths = []
+    for name in ('a', 'b', 'c'):
+        path = tmp_path / f'{name}.jpg'
+        path.write_bytes(name.encode())
+        paths.append(str(path))
+    return paths
+
+
+def encode(path: str) -> np.ndarray:
+    return np.full(4, float(ord(path[-5])))
+
+
+def test_unchanged_photos_are_not_encoded_again(tmp_path, photos):
+    calls = []
+
+    def counting_encode(path):
+        calls.append(path)
+        return encode(path)
+    cache_path = str(tmp_path / 'encodings.npz')
+    encoding_cache.EncodingCache(counting_encode, cache_path).encodings(photos)
+    results = encoding_cache.EncodingCache(counting_encode, cache_path).encodings(photos)
+    assert calls == photos
+    assert [result[0] for result in results] == [ord('a'), ord('b'), ord('c')]
+
+
+def test_invalidate_during_encoding_is_kept(tmp_path, photos):
+    cache_path = str(tmp_path / 'encodings.npz')
+    cache = encoding_cache.EncodingCache(encode, cache_path)
+    cache.encodings(photos[:2])
+
+    # Пока вычисляется новая фотография, фото a переснимают и его запись удаляют
+    def encode_and_invalidate(path):
+        cache.invalidate(photos[0])
+        return encode(path)
+    cache._EncodingCache__encoder = encode_and_invalidate
+    results = cache.encodings(photos)
+    assert results[0] is not None
+
+    calls = []
+
+    def counting_encode(path):
+        calls.append(path)
+        return encode(path)
+    assert encoding_cache.EncodingCache(counting_encode, cache_path).encodings(photos)[0] is not None
+    assert calls == [photos[0]]
+
+
+def test_invalidate_of_encoded_photo_during_encoding_is_kept(tmp_path, photos):
+    cache = encoding_cache.EncodingCache(encode, str(tmp_path / 'encodings.npz'))
+
+    # Запись вычисляемой сейчас фотографии удаляется до того, как вектор готов
+    def encode_and_invalidate(path):
+        cache.invalidate(path)
+        return encode(path)
+    cache._EncodingCache__encoder = encode_and_invalidate
+    cache.encodings(photos[:1])
+
+    calls = []
+
+    def counting_encode(path):
+        calls.append(path)
+        return encode(path)
+    cache._EncodingCache__encoder = counting_encode
+    cache.encodings(photos)
+    assert calls == photos
+
+
+def test_store_after_invalidate_during_encoding_wins(tmp_path, photos):
+    cache = encoding_cache.EncodingCache(encode, str(tmp_path / 'encodings.npz'))
+    cache.encodings(photos[:1])
+    stored = np.zeros(4)
+
+    def encode_invalidate_and_store(path):
+        cache.invalidate(photos[0])
+        cache.store(photos[0], stored)
+        return encode(path)
+    cache._EncodingCache__encoder = encode_invalidate_and_store
+    assert (cache.encodings(photos)[0] == stored).all()
+    cache._EncodingCache__encoder = None
+    assert (cache.encodings(photos)[0] == stored).all()
@@ -0,0 +1,84 @@
+import encoding_cache
+import enrollment
+import face_matcher
+import threading
+import cv2
+import numpy as np
+
+
+def encode_mean(frame: np.ndarray):
+    """
+    Вектор "лица" - средний цвет кадра, черный кадр считается кадром без лица.
+    """
+    return frame.reshape(-1, 3).mean(axis=0) / 255 if frame.any() else None
+
+
+def commit_and_wait(people: enrollment.Enrollment, person_id: int) -> tuple:
+    done = threading.Event()
+    result = {}
+
+    def callback(added):
+        result.update(added=added, thread=threading.current_thread().name)
+        done.set()
+
+    people.commit(person_id, callback)
+    assert done.wait(2.0)
+    return result['added'], result['thread']
+
+
+def test_commit_applies_in_worker_thread(tmp_path):
+    cache = encoding_cache.EncodingCache(lambda _: None, str(tmp_path / 'encodings.npz'))
+    matcher = face_matcher.GalleryMatcher()
+    people = enrollment.Enrollment(matcher, encode_mean, cache)
+    frame = np.full((8, 8, 3), 200, np.uint8)
+    path = str(tmp_path / '0.jpg')
+    cv2.imwrite(path, frame)
+
+    people.prepare(0, frame, path)
+    added, thread = commit_and_wait(people, 0)
+    assert added
+    assert thread == 'Enrollment'
+    assert len(matcher) == 1
+    assert encoding_cache.EncodingCache(lambda _: None, str(tmp_path / 'encodings.npz')).encodings([path])[0] is not None
+
+
+def test_commit_reports_frame_without_face():
+    matcher = face_matcher.GalleryMatcher()
+    people = enrollment.Enrollment(matcher, encode_mean)
+    people.prepare(0, np.zeros((8, 8, 3), np.uint8))
+    assert commit_and_wait(people, 0)[0] is False
+    assert len(matcher) == 0
+
+
+def test_discard_reports_pending_commit():
+    release = threading.Event()
+
+    def slow_encoder(frame):
+        release.wait(2.0)
+        return encode_mean(frame)
+
+    matcher = face_matcher.GalleryMatcher()
+    people = enrollment.Enrollment(matcher, slow_encoder)
+    results = []
+    people.prepare(0, np.full((8, 8, 3), 100, np.uint8))
+    people.commit(0, results.append)
+    people.discard(0)
+    release.set()
+    people.wait()
+    assert results == [False]
+    assert len(matcher) == 0
+
+
+def test_encoder_error_keeps_worker_alive():
+    def flaky_encoder(frame):
+        if frame[0, 0, 0] == 1:
+            raise RuntimeError('model failed')
+        return encode_mean(frame)
+
+    matcher = face_matcher.GalleryMatcher()
+    people = enrollment.Enrollment(matcher, flaky_encoder)
+    people.prepare(0, np.full((8, 8, 3), 1, np.uint8))
+    assert commit_and_wait(people, 0)[0] is False
+    people.prepare(1, np.full((8, 8, 3), 50, np.uint8))
+    assert commit_and_wait(people, 1)[0] is True
+    assert len(matcher) == 1
@@ -0,0 +1,96 @@
+import face_matcher
+import numpy as np
+import pytest
+
+
+def clustered_gallery(people: int = 1500, groups: int = 40, dimension: int = 128, seed: int = 1) -> np.ndarray:
+    """
+    Галерея, похожая на векторы лиц: группы близких векторов вокруг случайных центров.
+    """
+    generator = np.random.default_rng(seed)
+    centers = generator.normal(0, 0.3, (groups, dimension))
+    gallery = centers[generator.integers(0, groups, people)] + generator.normal(0, 0.05, (people, dimension))
+    return gallery.astype(np.float32)
+
+
+def brute_force(queries: np.ndarray, gallery: np.ndarray) -> np.ndarray:
+    distances = ((queries[:, None, :] - gallery[None, :, :]) ** 2).sum(axis=2)
+    return distances.argmin(axis=1)
+
+
+def test_duplicate_vectors_leave_no_empty_clusters():
+    # Десять разных векторов, каждый повторяется много раз: большая часть из 30 центров пустеет
+    generator = np.random.default_rng(0)
+    gallery = np.repeat(generator.normal(0, 1, (10, 16)).astype(np.float32), 50, axis=0)
+    index = face_matcher.ClusterIndex(gallery, clusters=30, nprobe=4)
+    for rows in index.candidates(gallery[::7]):
+        assert len(rows) > 0
+    assert index.nprobe <= 10
+
+
+def test_single_vector_gallery():
+    gallery = np.ones((1, 8), np.float32)
+    index = face_matcher.ClusterIndex(gallery, clusters=5, nprobe=4)
+    assert [list(rows) for rows in index.candidates(gallery)] == [[0]]
+
+
+@pytest.mark.parametrize('nprobe', [4, 1000])
+def test_index_agrees_with_brute_force(nprobe):
+    gallery = clustered_gallery()
+    ids = np.arange(len(gallery))
+    matcher = face_matcher.GalleryMatcher(tolerance=10.0, index_threshold=100, nprobe=nprobe)
+    matcher.set_gallery(ids, gallery)
+
+    generator = np.random.default_rng(2)
+    queries = gallery[generator.choice(len(gallery), 200, replace=False)]
+    queries = queries + generator.normal(0, 0.01, queries.shape).astype(np.float32)
+    found = np.array([match.id for match in matcher.match(queries)])
+    expected = brute_force(queries, gallery)
+    if nprobe >= len(gallery):
+        assert (found == expected).all()
+    else:
+        assert (found == expected).mean() >= 0.98
+
+
+def test_upsert_updates_index_without_rebuild(monkeypatch):
+    gallery = clustered_gallery(people=400)
+    matcher = face_matcher.GalleryMatcher(tolerance=0.3, index_threshold=100, rebuild_after=0.25)
+    matcher.set_gallery(np.arange(len(gallery)), gallery)
+
+    builds = []
+    build = face_matcher.ClusterIndex.__init__
+
+    def counting_init(self, *args, **kwargs):
+        builds.append(1)
+        build(self, *args, **kwargs)
+    monkeypatch.setattr(face_matcher.ClusterIndex, '__init__', counting_init)
+
+    # Замена вектора человека и добавление нового не пересчитывают k-средних
+    matcher.upsert(5, gallery[300])
+    matcher.upsert(1000, gallery[10] + 0.001)
+    matcher.remove(7)
+    assert builds == []
+    assert len(matcher) == 400
+    matches = matcher.match(np.stack([gallery[300], gallery[8], gallery[7]]))
+    assert matches[0].id in (5, 300)
+    assert matches[1].id == 8
+    assert matches[2].id != 7
+
+    # После изменения заметной доли галереи индекс строится заново
+    for person_id in range(100, 210):
+        matcher.remove(person_id)
+    assert builds
+
+
+def test_removed_clusters_fall_back_to_exact_search():
+    generator = np.random.default_rng(3)
+    far = generator.normal(0, 0.05, (10, 16)).astype(np.float32) + 5
+    near = generator.normal(0, 0.05, (200, 16)).astype(np.float32)
+    matcher = face_matcher.GalleryMatcher(tolerance=100.0, index_threshold=100, nprobe=1, rebuild_after=1.0)
+    matcher.set_gallery(np.arange(210), np.concatenate([far, near]))
+
+    # Кластер далеких векторов удаляется целиком, запрос рядом с ним все равно находит ближайший вектор
+    for person_id in range(10):
+        matcher.remove(person_id)
+    match, = matcher.match(far[:1])
+    assert 10 <= match.id < 210
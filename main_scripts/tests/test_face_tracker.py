@@ -0,0 +1,96 @@
+import face_tracker
+import numpy as np
+import pytest
+
+FACE = np.random.default_rng(0).integers(0, 256, (40, 40, 3), dtype=np.uint8)
+
+
+def scene(top: int, left: int) -> np.ndarray:
+    # Текстурное "лицо" на однородном фоне, чтобы сопоставление шаблона было однозначным
+    frame = np.full((200, 240, 3), 90, np.uint8)
+    frame[top:top + 40, left:left + 40] = FACE
+    return frame
+
+
+class Identify:
+    """
+    Распознавание, которое возвращает заданные лица и считает вызовы.
+    """
+    def __init__(self, *faces):
+        self.faces = list(faces)
+        self.calls = 0
+
+    def __call__(self, frame):
+        self.calls += 1
+        return list(self.faces)
+
+
+def test_iou():
+    assert face_tracker.iou((0, 10, 10, 0), (0, 10, 10, 0)) == 1.0
+    assert face_tracker.iou((0, 10, 10, 0), (0, 20, 10, 10)) == 0.0
+    assert face_tracker.iou((0, 10, 10, 0), (0, 15, 10, 5)) == pytest.approx(50 / 150)
+
+
+def test_identify_runs_every_cadence_frames():
+    identify = Identify((0, 'Анна', 0.3, (50, 100, 90, 60)))
+    pipeline = face_tracker.RecognitionPipeline(identify, cadence=5)
+    for _ in range(12):
+        pipeline.process(scene(50, 60))
+    # Распознавание на 1, 6 и 11 кадрах, на остальных только слежение
+    assert identify.calls == 3
+    statistics = pipeline.statistics
+    assert (statistics['frames'], statistics['identified'], statistics['tracked']) == (12, 3, 9)
+    assert statistics['identify_ratio'] == pytest.approx(3 / 12)
+
+
+def test_cadence_one_identifies_every_frame():
+    identify = Identify()
+    pipeline = face_tracker.RecognitionPipeline(identify, cadence=1)
+    for _ in range(4):
+        pipeline.process(scene(50, 60))
+    assert identify.calls == 4
+
+    pipeline.set_cadence(3)
+    for _ in range(6):
+        pipeline.process(scene(50, 60))
+    assert identify.calls == 6
+
+
+def test_tracking_follows_moving_face_and_keeps_identity():
+    identify = Identify((0, 'Анна', 0.3, (50, 100, 90, 60)))
+    pipeline = face_tracker.RecognitionPipeline(identify, cadence=10)
+    [track] = pipeline.process(scene(50, 60))
+    for step in range(1, 5):
+        [moved] = pipeline.process(scene(50 + 3 * step, 60 + 4 * step))
+        assert moved is track
+        assert moved.box == (50 + 3 * step, 100 + 4 * step, 90 + 3 * step, 60 + 4 * step)
+        assert moved.as_face()[:3] == (0, 'Анна', 0.3)
+    assert identify.calls == 1
+
+
+def test_lost_face_triggers_identify_on_next_frame():
+    identify = Identify((0, 'Анна', 0.3, (50, 100, 90, 60)))
+    pipeline = face_tracker.RecognitionPipeline(identify, cadence=10)
+    pipeline.process(scene(50, 60))
+    # Лицо исчезло: трек потерян и не возвращается, на следующем кадре распознавание без ожидания cadence
+    assert pipeline.process(np.full((200, 240, 3), 90, np.uint8)) == []
+    assert identify.calls == 1
+    identify.faces = []
+    assert pipeline.process(scene(50, 60)) == []
+    assert identify.calls == 2
+    assert pipeline.tracks == []
+
+
+def test_identify_results_are_associated_by_iou():
+    identify = Identify((0, 'Анна', 0.3, (50, 100, 90, 60)))
+    pipeline = face_tracker.RecognitionPipeline(identify, cadence=1)
+    [first] = pipeline.process(scene(50, 60))
+
+    # Рамка немного сдвинулась - тот же трек с обновленной личностью, далекая рамка - новый трек
+    identify.faces = [(1, 'Борис', 0.4, (150, 200, 190, 160)), (0, 'Анна', 0.2, (52, 103, 92, 63))]
+    tracks = pipeline.process(scene(52, 63))
+    assert len(tracks) == 2
+    same = next(track for track in tracks if track.name == 'Анна')
+    new = next(track for track in tracks if track.name == 'Борис')
+    assert same is first and same.box == (52, 103, 92, 63) and same.distance == 0.2
+    assert new.track_id != first.track_id
@@ -0,0 +1,70 @@
+import get_capture
+import threading
+import numpy as np
+import pytest
+
+
+class ScriptedCamera:
+    """
+    Камера, которая отдает кадр только по разрешению теста. Значение пикселей кадра - его номер.
+    """
+    def __init__(self, index_of_camera):
+        self.frames = threading.Semaphore(0)
+        self.value = 0
+        self.released = False
+
+    def read(self):
+        if not self.frames.acquire(timeout=0.05):
+            return False, None
+        self.value += 1
+        return True, np.full((4, 4, 3), self.value, np.uint8)
+
+    def set(self, property_id, value):
+        return True
+
+    def release(self):
+        self.released = True
+
+
+@pytest.fixture
+def capture(monkeypatch):
+    monkeypatch.setattr(get_capture.cv2, 'VideoCapture', ScriptedCamera)
+    capture = get_capture.GetCapture(0, threaded=True)
+    yield capture
+    capture.release()
+
+
+def camera_of(capture) -> ScriptedCamera:
+    return capture._GetCapture__camera
+
+
+def test_read_frame_returns_latest_frame_once(capture):
+    camera = camera_of(capture)
+    assert capture.read_latest() is None
+    for _ in range(3):
+        camera.frames.release()
+    assert capture.wait_for_frame(2, timeout=2).sequence == 3
+
+    # Из накопившихся кадров возвращается самый свежий, а следующий вызов ждет нового кадра
+    captured = capture.read_frame()
+    assert captured.sequence == 3 and (captured.frame == 3).all()
+    assert not captured.frame.flags.writeable
+    camera.frames.release()
+    assert capture.read_frame().sequence == 4
+
+
+def test_wait_for_frame_times_out_without_new_frame(capture):
+    camera_of(capture).frames.release()
+    assert capture.wait_for_frame(0, timeout=2).sequence == 1
+    assert capture.wait_for_frame(1, timeout=0.1) is None
+
+
+def test_release_wakes_waiting_consumer(capture):
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(capture.wait_for_frame(0, timeout=5)))
+    waiter.start()
+    capture.release()
+    waiter.join(2)
+    assert not waiter.is_alive()
+    assert results == [None]
+    assert camera_of(capture).released
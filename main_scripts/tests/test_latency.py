@@ -0,0 +1,75 @@
+import latency
+import json
+import math
+import pytest
+
+
+def test_value_falls_into_bucket_with_growth_error():
+    histogram = latency.LatencyHistogram(growth=1.05)
+    for seconds in (1e-5, 3.7e-4, 0.0123, 0.25, 4.0):
+        histogram.reset()
+        histogram.record(seconds)
+        histogram.record(seconds * 2)
+        # Середина корзины отличается от значения не больше чем на ширину корзины
+        assert histogram.percentile(50) == pytest.approx(seconds, rel=0.05)
+
+
+def test_percentiles_of_uniform_values():
+    histogram = latency.LatencyHistogram(growth=1.01)
+    for millisecond in range(1, 1001):
+        histogram.record(millisecond / 1000)
+    assert histogram.count == 1000
+    assert histogram.percentile(50) == pytest.approx(0.500, rel=0.01)
+    assert histogram.percentile(95) == pytest.approx(0.950, rel=0.01)
+    assert histogram.percentile(99) == pytest.approx(0.990, rel=0.01)
+    # Крайние процентили не выходят за наблюдавшиеся min и max
+    assert 0.001 <= histogram.percentile(0) <= 0.001 * 1.01
+    assert 0.99 <= histogram.percentile(100) <= 1.0
+
+
+def test_out_of_range_values_are_clamped():
+    histogram = latency.LatencyHistogram(min_value=1e-3, max_value=1.0)
+    # Значения меньше min_value попадают в первую корзину, процентиль ограничен наблюдавшимся min
+    histogram.record(1e-6)
+    assert histogram.percentile(50) == 1e-6
+    # Значения больше max_value попадают в последнюю корзину, процентиль близок к max_value
+    histogram.record(50.0)
+    assert histogram.percentile(100) == pytest.approx(1.0, rel=0.05)
+    summary = histogram.summary()
+    assert summary['count'] == 2
+    assert summary['min'] == pytest.approx(1e-3)
+    assert summary['max'] == pytest.approx(50000.0)
+    assert summary['mean'] == pytest.approx((1e-6 + 50.0) / 2 * 1000)
+
+
+def test_empty_histogram_summary_is_zero():
+    histogram = latency.LatencyHistogram()
+    assert histogram.percentile(99) == 0.0
+    assert histogram.summary() == {'count': 0, 'mean': 0.0, 'min': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0,
+                                   'max': 0.0}
+
+
+def test_recorder_summary_and_dump(tmp_path, capsys):
+    recorder = latency.LatencyRecorder()
+    recorder.record('b.stage', 0.002)
+    recorder.record('a.stage', 0.010)
+    recorder.record('a.stage', 0.030)
+    summary = recorder.summary()
+    assert list(summary) == ['a.stage', 'b.stage']
+    assert summary['a.stage']['count'] == 2
+    assert summary['a.stage']['max'] == pytest.approx(30.0)
+
+    path = tmp_path / 'latency.json'
+    recorder.dump(str(path))
+    assert 'a.stage' in capsys.readouterr().out
+    assert json.loads(path.read_text(encoding='utf-8')) == summary
+
+    recorder.reset()
+    assert all(values['count'] == 0 for values in recorder.summary().values())
+
+
+def test_disabled_recorder_ignores_measurements():
+    recorder = latency.LatencyRecorder(enabled=False)
+    recorder.record('stage', 0.001)
+    assert recorder.summary() == {}
+    assert not math.isinf(recorder.histogram('stage').summary()['min'])
@@ -0,0 +1,55 @@
+import orchestrator
+import asyncio
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def short_error_delay(monkeypatch):
+    monkeypatch.setattr(orchestrator, 'ERROR_DELAY', 0.001)
+
+
+def failing_every_other_step():
+    calls = []
+
+    def step():
+        calls.append(1)
+        if len(calls) % 2:
+            raise RuntimeError('step failed')
+        return len(calls)
+    return step
+
+
+@pytest.mark.parametrize('offload', ['inline', 'thread'])
+def test_failed_step_is_skipped_and_task_continues(offload):
+    robot = orchestrator.Orchestrator()
+    results = robot.queue('results', 100)
+    received = []
+    closed = []
+    robot.add_task('flaky', failing_every_other_step(), rate=200, offload=offload, sinks=(results,))
+    robot.add_task('sink', received.append, source=results)
+    robot.on_stop(lambda: closed.append(True))
+
+    asyncio.run(robot.run(0.3))
+    statistics = robot.statistics['flaky']
+    assert statistics['errors'] >= 3 and statistics['runs'] >= 3
+    # Результаты дают только успешные шаги, другие задачи работают дальше
+    assert received and all(value % 2 == 0 for value in received)
+    assert closed == [True]
+
+
+def test_max_errors_in_a_row_stops_robot():
+    robot = orchestrator.Orchestrator()
+    other = []
+    robot.add_task('broken', lambda: 1 / 0, max_errors=3)
+    robot.add_task('other', lambda: other.append(1), rate=100)
+
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(robot.run(5))
+    assert robot.statistics['broken']['errors'] == 3
+
+
+def test_success_resets_errors_in_a_row():
+    robot = orchestrator.Orchestrator()
+    robot.add_task('flaky', failing_every_other_step(), rate=200, max_errors=2)
+    asyncio.run(robot.run(0.2))
+    assert robot.statistics['flaky']['errors'] >= 2
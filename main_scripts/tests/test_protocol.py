@@ -0,0 +1,79 @@
+import protocol
+import serial_port
+import time
+import pytest
+
+
+def test_frame_round_trip():
+    commands = [protocol.drive(1.0, -0.5), protocol.Command(protocol.CMD_STOP)]
+    frame = protocol.encode_frame(300, commands)
+    assert len(frame) == protocol.FRAME_SIZE
+    assert protocol.decode_frame(frame) == (300 & 0xFF, commands)
+
+
+def test_corrupted_frame_is_rejected():
+    frame = bytearray(protocol.encode_frame(1, [protocol.LETTER_COMMANDS['F']]))
+    frame[5] ^= 0xFF
+    with pytest.raises(ValueError):
+        protocol.decode_frame(bytes(frame))
+
+
+def test_framed_serial_round_trip_over_loopback():
+    loopback = protocol.LoopbackSerial()
+    framed = protocol.FramedSerial(loopback)
+    framed.write('FL')
+    framed.write(protocol.drive(0.5, 0.0))
+    framed.write('SSSS')
+
+    decoder = protocol.FrameDecoder()
+    frames = decoder.feed(loopback.read_bytes())
+    assert [sequence for sequence, _ in frames] == [0, 1, 2, 3]
+    assert frames[0][1] == [protocol.LETTER_COMMANDS['F'], protocol.LETTER_COMMANDS['L']]
+    assert frames[1][1] == [protocol.Command(protocol.CMD_DRIVE, 64, 0)]
+    # Четыре команды не помещаются в один кадр и делятся на два
+    assert [len(commands) for _, commands in frames[2:]] == [3, 1]
+    assert loopback.read_bytes() == b''
+
+
+def test_decoder_resynchronizes_after_noise_and_split_reads():
+    loopback = protocol.LoopbackSerial()
+    framed = protocol.FramedSerial(loopback)
+    framed.write('F')
+    framed.write('R')
+    stream = b'\x00\xa5garbage' + loopback.read_bytes()
+
+    decoder = protocol.FrameDecoder()
+    frames = []
+    for i in range(0, len(stream), 5):
+        frames.extend(decoder.feed(stream[i:i + 5]))
+    assert [commands for _, commands in frames] == [[protocol.LETTER_COMMANDS['F']], [protocol.LETTER_COMMANDS['R']]]
+
+
+def test_decoder_drops_stale_frames():
+    decoder = protocol.FrameDecoder()
+    stream = b''.join(protocol.encode_frame(sequence, []) for sequence in (10, 11, 11, 5, 12))
+    assert [sequence for sequence, _ in decoder.feed(stream)] == [10, 11, 12]
+    assert decoder.dropped == 2
+
+
+def test_sequence_wraps_around():
+    decoder = protocol.FrameDecoder()
+    stream = b''.join(protocol.encode_frame(sequence, []) for sequence in (254, 255, 256, 257))
+    assert [sequence for sequence, _ in decoder.feed(stream)] == [254, 255, 0, 1]
+
+
+def test_framed_serial_over_pty():
+    terminal = serial_port.PseudoTerminal()
+    port = serial_port.SerialPort(terminal.port)
+    try:
+        protocol.FramedSerial(port).write('FS')
+        received = b''
+        deadline = time.monotonic() + 2.0
+        while len(received) < protocol.FRAME_SIZE and time.monotonic() < deadline:
+            received += terminal.receive()
+            time.sleep(0.005)
+        assert protocol.FrameDecoder().feed(received) == [
+            (0, [protocol.LETTER_COMMANDS['F'], protocol.LETTER_COMMANDS['S']])]
+    finally:
+        port.close()
+        terminal.close()
@@ -0,0 +1,100 @@
+import recording
+import get_capture
+import time
+import numpy as np
+import pytest
+
+
+def frame(value: int) -> np.ndarray:
+    return np.full((6, 8, 3), value, np.uint8)
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / 'frames.rec')
+    with recording.FrameRecorder(path) as recorder:
+        for i in range(5):
+            recorder.write(frame(i * 10), 100.0 + i * 0.02, i + 1)
+    return path
+
+
+def test_record_replay_round_trip(path):
+    stored = recording.Recording(path)
+    assert len(stored) == 5
+    assert stored.size == (8, 6)
+    assert stored.timestamps.tolist() == [100.0 + i * 0.02 for i in range(5)]
+    assert stored.duration == pytest.approx(0.08)
+
+    camera = recording.ReplayCapture(stored, realtime=False)
+    replayed = []
+    while (captured := camera.read_frame()) is not None:
+        replayed.append(captured)
+    assert [captured.sequence for captured in replayed] == [1, 2, 3, 4, 5]
+    for i, captured in enumerate(replayed):
+        assert (captured.frame == i * 10).all()
+    # Время захвата выдаваемых кадров - момент выдачи по time.monotonic()
+    timestamps = [captured.timestamp for captured in replayed]
+    assert timestamps == sorted(timestamps)
+    assert timestamps[-1] <= time.monotonic()
+
+
+def test_replayed_frames_are_read_only(path):
+    captured = recording.ReplayCapture(path, realtime=False).read_frame()
+    assert not captured.frame.flags.writeable
+    with pytest.raises(ValueError):
+        captured.frame[0, 0, 0] = 1
+
+
+def test_realtime_replay_keeps_intervals(path):
+    camera = recording.ReplayCapture(path, realtime=True, speed=0.5)
+    timestamps = [camera.read_frame().timestamp for _ in range(5)]
+    # Исходные интервалы 20 мс, при speed 0.5 - 40 мс, кадр не выдается раньше своего момента
+    assert timestamps == sorted(timestamps)
+    assert 0.16 - 1e-3 <= timestamps[-1] - timestamps[0] < 0.3
+
+
+def test_loop_and_rewind(path):
+    camera = recording.ReplayCapture(path, realtime=False, loop=True)
+    sequences = [camera.read_frame().sequence for _ in range(7)]
+    assert sequences == [1, 2, 3, 4, 5, 1, 2]
+    camera.rewind()
+    assert camera.position == 0
+    assert camera.read_capture()[0, 0, 0] == 0
+
+
+def test_truncated_last_record_is_dropped(path):
+    with open(path, 'rb+') as file:
+        file.truncate(file.seek(0, 2) - 7)
+    stored = recording.Recording(path)
+    assert len(stored) == 4
+    assert (stored[3].frame == 30).all()
+
+
+def test_frame_size_must_not_change(tmp_path):
+    with recording.FrameRecorder(str(tmp_path / 'frames.rec')) as recorder:
+        recorder.write(frame(1))
+        with pytest.raises(ValueError):
+            recorder.write(np.zeros((4, 4, 3), np.uint8))
+
+
+def test_not_a_recording_is_rejected(tmp_path):
+    path = tmp_path / 'frames.rec'
+    path.write_bytes(b'not a recording')
+    with pytest.raises(ValueError):
+        recording.Recording(str(path))
+
+
+def test_record_writes_each_frame_once(tmp_path):
+    class Camera:
+        def __init__(self):
+            self.reads = [get_capture.CapturedFrame(frame(sequence), 10.0 + sequence, sequence)
+                          for sequence in (1, 1, 2, 2, 2, 3)]
+
+        def read_frame(self):
+            return self.reads.pop(0) if self.reads else None
+
+    path = str(tmp_path / 'frames.rec')
+    assert recording.record(Camera(), path, frames=3) == 3
+    stored = recording.Recording(path)
+    assert [stored[i].sequence for i in range(len(stored))] == [1, 2, 3]
+    assert stored.timestamps.tolist() == [11.0, 12.0, 13.0]
@@ -0,0 +1,163 @@
+import chase_laser
+import fakes
+import latency
+import serial_port
+import serial_writer
+import time
+import numpy as np
+import pytest
+
+
+def receive_until(terminal: serial_port.PseudoTerminal, expected: bytes, timeout: float = 2.0) -> bytes:
+    """
+    Чтение со стороны микроконтроллера, пока не придут ожидаемые байты или не истечет время.
+    """
+    received = b''
+    deadline = time.monotonic() + timeout
+    while expected not in received and time.monotonic() < deadline:
+        received += terminal.receive()
+        time.sleep(0.005)
+    return received
+
+
+@pytest.fixture
+def terminal():
+    terminal = serial_port.PseudoTerminal()
+    yield terminal
+    terminal.close()
+
+
+def test_port_round_trip(terminal):
+    port = serial_port.SerialPort(terminal.port)
+    try:
+        port.write('F')
+        assert receive_until(terminal, b'F') == b'F'
+        terminal.send(b'OK')
+        time.sleep(0.05)
+        assert port.read() == 'OK'
+    finally:
+        port.close()
+
+
+def test_stuck_port_write_times_out(terminal):
+    # Со стороны микроконтроллера никто не читает, буфер псевдотерминала заполняется
+    port = serial_port.SerialPort(terminal.port, write_timeout=0.2)
+    try:
+        with pytest.raises(TimeoutError):
+            port.write_bytes(b'x' * (1 << 20))
+    finally:
+        port.close()
+
+
+def test_writer_sends_changes_once_over_pty(terminal):
+    port = serial_port.SerialPort(terminal.port)
+    writer = serial_writer.SerialWriter(port, max_rate=100.0, heartbeat=None)
+    try:
+        for command in 'FFFFLLR':
+            writer.write(command)
+            time.sleep(0.03)
+        received = receive_until(terminal, b'R')
+        assert received == b'FLR'
+        assert writer.statistics['sent'] == 3
+    finally:
+        writer.close()
+        port.close()
+
+
+def test_writer_repeats_last_command_as_heartbeat(terminal):
+    port = serial_port.SerialPort(terminal.port)
+    writer = serial_writer.SerialWriter(port, max_rate=100.0, heartbeat=0.05)
+    try:
+        writer.write('S')
+        received = receive_until(terminal, b'SSS')
+        assert received.startswith(b'SSS')
+        assert writer.statistics['heartbeats'] >= 2
+    finally:
+        writer.close()
+        port.close()
+
+
+class FlakySerial(fakes.FakeSerial):
+    """
+    Порт, первая запись в который завершается ошибкой, как при отключении USB-переходника.
+    """
+    def __init__(self):
+        super().__init__()
+        self.failures = 1
+
+    def write(self, data) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise OSError('device disconnected')
+        super().write(data)
+
+
+def test_writer_survives_write_error_and_resends():
+    serial = FlakySerial()
+    writer = serial_writer.SerialWriter(serial, max_rate=100.0, heartbeat=None, max_backoff=0.05)
+    try:
+        writer.write('F')
+        deadline = time.monotonic() + 2.0
+        while not serial.written and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert list(serial.written) == ['F']
+        writer.write('L')
+        time.sleep(0.1)
+        assert list(serial.written) == ['F', 'L']
+        assert writer.statistics['errors'] == 1
+    finally:
+        writer.close()
+
+
+def test_writer_reopens_port_after_error():
+    broken = FlakySerial()
+    broken.failures = 1000
+    replacement = fakes.FakeSerial()
+    writer = serial_writer.SerialWriter(broken, max_rate=100.0, heartbeat=None, reopen=lambda: replacement,
+                                        max_backoff=0.05)
+    try:
+        writer.write('R')
+        deadline = time.monotonic() + 2.0
+        while not replacement.written and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert list(replacement.written) == ['R']
+    finally:
+        writer.close()
+
+
+def wait_written(serial: fakes.FakeSerial, count: int, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while len(serial.written) < count and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_writer_measures_capture_to_port_latency():
+    histogram = latency.recorder.histogram('serial.end_to_end')
+    histogram.reset()
+    serial = fakes.FakeSerial()
+    writer = serial_writer.SerialWriter(serial, max_rate=100.0, heartbeat=0.01)
+    try:
+        writer.write('F', captured_at=time.monotonic() - 0.1)
+        wait_written(serial, 3)
+        # Повторы последней команды не относятся ни к какому кадру и не измеряются
+        assert histogram.count == 1
+        assert histogram.summary()['min'] >= 100
+    finally:
+        writer.close()
+
+
+def test_chase_passes_capture_time_to_writer():
+    histogram = latency.recorder.histogram('serial.end_to_end')
+    histogram.reset()
+    serial = fakes.FakeSerial()
+    writer = serial_writer.SerialWriter(serial, max_rate=100.0, heartbeat=None)
+    try:
+        chase = chase_laser.ChaseLaser(None, writer, use_lut=False)
+        chase.set_camera(np.zeros((48, 64, 3), np.uint8), time.monotonic() - 0.05, 1)
+        chase.chase()
+        wait_written(serial, 1)
+        assert list(serial.written) == ['S']
+        assert histogram.count == 1
+        assert histogram.summary()['min'] >= 50
+    finally:
+        writer.close()
@@ -0,0 +1,155 @@
+import shm_pipeline
+import multiprocessing
+import threading
+import time
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def ring():
+    ring = shm_pipeline.FrameRing((4, 6, 3), slots=2)
+    yield ring
+    ring.close()
+
+
+def frame(value: int) -> np.ndarray:
+    return np.full((4, 6, 3), value, np.uint8)
+
+
+def test_empty_ring_has_no_frame(ring):
+    assert ring.read(np.empty(ring.shape, np.uint8)) is None
+
+
+def test_reader_attached_by_name_gets_latest_frame(ring):
+    ring.write(frame(1), 10.0, 1)
+    ring.write(frame(2), 20.0, 2)
+    reader = shm_pipeline.FrameRing(ring.shape, ring.slots, ring.name, ring.locks)
+    try:
+        captured = reader.read(np.empty(ring.shape, np.uint8))
+        assert (captured.sequence, captured.timestamp) == (2, 20.0)
+        assert (captured.frame == 2).all()
+    finally:
+        reader.close()
+
+
+def test_attach_without_locks_is_rejected(ring):
+    with pytest.raises(ValueError):
+        shm_pipeline.FrameRing(ring.shape, ring.slots, ring.name)
+
+
+def test_writer_waits_for_copy_of_same_slot(ring, monkeypatch):
+    ring.write(frame(1), 10.0, 1)
+    copyto = np.copyto
+    writers = []
+
+    # Писатель пытается перезаписать ту же ячейку, пока читатель копирует кадр
+    def copy_during_overwrite(out, source):
+        if not writers:
+            writer = threading.Thread(target=ring.write, args=(frame(3), 30.0, 3))
+            writers.append(writer)
+            writer.start()
+            writer.join(0.2)
+            assert writer.is_alive()
+        copyto(out, source)
+    monkeypatch.setattr(shm_pipeline.np, 'copyto', copy_during_overwrite)
+
+    captured = ring.read(np.empty(ring.shape, np.uint8))
+    assert (captured.sequence, captured.timestamp) == (1, 10.0)
+    assert (captured.frame == 1).all()
+    writers[0].join()
+    captured = ring.read(np.empty(ring.shape, np.uint8))
+    assert (captured.sequence, captured.timestamp) == (3, 30.0)
+    assert (captured.frame == 3).all()
+
+
+def test_reader_skips_slot_reused_by_newer_frame(ring):
+    ring.write(frame(1), 10.0, 1)
+
+    class OverwritingLock:
+        """
+        Блокировка ячейки, перед захватом которой писатель успевает занять ячейку более новым кадром.
+        """
+        def __init__(self, lock):
+            self.lock = lock
+            self.overwritten = False
+
+        def __enter__(self):
+            if not self.overwritten:
+                self.overwritten = True
+                ring.write(frame(3), 30.0, 3)
+            return self.lock.__enter__()
+
+        def __exit__(self, *args):
+            return self.lock.__exit__(*args)
+
+    reader = shm_pipeline.FrameRing(ring.shape, ring.slots, ring.name, [OverwritingLock(lock) for lock in ring.locks])
+    try:
+        captured = reader.read(np.empty(ring.shape, np.uint8))
+        assert reader.torn == 1
+        assert (captured.sequence, captured.timestamp) == (3, 30.0)
+        assert (captured.frame == 3).all()
+    finally:
+        reader.close()
+
+
+def test_concurrent_reads_return_whole_frames():
+    ring = shm_pipeline.FrameRing((240, 320, 3), slots=3)
+    stop = threading.Event()
+
+    def write_frames():
+        sequence = 0
+        while not stop.is_set():
+            sequence += 1
+            ring.write(np.full(ring.shape, sequence % 256, np.uint8), float(sequence), sequence)
+    writer = threading.Thread(target=write_frames)
+    writer.start()
+    try:
+        out = np.empty(ring.shape, np.uint8)
+        for _ in range(500):
+            captured = ring.read(out)
+            if captured is None:
+                continue
+            # Кадр целиком принадлежит одному номеру, время захвата от того же кадра
+            assert captured.timestamp == float(captured.sequence)
+            assert out.min() == out.max() == captured.sequence % 256
+    finally:
+        stop.set()
+        writer.join()
+        ring.close()
+
+
+def write_frames(ring_name: str, shape: tuple, slots: int, locks: tuple, count: int) -> None:
+    ring = shm_pipeline.FrameRing(shape, slots, ring_name, locks)
+    try:
+        for sequence in range(1, count + 1):
+            ring.write(np.full(shape, sequence % 256, np.uint8), float(sequence), sequence)
+    finally:
+        ring.close()
+
+
+def test_reads_from_other_process_return_whole_frames():
+    context = multiprocessing.get_context('spawn')
+    ring = shm_pipeline.FrameRing((240, 320, 3), slots=3, context=context)
+    writer = context.Process(target=write_frames, args=(ring.name, ring.shape, ring.slots, ring.locks, 3000))
+    writer.start()
+    try:
+        out = np.empty(ring.shape, np.uint8)
+        reads = 0
+        deadline = time.monotonic() + 30
+        while writer.is_alive() and time.monotonic() < deadline:
+            captured = ring.read(out)
+            if captured is None:
+                continue
+            # Кадр целиком записан другим процессом до того, как стал виден читателю
+            assert captured.timestamp == float(captured.sequence)
+            assert out.min() == out.max() == captured.sequence % 256
+            reads += 1
+        writer.join(30)
+        assert writer.exitcode == 0
+        assert reads > 0
+        assert ring.read(out).sequence == 3000
+    finally:
+        if writer.is_alive():
+            writer.terminate()
+        ring.close()
@@ -0,0 +1,152 @@
+import storage
+import os
+import pytest
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path)
+
+
+def reopen(directory: str) -> tuple:
+    names_storage = storage.AppendLogStorage(directory, 'data')
+    try:
+        return names_storage.load()
+    finally:
+        names_storage.close()
+
+
+def test_update_round_trip(directory):
+    names_storage = storage.AppendLogStorage(directory, 'data')
+    names_storage.load()
+    names_storage.update({0: 'Анна', 1: 'Борис'}, 2)
+    names_storage.update({0: None}, 2)
+    names_storage.close()
+    assert reopen(directory) == ({1: 'Борис'}, 2)
+
+
+def test_truncated_tail_is_dropped(directory):
+    names_storage = storage.AppendLogStorage(directory, 'data')
+    names_storage.load()
+    names_storage.update({0: 'Анна'}, 1)
+    names_storage.update({1: 'Борис'}, 2)
+    names_storage.close()
+
+    # Обрыв питания во время записи последней строки журнала
+    log_path = os.path.join(directory, 'data.log')
+    with open(log_path, 'rb') as file:
+        data = file.read()
+    with open(log_path, 'wb') as file:
+        file.write(data[:-7])
+
+    assert reopen(directory) == ({0: 'Анна'}, 1)
+    # Испорченный хвост обрезан, новые записи продолжают журнал с целой строки
+    names_storage = storage.AppendLogStorage(directory, 'data')
+    names_storage.load()
+    names_storage.update({2: 'Вера'}, 3)
+    names_storage.close()
+    assert reopen(directory) == ({0: 'Анна', 2: 'Вера'}, 3)
+
+
+def test_record_with_bad_checksum_stops_replay(directory):
+    names_storage = storage.AppendLogStorage(directory, 'data')
+    names_storage.load()
+    for person_id, name in enumerate(('Анна', 'Борис', 'Вера')):
+        names_storage.update({person_id: name}, person_id + 1)
+    names_storage.close()
+
+    log_path = os.path.join(directory, 'data.log')
+    with open(log_path, 'rb') as file:
+        lines = file.read().splitlines(keepends=True)
+    lines[1] = lines[1].replace('Борис'.encode('utf-8'), 'Борюс'.encode('utf-8'))
+    with open(log_path, 'wb') as file:
+        file.write(b''.join(lines))
+
+    assert reopen(directory) == ({0: 'Анна'}, 1)
+
+
+def test_interrupted_compaction_is_recovered(directory):
+    names_storage = storage.AppendLogStorage(directory, 'data')
+    names_storage.load()
+    names_storage.update({0: 'Анна'}, 1)
+    names_storage.compact()
+    names_storage.update({1: 'Борис'}, 2)
+    names_storage.close()
+
+    # Журнал отложен для сжатия, новый журнал начат, но снимок записать не успели
+    log_path = os.path.join(directory, 'data.log')
+    os.replace(log_path, log_path + '.old')
+    with open(log_path, 'wb'):
+        pass
+
+    assert reopen(directory) == ({0: 'Анна', 1: 'Борис'}, 2)
+    assert not os.path.exists(log_path + '.old')
+    assert reopen(directory) == ({0: 'Анна', 1: 'Борис'}, 2)
+
+
+def test_compaction_keeps_data(directory):
+    names_storage = storage.AppendLogStorage(directory, 'data', compact_after=4)
+    names_storage.load()
+    for person_id in range(20):
+        names_storage.update({person_id: f'name{person_id}'}, person_id + 1)
+    names_storage.close()
+    assert reopen(directory) == ({person_id: f'name{person_id}' for person_id in range(20)}, 20)
+
+
+def test_save_writes_only_differences(directory):
+    names_storage = storage.AppendLogStorage(directory, 'data')
+    names_storage.load()
+    names_storage.save({0: 'Анна', 1: 'Борис'}, 2)
+    size = os.path.getsize(os.path.join(directory, 'data.log'))
+    names_storage.save({0: 'Анна', 1: 'Борис'}, 2)
+    assert os.path.getsize(os.path.join(directory, 'data.log')) == size
+    names_storage.close()
+
+
+def test_failed_snapshot_keeps_old_log(directory, monkeypatch):
+    names_storage = storage.AppendLogStorage(directory, 'data')
+    names_storage.load()
+    names_storage.update({0: 'Анна'}, 1)
+    names_storage.update({1: 'Борис'}, 2)
+
+    # Снимок не записывается (например, диск заполнен), отложенный журнал должен остаться
+    write_atomic = storage.AppendLogStorage._AppendLogStorage__write_atomic
+
+    def failing_write(path, data):
+        raise OSError('No space left on device')
+    monkeypatch.setattr(storage.AppendLogStorage, '_AppendLogStorage__write_atomic', staticmethod(failing_write))
+    names_storage.compact()
+    assert os.path.exists(os.path.join(directory, 'data.log.old'))
+
+    # Следующее сжатие не должно затереть записи, которые так и не попали в снимок
+    names_storage.update({2: 'Вера'}, 3)
+    names_storage.compact()
+    monkeypatch.setattr(storage.AppendLogStorage, '_AppendLogStorage__write_atomic', staticmethod(write_atomic))
+    assert reopen(directory) == ({0: 'Анна', 1: 'Борис', 2: 'Вера'}, 3)
+
+    names_storage.update({3: 'Глеб'}, 4)
+    names_storage.compact()
+    names_storage.close()
+    assert not os.path.exists(os.path.join(directory, 'data.log.old'))
+    assert reopen(directory) == ({0: 'Анна', 1: 'Борис', 2: 'Вера', 3: 'Глеб'}, 4)
+
+
+def test_failed_append_does_not_change_state(directory, monkeypatch):
+    names_storage = storage.AppendLogStorage(directory, 'data')
+    names_storage.load()
+    names_storage.update({0: 'Анна'}, 1)
+
+    fsync = os.fsync
+
+    def failing_fsync(descriptor):
+        raise OSError('I/O error')
+    monkeypatch.setattr(storage.os, 'fsync', failing_fsync)
+    with pytest.raises(OSError):
+        names_storage.update({1: 'Борис'}, 2)
+    monkeypatch.setattr(storage.os, 'fsync', fsync)
+
+    # Несохраненное изменение не попало в данные в памяти, поэтому save() записывает его снова
+    names_storage.save({0: 'Анна', 1: 'Борис'}, 2)
+    names_storage.update({2: 'Вера'}, 3)
+    names_storage.close()
+    assert reopen(directory) == ({0: 'Анна', 1: 'Борис', 2: 'Вера'}, 3)
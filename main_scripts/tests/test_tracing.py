@@ -0,0 +1,97 @@
+import tracing
+import json
+import threading
+
+
+def run_in_thread(tracer: tracing.Tracer, name: str) -> None:
+    def work():
+        with tracer.span(f'{name}.work', 'test'):
+            pass
+        tracer.instant(f'{name}.event', 'test')
+    thread = threading.Thread(target=work, name=name)
+    thread.start()
+    thread.join()
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = tracing.Tracer()
+    with tracer.span('ignored'):
+        pass
+    tracer.instant('ignored')
+    assert tracer.events() == []
+
+
+def test_chrome_trace_json_shape(tmp_path):
+    tracer = tracing.Tracer()
+    tracer.enable()
+    with tracer.span('outer', 'laser'):
+        tracer.instant('lost', 'laser')
+    tracer.complete('measured', 1_000_000, 3_500_000)
+
+    path = tmp_path / 'trace.json'
+    assert tracer.export(str(path)) == 3
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert data['displayTimeUnit'] == 'ms'
+    events = data['traceEvents']
+    metadata = [event for event in events if event['ph'] == 'M']
+    assert len(metadata) == 1
+    assert metadata[0]['name'] == 'thread_name'
+    assert metadata[0]['args'] == {'name': threading.current_thread().name}
+
+    by_name = {event['name']: event for event in events if event['ph'] != 'M'}
+    assert by_name['outer']['ph'] == 'X' and by_name['outer']['cat'] == 'laser'
+    assert by_name['lost']['ph'] == 'i' and by_name['lost']['s'] == 't'
+    # Время в микросекундах
+    assert (by_name['measured']['ts'], by_name['measured']['dur']) == (1000.0, 2500.0)
+    for event in by_name.values():
+        assert event['tid'] == metadata[0]['tid'] and event['pid'] == metadata[0]['pid']
+    assert by_name['outer']['ts'] <= by_name['lost']['ts'] <= by_name['outer']['ts'] + by_name['outer']['dur']
+
+
+def test_buffer_keeps_newest_records():
+    tracer = tracing.Tracer(buffer_size=3)
+    tracer.enable()
+    for i in range(5):
+        tracer.instant(f'event{i}')
+    assert [event['name'] for event in tracer.events() if event['ph'] != 'M'] == ['event2', 'event3', 'event4']
+
+
+def test_dead_thread_buffers_are_dropped_after_export(tmp_path):
+    tracer = tracing.Tracer()
+    tracer.enable()
+    for name in ('first', 'second'):
+        run_in_thread(tracer, name)
+
+    # Записи завершившихся потоков попадают в файл один раз, затем их буферы удаляются
+    path = tmp_path / 'trace.json'
+    assert tracer.export(str(path)) == 4
+    threads = {event['args']['name'] for event in json.loads(path.read_text(encoding='utf-8'))['traceEvents']
+               if event['ph'] == 'M'}
+    assert threads == {'first', 'second'}
+    assert tracer.events() == []
+    assert tracer.export(str(path)) == 0
+
+
+def test_clear_drops_dead_thread_buffers_and_keeps_live_ones():
+    tracer = tracing.Tracer()
+    tracer.enable()
+    run_in_thread(tracer, 'finished')
+    tracer.instant('main')
+    tracer.clear()
+    events = tracer.events()
+    assert [event['args']['name'] for event in events] == [threading.current_thread().name]
+
+    # Буфер живого потока остается зарегистрированным и после clear()
+    tracer.instant('again')
+    assert [event['name'] for event in tracer.events() if event['ph'] != 'M'] == ['again']
+
+
+def test_empty_buffers_of_dead_threads_do_not_accumulate():
+    tracer = tracing.Tracer()
+    tracer.enable()
+    for i in range(20):
+        run_in_thread(tracer, f'worker{i}')
+    tracer.clear()
+    run_in_thread(tracer, 'last')
+    names = [event['args']['name'] for event in tracer.events() if event['ph'] == 'M']
+    assert names == ['last']
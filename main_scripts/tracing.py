@@ -0,0 +1,192 @@
+import json
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Optional
+
+
+class _NullSpan:
+    """
+    Пустой отрезок, который возвращается при выключенной трассировке. Ничего не измеряет и не записывает.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """
+    Отрезок времени, который записывается в буфер потока при выходе из блока with.
+    """
+    __slots__ = ('__tracer', '__name', '__category', '__start')
+
+    def __init__(self, tracer, name: str, category: str):
+        self.__tracer = tracer
+        self.__name = name
+        self.__category = category
+        self.__start = 0
+
+    def __enter__(self):
+        self.__start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.__tracer.complete(self.__name, self.__start, time.perf_counter_ns(), self.__category)
+        return False
+
+
+class Tracer:
+    """
+    Класс Tracer:
+    Запись отрезков работы подсистем для просмотра на временной шкале (chrome://tracing, Perfetto).
+    Каждый поток пишет в свой кольцевой буфер без блокировок, поэтому трассировка не синхронизирует потоки,
+    а при переполнении теряются только самые старые записи.
+    При выключенной трассировке span() возвращает общий пустой объект, стоимость - одна проверка флага.
+    Буферы завершившихся потоков удаляются после сохранения их записей в export() и при clear().
+    """
+    def __init__(self, buffer_size: int = 65536):
+        """
+        Инициализация объекта класса.
+        :param buffer_size: Количество отрезков в буфере каждого потока.
+        """
+        self.enabled = False
+        self.__buffer_size = buffer_size
+        self.__local = threading.local()
+        self.__buffers = []
+        self.__lock = threading.Lock()
+
+    def enable(self) -> None:
+        """
+        Включение трассировки.
+        """
+        self.enabled = True
+
+    def disable(self) -> None:
+        """
+        Выключение трассировки. Записанные отрезки сохраняются до вызова clear().
+        """
+        self.enabled = False
+
+    def span(self, name: str, category: str = 'robot'):
+        """
+        Отрезок для блока with.
+        :param name: Имя отрезка, например 'laser.preparation'.
+        :param category: Категория, по которой отрезки можно фильтровать при просмотре.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, category)
+
+    def complete(self, name: str, start_ns: int, end_ns: int, category: str = 'robot') -> None:
+        """
+        Запись уже измеренного отрезка.
+        :param name: Имя отрезка.
+        :param start_ns: Начало по time.perf_counter_ns().
+        :param end_ns: Конец по time.perf_counter_ns().
+        :param category: Категория отрезка.
+        """
+        if self.enabled:
+            self.__buffer().append((name, category, start_ns, end_ns - start_ns))
+
+    def instant(self, name: str, category: str = 'robot') -> None:
+        """
+        Запись мгновенного события, например потери лазерной точки.
+        """
+        if self.enabled:
+            self.__buffer().append((name, category, time.perf_counter_ns(), None))
+
+    def clear(self) -> None:
+        """
+        Удаление всех записанных отрезков и буферов завершившихся потоков.
+        """
+        with self.__lock:
+            self.__buffers = [entry for entry in self.__buffers if self.__alive(entry)]
+            for _, _, buffer, _ in self.__buffers:
+                buffer.clear()
+
+    def events(self) -> list:
+        """
+        Все записанные события в формате Chrome trace event.
+        """
+        return self.__collect(prune=False)
+
+    def __collect(self, prune: bool) -> list:
+        """
+        Копирование записей всех буферов в формат Chrome trace event.
+        :param prune: Если True, буферы завершившихся потоков удаляются после копирования.
+            Завершившийся поток больше не пишет в свой буфер, поэтому его записи скопированы полностью.
+        """
+        pid = os.getpid()
+        with self.__lock:
+            buffers = [(thread_id, thread_name, list(buffer))
+                       for thread_id, thread_name, buffer, _ in self.__buffers]
+            if prune:
+                self.__buffers = [entry for entry in self.__buffers if self.__alive(entry)]
+
+        events = []
+        for thread_id, thread_name, records in buffers:
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread_id,
+                           'args': {'name': thread_name}})
+            for name, category, start, duration in records:
+                event = {'name': name, 'cat': category, 'pid': pid, 'tid': thread_id, 'ts': start / 1000}
+                if duration is None:
+                    event.update(ph='i', s='t')
+                else:
+                    event.update(ph='X', dur=duration / 1000)
+                events.append(event)
+        return events
+
+    def export(self, path: str) -> int:
+        """
+        Сохранение записанных событий в файл Chrome trace JSON.
+        Записи завершившихся потоков сохраняются в этот файл, а их буферы удаляются.
+        :param path: Путь к файлу .json.
+        :return: Количество сохраненных отрезков и событий.
+        """
+        events = self.__collect(prune=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+        return sum(1 for event in events if event['ph'] != 'M')
+
+    def __buffer(self) -> deque:
+        """
+        Буфер текущего потока, при первом обращении из потока он создается.
+        """
+        buffer: Optional[deque] = getattr(self.__local, 'buffer', None)
+        if buffer is None:
+            buffer = deque(maxlen=self.__buffer_size)
+            self.__local.buffer = buffer
+            thread = threading.current_thread()
+            with self.__lock:
+                # Пустые буферы завершившихся потоков удаляются сразу, чтобы список не рос с каждым новым потоком
+                self.__buffers = [entry for entry in self.__buffers if entry[2] or self.__alive(entry)]
+                self.__buffers.append((threading.get_ident(), thread.name, buffer, weakref.ref(thread)))
+        return buffer
+
+    @staticmethod
+    def __alive(entry: tuple) -> bool:
+        """
+        Проверка, что поток буфера еще работает.
+        """
+        thread = entry[3]()
+        return thread is not None and thread.is_alive()
+
+
+# Общая трассировка для всех подсистем робота
+tracer = Tracer()
+
+
+def span(name: str, category: str = 'robot'):
+    """
+    Отрезок общей трассировки для блока with, см. Tracer.span().
+    """
+    return tracer.span(name, category)